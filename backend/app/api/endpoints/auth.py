@@ -1,15 +1,21 @@
-from datetime import timedelta
+import logging
+from datetime import datetime, timedelta
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
 
 from app.api import schemas
 from app.core import security
+from app.core.cache import user_cache
 from app.core.config import settings
 from app.db import models
 from app.db.database import get_db
+from app.utils.email_normalization import normalize_email
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -41,50 +47,49 @@ async def login_access_token(
     """
     OAuth2 compatible token login, récupère un token d'accès pour les futures requêtes
     """
-    # Logs de débogage - Email tenté
-    print(f"Tentative de connexion avec l'email: {form_data.username}")
-    
     # SOLUTION ALTERNATIVE: Accès direct à la collection MongoDB au lieu de Beanie
     users_collection = db.get_collection("users")
     
-    # Recherche directe dans la collection
-    user_data = await users_collection.find_one({"email": form_data.username})
+    # Recherche insensible à la casse par l'index unique sur l'email normalisé
+    user_data = await users_collection.find_one(
+        {"email_normalized": normalize_email(form_data.username)}
+    )
+    if not user_data and settings.AUTH_LEGACY_EMAIL_LOOKUP:
+        # TEMPORAIRE: comptes pas encore migrés par backfill_normalized_emails (correspondance
+        # exacte, indexée). À supprimer avec AUTH_LEGACY_EMAIL_LOOKUP une fois la migration faite.
+        user_data = await users_collection.find_one({"email": form_data.username})
     
     if not user_data:
-        print(f"Aucun utilisateur trouvé avec l'email: {form_data.username}")
-        
-        # Essayer une recherche insensible à la casse (au cas où)
-        print("Tentative de recherche insensible à la casse")
-        user_data = await users_collection.find_one(
-            {"email": {"$regex": f"^{form_data.username}$", "$options": "i"}}
+        logger.info("Échec de connexion: email inconnu")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Email ou mot de passe incorrect",
+            headers={"WWW-Authenticate": "Bearer"},
         )
-        
-        if not user_data:
-            print("Toujours aucun utilisateur trouvé")
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Email ou mot de passe incorrect",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-    
-    # Si on arrive ici, on a trouvé un utilisateur
-    print(f"Utilisateur trouvé: {user_data['email']}")
-    print(f"Type de mot de passe hashé: {type(user_data['hashed_password'])}")
-    
-    # Vérification du mot de passe avec le hash stocké
-    password_valid = security.verify_password(
+    
+    # Vérification du mot de passe avec le hash stocké (hors de la boucle asyncio)
+    password_valid, new_hash = await security.verify_and_update_password(
         form_data.password, 
         user_data['hashed_password']
     )
-    print(f"Résultat vérification mot de passe: {password_valid}")
     
     if not password_valid:
+        logger.info(f"Échec de connexion: mot de passe incorrect pour l'utilisateur {user_data['_id']}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email ou mot de passe incorrect",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Le coût bcrypt a changé: enregistrer le hash recalculé
+    if new_hash:
+        await users_collection.update_one(
+            {"_id": user_data["_id"]},
+            {"$set": {"hashed_password": new_hash, "updated_at": datetime.utcnow()}}
+        )
+        user_data["hashed_password"] = new_hash
+        user_cache.invalidate_user(str(user_data["_id"]), user_data["email"])
+    
     # Convertir le document MongoDB en instance de User
     user = models.User.parse_obj(user_data)
     if not user.is_active:
@@ -130,8 +135,10 @@ async def create_user(
     """
     Crée un nouvel utilisateur
     """
-    # Vérifier si l'utilisateur existe déjà
-    existing_user = await models.User.find_one({"email": user_in.email})
+    # Vérifier si l'utilisateur existe déjà (sans tenir compte de la casse)
+    existing_user = await models.User.find_one(
+        {"email_normalized": normalize_email(user_in.email)}
+    )
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -139,7 +146,7 @@ async def create_user(
         )
     
     # Créer le nouvel utilisateur
-    hashed_password = security.get_password_hash(user_in.password)
+    hashed_password = await security.get_password_hash_async(user_in.password)
     db_user = models.User(
         email=user_in.email,
         hashed_password=hashed_password,
@@ -149,6 +156,13 @@ async def create_user(
     )
     
     # Sauvegarder l'utilisateur dans MongoDB
-    await db_user.save()
+    # (les index uniques couvrent deux inscriptions simultanées avec le même email)
+    try:
+        await db_user.insert()
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cet email est déjà utilisé"
+        )
     
     return db_user
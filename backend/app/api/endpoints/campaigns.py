@@ -0,0 +1,136 @@
+from typing import Any, List
+
+from beanie import PydanticObjectId
+from fastapi import APIRouter, Depends, HTTPException, status
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import DESCENDING
+
+from app.api import schemas
+from app.core.campaigns import CampaignTemplateError, CompiledTemplate, campaign_runner
+from app.core.config import settings
+from app.core.deps import get_current_user
+from app.db import models
+from app.db.database import get_db
+
+router = APIRouter()
+
+
+@router.post(
+    "/",
+    response_model=schemas.Campaign,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Lancer une campagne personnalisée",
+    description="""
+    Crée une campagne et lance en arrière-plan la création d'un SMS personnalisé
+    pour chaque contact de l'audience. Les SMS sont envoyés par la file d'attente.
+
+    **Requête**:
+    - name: Nom de la campagne
+    - template: Modèle du message; champs disponibles: {name}, {phone_number}, {notes}
+      (doubler les accolades pour les écrire telles quelles: {{ et }})
+    - audience: Critères de sélection des contacts (tous les contacts si vide)
+        - name_prefix, phone_prefix, notes_contains, created_from, created_to
+    - transliterate: Remplacer les caractères hors GSM-7 par leur équivalent (optionnel)
+
+    **Réponse**:
+    - Détails de la campagne avec les compteurs de progression
+      (total, skipped, sent, failed), mis à jour au fil de l'envoi
+
+    **Code d'erreur**:
+    - 400: Modèle invalide ou file d'attente d'envoi désactivée
+    """
+)
+async def create_campaign(
+    *,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    campaign_in: schemas.CampaignCreate,
+    current_user: models.User = Depends(get_current_user)
+) -> Any:
+    """
+    Crée une campagne et lance la création de ses SMS
+    """
+    if not settings.SMS_QUEUE_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Les campagnes nécessitent la file d'attente d'envoi (SMS_QUEUE_ENABLED)"
+        )
+    try:
+        CompiledTemplate(campaign_in.template)
+    except CampaignTemplateError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    campaign = models.Campaign(
+        name=campaign_in.name,
+        template=campaign_in.template,
+        audience=campaign_in.audience.dict(exclude_none=True),
+        transliterate=campaign_in.transliterate,
+        owner_id=str(current_user.id)
+    )
+    await campaign.insert()
+    await campaign_runner.launch(str(campaign.id))
+    return campaign
+
+
+@router.get(
+    "/",
+    response_model=List[schemas.Campaign],
+    summary="Lister les campagnes",
+    description="""
+    Récupère les campagnes de l'utilisateur courant, de la plus récente à la plus ancienne.
+
+    **Paramètres**:
+    - skip: Nombre d'éléments à sauter (par défaut: 0)
+    - limit: Nombre maximum d'éléments à retourner (par défaut: 100)
+    """
+)
+async def read_campaigns(
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+) -> Any:
+    """
+    Récupère les campagnes de l'utilisateur
+    """
+    return await models.Campaign.find(
+        {"owner_id": str(current_user.id)}
+    ).sort([("created_at", DESCENDING)]).skip(skip).limit(limit).to_list()
+
+
+@router.get(
+    "/{campaign_id}",
+    response_model=schemas.Campaign,
+    summary="Progression d'une campagne",
+    description="""
+    Récupère une campagne et ses compteurs de progression.
+
+    **Paramètres**:
+    - campaign_id: Identifiant unique de la campagne
+
+    **Réponse**:
+    - status: "running" (création des SMS), "queued" (envois en cours),
+      "completed" ou "failed"
+    - total, skipped, sent, failed: Compteurs de progression
+
+    **Code d'erreur**:
+    - 404: Campagne non trouvée ou ID invalide
+    """
+)
+async def read_campaign(
+    campaign_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+) -> Any:
+    """
+    Récupère les détails d'une campagne
+    """
+    try:
+        campaign = await models.Campaign.get(PydanticObjectId(campaign_id))
+    except ValueError:
+        campaign = None
+    if not campaign or campaign.owner_id != str(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Campagne non trouvée ou ID invalide"
+        )
+    return campaign
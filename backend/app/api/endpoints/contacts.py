@@ -1,17 +1,40 @@
-from typing import Any, List
+from datetime import datetime
+from typing import Any, List, Optional
 from beanie import PydanticObjectId
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
 
 from app.api import schemas
+from app.core.config import settings
+from app.core.contacts import IMPORT_FORMATS, ContactImportError, import_contacts
 from app.core.deps import get_current_user
 from app.db import models
 from app.db.database import get_db
-from app.utils.phone_validation import validate_senegal_phone
+from app.utils.export import EXPORT_FORMATS, export_response
+from app.utils.fast_json import FastJSONResponse, schema_fields, schema_projection, serialize_documents
+from app.utils.pagination import InvalidCursorError, decode_cursor, encode_cursor, keyset_filter
+from app.utils.phone_normalization import validate_phone
 
 router = APIRouter()
 
+# Ordre des contacts: clé de pagination (name, _id), couverte par l'index owner_id_name_id
+CONTACTS_SORT = [("name", ASCENDING), ("_id", ASCENDING)]
+
+# Champs lus pour la liste des contacts (documents bruts, voir app.utils.fast_json)
+CONTACTS_FIELDS = schema_fields(schemas.Contact)
+CONTACTS_PROJECTION = schema_projection(schemas.Contact)
+
+INVALID_PHONE_DETAIL = (
+    "Format de numéro invalide. Utilisez le format international "
+    "(+221 7X XXX XX XX pour un numéro sénégalais)"
+)
+
+# Colonnes de l'export des contacts
+CONTACTS_EXPORT_COLUMNS = ["id", "name", "phone_number", "notes", "created_at", "updated_at"]
+
 
 @router.get(
     "/",
@@ -21,26 +44,46 @@ router = APIRouter()
     Récupère la liste des contacts de l'utilisateur courant, triés par nom.
     
     **Paramètres**:
-    - skip: Nombre d'éléments à sauter (pour la pagination)
+    - cursor: Curseur de la page suivante (en-tête X-Next-Cursor de la réponse précédente)
+    - skip: Nombre d'éléments à sauter (ancienne pagination, ignoré si cursor est fourni)
     - limit: Nombre maximum d'éléments à retourner (par défaut: 100)
     
     **Réponse**:
     - Liste d'objets Contact avec leurs détails
+    - En-tête X-Next-Cursor: curseur de la page suivante (absent sur la dernière page)
+    
+    **Code d'erreur**:
+    - 400: Curseur invalide
     """
 )
 async def read_contacts(
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: AsyncIOMotorDatabase = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ) -> Any:
     """
     Récupère la liste des contacts de l'utilisateur
     """
-    contacts = await models.Contact.find(
-        {"owner_id": str(current_user.id)}
-    ).sort("name").skip(skip).limit(limit).to_list()
-    return contacts
+    query = {"owner_id": str(current_user.id)}
+    if cursor:
+        try:
+            values = decode_cursor(cursor, len(CONTACTS_SORT))
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        query.update(keyset_filter(CONTACTS_SORT, values))
+        skip = 0
+    
+    contacts = await models.Contact.get_motor_collection().find(
+        query, projection=CONTACTS_PROJECTION
+    ).sort(CONTACTS_SORT).skip(skip).limit(limit).to_list(length=None)
+    
+    response = FastJSONResponse(serialize_documents(contacts, CONTACTS_FIELDS))
+    if limit > 0 and len(contacts) == limit:
+        last = contacts[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor([last["name"], last["_id"]])
+    return response
 
 
 @router.post(
@@ -72,25 +115,12 @@ async def create_contact(
     """
     Crée un nouveau contact
     """
-    # Valider et formater le numéro de téléphone sénégalais
-    is_valid, formatted_number = validate_senegal_phone(contact_in.phone_number)
+    # Valider et formater le numéro de téléphone (format international E.164)
+    is_valid, formatted_number = validate_phone(contact_in.phone_number)
     if not is_valid:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Format de numéro invalide. Utilisez le format +221 7X XXX XX XX (numéro sénégalais)"
-        )
-    
-    # Vérifier si le contact existe déjà (même numéro pour le même utilisateur)
-    existing_contact = await models.Contact.find_one(
-        {
-            "owner_id": str(current_user.id),
-            "phone_number": formatted_number
-        }
-    )
-    if existing_contact:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Un contact avec ce numéro existe déjà"
+            detail=INVALID_PHONE_DETAIL
         )
     
     # Créer le nouveau contact avec le numéro formaté
@@ -101,11 +131,120 @@ async def create_contact(
         **contact_data,
         owner_id=str(current_user.id)
     )
-    await db_contact.save()
+    # L'index unique (owner_id, phone_number) refuse un numéro déjà présent chez l'utilisateur
+    try:
+        await db_contact.insert()
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Un contact avec ce numéro existe déjà"
+        )
     
     return db_contact
 
 
+@router.post(
+    "/import",
+    response_model=schemas.ContactImportResponse,
+    summary="Importer des contacts en masse",
+    description="""
+    Importe des contacts depuis un fichier CSV ou NDJSON envoyé comme corps de la requête
+    (par exemple `curl --data-binary @contacts.csv -H "Content-Type: text/csv"`).
+    Le fichier est traité au fil de l'eau, par lots.
+    
+    **Paramètres**:
+    - format: "csv" ou "ndjson" (par défaut: déduit du Content-Type, sinon csv)
+    
+    **Requête**:
+    - CSV: en-tête avec les colonnes name, phone_number et notes (optionnelle), séparateur "," ou ";"
+    - NDJSON: un objet {"name", "phone_number", "notes"} par ligne
+    
+    **Réponse**:
+    - total, inserted, skipped, invalid: Compteurs de l'import
+    - errors: Lignes invalides (numéro de ligne, numéro de téléphone, erreur), liste tronquée
+    
+    **Code d'erreur**:
+    - 400: Format inconnu ou en-tête CSV invalide
+    """
+)
+async def import_contacts_file(
+    request: Request,
+    format: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+) -> Any:
+    """
+    Importe des contacts en masse sans charger le fichier en mémoire
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "ndjson" if "ndjson" in content_type or "jsonl" in content_type else "csv"
+    if format not in IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Format inconnu. Formats acceptés: {', '.join(IMPORT_FORMATS)}"
+        )
+    
+    try:
+        return await import_contacts(str(current_user.id), request.stream(), format)
+    except ContactImportError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get(
+    "/export",
+    summary="Exporter les contacts",
+    description="""
+    Exporte tous les contacts de l'utilisateur courant, triés par nom, en CSV ou NDJSON.
+    Le fichier est produit au fil de l'eau et peut être compressé en gzip.
+    
+    **Paramètres**:
+    - format: "csv" ou "ndjson" (par défaut: csv)
+    - gzip: Compresser le fichier (par défaut: false)
+    - created_from: Date de création minimale (incluse, optionnelle)
+    - created_to: Date de création maximale (exclue, optionnelle)
+    
+    **Réponse**:
+    - Fichier en pièce jointe avec les colonnes id, name, phone_number, notes, created_at, updated_at
+    
+    **Code d'erreur**:
+    - 400: Format inconnu
+    """
+)
+async def export_contacts(
+    format: str = "csv",
+    gzip: bool = False,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+) -> Any:
+    """
+    Exporte les contacts de l'utilisateur sans les charger en mémoire
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Format inconnu. Formats acceptés: {', '.join(EXPORT_FORMATS)}"
+        )
+    
+    query = {"owner_id": str(current_user.id)}
+    created_at = {}
+    if created_from:
+        created_at["$gte"] = created_from
+    if created_to:
+        created_at["$lt"] = created_to
+    if created_at:
+        query["created_at"] = created_at
+    
+    cursor = models.Contact.get_motor_collection().find(
+        query,
+        projection={column: 1 for column in CONTACTS_EXPORT_COLUMNS if column != "id"},
+        batch_size=settings.EXPORT_BATCH_SIZE
+    ).sort(CONTACTS_SORT)
+    return export_response(cursor, CONTACTS_EXPORT_COLUMNS, "contacts", format, gzip)
+
+
 @router.get(
     "/{contact_id}",
     response_model=schemas.Contact,
@@ -190,36 +329,30 @@ async def update_contact(
         
         # Vérifier si le nouveau numéro existe déjà chez un autre contact
         if contact_in.phone_number and contact_in.phone_number != contact.phone_number:
-            # Valider et formater le numéro de téléphone sénégalais
-            is_valid, formatted_number = validate_senegal_phone(contact_in.phone_number)
+            # Valider et formater le numéro de téléphone (format international E.164)
+            is_valid, formatted_number = validate_phone(contact_in.phone_number)
             if not is_valid:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Format de numéro invalide. Utilisez le format +221 7X XXX XX XX (numéro sénégalais)"
+                    detail=INVALID_PHONE_DETAIL
                 )
             
             # Mettre à jour le numéro avec la version formatée
             contact_in.phone_number = formatted_number
-            
-            existing_contact = await models.Contact.find_one(
-                {
-                    "owner_id": str(current_user.id),
-                    "phone_number": formatted_number,
-                    "_id": {"$ne": PydanticObjectId(contact_id)}
-                }
-            )
-            if existing_contact:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Un contact avec ce numéro existe déjà"
-                )
         
         # Mettre à jour les champs
         update_data = contact_in.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(contact, field, value)
         
-        await contact.save()
+        # L'index unique (owner_id, phone_number) refuse un numéro déjà utilisé par un autre contact
+        try:
+            await contact.save()
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Un contact avec ce numéro existe déjà"
+            )
         
         return contact
     except ValueError:
@@ -1,29 +1,59 @@
-from typing import Any, List
+import secrets
+from datetime import datetime, timedelta
+from typing import Any, List, Optional
 from beanie import PydanticObjectId
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Response, status
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING
 
 from app.api import schemas
 from app.core import sms
+from app.core.analytics import rollup_date
+from app.core.config import settings
+from app.core.delivery_receipts import delivery_receipt_buffer, parse_delivery_notifications
 from app.core.deps import get_current_user
 from app.db import models
 from app.db.database import get_db
+from app.utils.export import EXPORT_FORMATS, export_response
+from app.utils.fast_json import FastJSONResponse, schema_fields, schema_projection, serialize_documents
+from app.utils.pagination import InvalidCursorError, decode_cursor, encode_cursor, keyset_filter
+from app.utils.phone_normalization import validate_phone
+from app.utils.sms_encoding import analyze_message, non_gsm_characters, transliterate
 
 router = APIRouter()
 
+# Ordre de l'historique: clé de pagination (created_at, _id), couverte par l'index sender_id_created_at_id
+HISTORY_SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+# Champs lus pour l'historique (documents bruts, voir app.utils.fast_json)
+HISTORY_FIELDS = schema_fields(schemas.SMS)
+HISTORY_PROJECTION = schema_projection(schemas.SMS)
+
+# Colonnes de l'export de l'historique
+HISTORY_EXPORT_COLUMNS = [
+    "id", "recipient_number", "recipient_id", "content", "status",
+    "message_id", "encoding", "segments", "created_at", "updated_at"
+]
+
 
 @router.post(
     "/send",
     response_model=schemas.SMS,
+    status_code=status.HTTP_202_ACCEPTED,
     summary="Envoyer un SMS via Orange",
     description="""
-    Envoie un SMS via l'API Orange et enregistre l'historique.
+    Enregistre un SMS dans la file d'attente d'envoi et répond immédiatement (202).
+    Le SMS est ensuite envoyé via l'API Orange par les workers de la file; son statut
+    passe de "queued" à "sent" (ou "failed" après épuisement des tentatives).
+    Si la file est désactivée (SMS_QUEUE_ENABLED=false), l'envoi est synchrone (200).
     
     **Requête**:
     - recipient_number: Numéro de téléphone du destinataire (format international)
     - message: Contenu du message SMS
     - recipient_id: ID du contact dans la base de données (optionnel)
+    - transliterate: Remplacer les caractères hors GSM-7 (accents, apostrophes typographiques...)
+      par leur équivalent pour éviter l'encodage UCS-2 (optionnel)
     
     **Réponse**:
     - id: Identifiant unique du SMS
@@ -31,10 +61,18 @@ router = APIRouter()
     - recipient_number: Numéro de téléphone du destinataire
     - message: Contenu du message
     - status: Statut actuel du SMS
+    - encoding, segments: Encodage du message et nombre de SMS facturés
     - created_at: Date d'envoi
     - updated_at: Dernière mise à jour
     
+    **En-têtes**:
+    - Idempotency-Key: Clé unique choisie par le client (optionnelle). Une requête répétée
+      avec la même clé (par exemple après un timeout) renvoie le SMS d'origine sans
+      nouvel envoi; si la requête d'origine est encore en cours, la réponse l'attend.
+    
     **Code d'erreur**:
+    - 400: Numéro de téléphone invalide
+    - 409: Clé d'idempotence déjà utilisée pour une autre requête, ou requête d'origine toujours en cours
     - 500: Erreur lors de l'envoi du SMS
     """
 )
@@ -42,20 +80,57 @@ async def send_sms(
     *,
     db: AsyncIOMotorDatabase = Depends(get_db),
     sms_in: schemas.SMSSend,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: models.User = Depends(get_current_user)
 ) -> Any:
     """
     Envoie un SMS via l'API Orange et enregistre l'historique
     """
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= 255:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="L'en-tête Idempotency-Key doit contenir entre 1 et 255 caractères"
+        )
+    is_valid, recipient_number = validate_phone(sms_in.recipient_number)
+    if not is_valid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Format de numéro invalide"
+        )
+    sms_in.recipient_number = recipient_number
+    if sms_in.transliterate:
+        sms_in.message = transliterate(sms_in.message)
+    
+    if settings.SMS_QUEUE_ENABLED:
+        try:
+            return await sms.enqueue_sms(
+                db=db,
+                user_id=str(current_user.id),
+                recipient_number=sms_in.recipient_number,
+                message=sms_in.message,
+                recipient_id=sms_in.recipient_id,
+                idempotency_key=idempotency_key
+            )
+        except sms.IdempotencyConflictError as e:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    
+    response.status_code = status.HTTP_200_OK
     try:
         result = await sms.send_sms(
             db=db,
             user_id=str(current_user.id),
             recipient_number=sms_in.recipient_number,
             message=sms_in.message,
-            recipient_id=sms_in.recipient_id
+            recipient_id=sms_in.recipient_id,
+            idempotency_key=idempotency_key
         )
         return result
+    except sms.IdempotencyConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except HTTPException:
+        # Conserver le code renvoyé par le service Orange (503 circuit ouvert, 429...)
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -63,34 +138,277 @@ async def send_sms(
         )
 
 
+@router.post(
+    "/bulk",
+    response_model=schemas.SMSBulkResponse,
+    summary="Envoyer un SMS à plusieurs destinataires",
+    description="""
+    Envoie le même SMS à une liste de numéros et/ou de contacts en une seule requête.
+    Les numéros sont normalisés et dédoublonnés avant l'envoi.
+    
+    **Requête**:
+    - message: Contenu du message SMS
+    - recipient_numbers: Liste de numéros de téléphone (optionnel)
+    - recipient_ids: Liste d'IDs de contacts (optionnel)
+    - transliterate: Remplacer les caractères hors GSM-7 par leur équivalent (optionnel)
+    
+    **Réponse**:
+    - total, queued, sent, failed, invalid, duplicates: Compteurs de l'envoi
+    - encoding, segments: Encodage du message et SMS facturés par destinataire
+    - results: Résultat pour chaque destinataire (statut, ID du SMS, erreur éventuelle)
+    
+    **Code d'erreur**:
+    - 400: Aucun destinataire ou trop de destinataires
+    """
+)
+async def send_bulk_sms(
+    *,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    sms_in: schemas.SMSBulkSend,
+    current_user: models.User = Depends(get_current_user)
+) -> Any:
+    """
+    Envoie un SMS à plusieurs destinataires avec une concurrence limitée
+    """
+    recipient_count = len(sms_in.recipient_numbers) + len(sms_in.recipient_ids)
+    if recipient_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Aucun destinataire fourni"
+        )
+    if recipient_count > settings.SMS_BULK_MAX_RECIPIENTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Trop de destinataires (maximum {settings.SMS_BULK_MAX_RECIPIENTS})"
+        )
+    
+    message = transliterate(sms_in.message) if sms_in.transliterate else sms_in.message
+    return await sms.send_bulk_sms(
+        db=db,
+        user_id=str(current_user.id),
+        message=message,
+        recipient_numbers=sms_in.recipient_numbers,
+        recipient_ids=sms_in.recipient_ids
+    )
+
+
+@router.post(
+    "/preview",
+    response_model=schemas.SMSPreviewResponse,
+    summary="Prévisualiser l'encodage et le coût d'un SMS",
+    description="""
+    Calcule l'encodage (GSM-7 ou UCS-2) et le nombre de segments facturés d'un message,
+    sans l'envoyer. Un seul caractère hors GSM-7 fait passer le message en UCS-2
+    (70 caractères par segment au lieu de 160).
+    
+    **Requête**:
+    - message: Contenu du message SMS
+    - transliterate: Calculer pour le message translittéré en GSM-7 (optionnel)
+    
+    **Réponse**:
+    - message: Message tel qu'il serait envoyé
+    - encoding, length, segments, per_segment, remaining: Encodage et découpage
+    - non_gsm_characters: Caractères qui imposent l'encodage UCS-2
+    """
+)
+async def preview_sms(
+    preview_in: schemas.SMSPreview,
+    current_user: models.User = Depends(get_current_user)
+) -> Any:
+    """
+    Calcule l'encodage et le nombre de segments d'un SMS
+    """
+    message = transliterate(preview_in.message) if preview_in.transliterate else preview_in.message
+    info = analyze_message(message)
+    return schemas.SMSPreviewResponse(
+        message=message,
+        non_gsm_characters=non_gsm_characters(message),
+        **info._asdict()
+    )
+
+
+@router.post(
+    "/delivery-receipts",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Callback des accusés de réception Orange",
+    description="""
+    Reçoit les accusés de réception poussés par Orange (notifyURL) et met à jour
+    le statut des SMS correspondants. Les accusés sont enregistrés en base avant
+    la réponse, puis appliqués aux SMS par lots.
+    
+    **Paramètres**:
+    - token: Jeton du callback (ORANGE_DELIVERY_CALLBACK_TOKEN, obligatoire)
+    
+    **Requête**:
+    - Une notification deliveryInfoNotification ou une liste de notifications
+    
+    **Code d'erreur**:
+    - 403: Jeton du callback invalide ou non configuré
+    """
+)
+async def receive_delivery_receipts(
+    payload: Any = Body(...),
+    token: Optional[str] = None
+) -> Response:
+    """
+    Enregistre les accusés de réception envoyés par Orange
+    """
+    # Sans jeton configuré, le callback est fermé: n'importe qui pourrait modifier les statuts
+    expected_token = settings.ORANGE_DELIVERY_CALLBACK_TOKEN
+    if not expected_token or not secrets.compare_digest((token or "").encode(), expected_token.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Jeton du callback invalide"
+        )
+    
+    receipts = parse_delivery_notifications(payload)
+    if receipts:
+        await delivery_receipt_buffer.add(receipts)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
 @router.get(
     "/history",
     response_model=List[schemas.SMS],
     summary="Lister l'historique des SMS",
     description="""
-    Récupère l'historique des SMS envoyés par l'utilisateur courant.
+    Récupère l'historique des SMS envoyés par l'utilisateur courant, du plus récent au plus ancien.
     
     **Paramètres**:
-    - skip: Nombre d'éléments à sauter (pour la pagination)
+    - cursor: Curseur de la page suivante (en-tête X-Next-Cursor de la réponse précédente)
+    - skip: Nombre d'éléments à sauter (ancienne pagination, ignoré si cursor est fourni)
     - limit: Nombre maximum d'éléments à retourner (par défaut: 100)
     
     **Réponse**:
     - Liste d'objets SMS avec leurs détails
+    - En-tête X-Next-Cursor: curseur de la page suivante (absent sur la dernière page)
+    
+    **Code d'erreur**:
+    - 400: Curseur invalide
     """
 )
 async def get_sms_history(
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: AsyncIOMotorDatabase = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ) -> Any:
     """
     Récupère l'historique des SMS envoyés par l'utilisateur courant
     """
-    sms_messages = await models.SMSMessage.find(
-        {"sender_id": str(current_user.id)}
-    ).sort("-created_at").skip(skip).limit(limit).to_list()
-    return sms_messages
+    query = {"sender_id": str(current_user.id)}
+    if cursor:
+        try:
+            values = decode_cursor(cursor, len(HISTORY_SORT))
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        query.update(keyset_filter(HISTORY_SORT, values))
+        skip = 0
+    
+    sms_messages = await models.SMSMessage.get_motor_collection().find(
+        query, projection=HISTORY_PROJECTION
+    ).sort(HISTORY_SORT).skip(skip).limit(limit).to_list(length=None)
+    
+    response = FastJSONResponse(serialize_documents(sms_messages, HISTORY_FIELDS))
+    if limit > 0 and len(sms_messages) == limit:
+        last = sms_messages[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor([last["created_at"], last["_id"]])
+    return response
+
+
+@router.get(
+    "/export",
+    summary="Exporter l'historique des SMS",
+    description="""
+    Exporte l'historique des SMS de l'utilisateur courant, du plus récent au plus ancien,
+    en CSV ou NDJSON. Le fichier est produit au fil de l'eau et peut être compressé en gzip.
+    
+    **Paramètres**:
+    - format: "csv" ou "ndjson" (par défaut: csv)
+    - gzip: Compresser le fichier (par défaut: false)
+    - status: Ne garder que les SMS de ce statut (optionnel)
+    - created_from: Date d'envoi minimale (incluse, optionnelle)
+    - created_to: Date d'envoi maximale (exclue, optionnelle)
+    
+    **Réponse**:
+    - Fichier en pièce jointe avec les colonnes id, recipient_number, recipient_id, content,
+      status, message_id, encoding, segments, created_at, updated_at
+    
+    **Code d'erreur**:
+    - 400: Format inconnu
+    """
+)
+async def export_sms_history(
+    format: str = "csv",
+    gzip: bool = False,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+) -> Any:
+    """
+    Exporte l'historique des SMS sans le charger en mémoire
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Format inconnu. Formats acceptés: {', '.join(EXPORT_FORMATS)}"
+        )
+    
+    query = {"sender_id": str(current_user.id)}
+    if status_filter:
+        query["status"] = status_filter
+    created_at = {}
+    if created_from:
+        created_at["$gte"] = created_from
+    if created_to:
+        created_at["$lt"] = created_to
+    if created_at:
+        query["created_at"] = created_at
+    
+    cursor = models.SMSMessage.get_motor_collection().find(
+        query,
+        projection={column: 1 for column in HISTORY_EXPORT_COLUMNS if column != "id"},
+        batch_size=settings.EXPORT_BATCH_SIZE
+    ).sort(HISTORY_SORT)
+    return export_response(cursor, HISTORY_EXPORT_COLUMNS, "sms_history", format, gzip)
+
+
+@router.get(
+    "/analytics/daily",
+    response_model=List[schemas.SMSDailyStats],
+    summary="Statistiques journalières des SMS",
+    description="""
+    Récupère, pour chaque jour, le nombre de SMS envoyés par l'utilisateur courant
+    et leur répartition par statut actuel. Les compteurs sont précalculés: la requête
+    lit un document par jour, quelle que soit la taille de l'historique.
+    
+    **Paramètres**:
+    - date_from: Premier jour inclus (par défaut: il y a 30 jours)
+    - date_to: Dernier jour exclu (par défaut: demain)
+    
+    **Réponse**:
+    - Liste de jours avec total, pending, sent, delivered et failed
+      (les jours sans SMS sont absents)
+    """
+)
+async def get_daily_analytics(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+) -> Any:
+    """
+    Récupère les statistiques journalières de l'utilisateur courant
+    """
+    today = rollup_date(datetime.utcnow())
+    date_from = rollup_date(date_from) if date_from else today - timedelta(days=30)
+    date_to = date_to or today + timedelta(days=1)
+    return await models.SMSDailyStats.find(
+        {"user_id": str(current_user.id), "date": {"$gte": date_from, "$lt": date_to}}
+    ).sort([("date", ASCENDING)]).to_list()
 
 
 @router.get(
@@ -180,6 +498,8 @@ async def check_sms_status(
             message_id=db_sms.message_id,
             status=status_result["status"]
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
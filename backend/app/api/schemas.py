@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List, Optional
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 
 
 # Base schemas for User
@@ -25,8 +25,7 @@ class UserInDBBase(UserBase):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class User(UserInDBBase):
@@ -69,14 +68,28 @@ class ContactInDBBase(ContactBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class Contact(ContactInDBBase):
     pass
 
 
+# Schemas for bulk contact import
+class ContactImportError(BaseModel):
+    line: int
+    phone_number: Optional[str] = None
+    error: str
+
+
+class ContactImportResponse(BaseModel):
+    total: int
+    inserted: int
+    skipped: int  # Doublons dans le fichier ou numéros déjà enregistrés
+    invalid: int
+    errors: List[ContactImportError]
+
+
 # Base schemas for SMS
 class SMSBase(BaseModel):
     content: str
@@ -98,11 +111,12 @@ class SMSInDBBase(SMSBase):
     sender_id: str  # ID utilisateur représenté en str
     status: str
     message_id: Optional[str] = None
+    encoding: Optional[str] = None  # "GSM-7" ou "UCS-2"
+    segments: Optional[int] = None
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class SMS(SMSInDBBase):
@@ -114,6 +128,99 @@ class SMSSend(BaseModel):
     recipient_number: str = Field(..., description="Numéro de téléphone du destinataire")
     message: str = Field(..., description="Contenu du message")
     recipient_id: Optional[str] = Field(None, description="ID du contact (optionnel)")
+    transliterate: bool = Field(False, description="Remplacer les caractères hors GSM-7 par leur équivalent")
+
+
+# Schemas for bulk SMS sending
+class SMSBulkSend(BaseModel):
+    message: str = Field(..., description="Contenu du message")
+    recipient_numbers: List[str] = Field(default_factory=list, description="Numéros de téléphone des destinataires")
+    recipient_ids: List[str] = Field(default_factory=list, description="IDs des contacts destinataires")
+    transliterate: bool = Field(False, description="Remplacer les caractères hors GSM-7 par leur équivalent")
+
+
+class SMSBulkResult(BaseModel):
+    recipient_number: str
+    recipient_id: Optional[str] = None
+    status: str  # "queued", "sent", "failed" ou "invalid"
+    sms_id: Optional[str] = None
+    message_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class SMSBulkResponse(BaseModel):
+    total: int
+    queued: int
+    sent: int
+    failed: int
+    invalid: int
+    duplicates: int
+    encoding: str
+    segments: int  # Segments facturés par destinataire
+    results: List[SMSBulkResult]
+
+
+# Schemas for SMS preview (encodage et segments)
+class SMSPreview(BaseModel):
+    message: str = Field(..., description="Contenu du message")
+    transliterate: bool = Field(False, description="Remplacer les caractères hors GSM-7 par leur équivalent")
+
+
+class SMSPreviewResponse(BaseModel):
+    message: str  # Message tel qu'il sera envoyé (après translittération éventuelle)
+    encoding: str  # "GSM-7" ou "UCS-2"
+    length: int  # Septets (GSM-7) ou unités UTF-16 (UCS-2)
+    segments: int
+    per_segment: int
+    remaining: int
+    non_gsm_characters: List[str]  # Caractères qui imposent l'encodage UCS-2
+
+
+# Schemas for campaigns
+class CampaignAudience(BaseModel):
+    name_prefix: Optional[str] = Field(None, description="Contacts dont le nom commence par ce texte")
+    phone_prefix: Optional[str] = Field(None, description="Contacts dont le numéro commence par ce préfixe (ex: +22177)")
+    notes_contains: Optional[str] = Field(None, description="Contacts dont les notes contiennent ce texte")
+    created_from: Optional[datetime] = Field(None, description="Contacts créés à partir de cette date")
+    created_to: Optional[datetime] = Field(None, description="Contacts créés avant cette date")
+
+
+class CampaignCreate(BaseModel):
+    name: str = Field(..., description="Nom de la campagne")
+    template: str = Field(..., description="Modèle du message, ex: Bonjour {name}")
+    audience: CampaignAudience = Field(default_factory=CampaignAudience, description="Critères de sélection des contacts")
+    transliterate: bool = Field(False, description="Remplacer les caractères hors GSM-7 par leur équivalent")
+
+
+class Campaign(BaseModel):
+    id: str  # ObjectId de MongoDB représenté en str
+    name: str
+    template: str
+    audience: CampaignAudience
+    transliterate: bool
+    status: str  # "running", "queued", "completed" ou "failed"
+    total: int
+    skipped: int
+    sent: int
+    failed: int
+    last_error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    completed_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# Schema for daily SMS analytics
+class SMSDailyStats(BaseModel):
+    date: datetime  # Jour de création des SMS (minuit UTC)
+    total: int
+    pending: int
+    sent: int
+    delivered: int
+    failed: int
+
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Schema for SMS Delivery Status
@@ -0,0 +1,188 @@
+"""
+Statistiques journalières des SMS par utilisateur (collection sms_daily_stats).
+
+Chaque document compte les SMS créés un jour donné par statut actuel. À chaque
+changement de statut, l'ancien compteur est décrémenté et le nouveau incrémenté
+($inc atomique); les tableaux de bord lisent ainsi quelques dizaines de petits
+documents au lieu d'agréger l'historique. backfill_daily_stats reconstruit les
+compteurs depuis l'historique (mise en place ou correction d'une dérive).
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.results import BulkWriteResult
+
+from app.core.metrics import record_status_transition
+from app.db.models import SMSDailyStats
+
+logger = logging.getLogger(__name__)
+
+# Compteur de chaque statut de SMSMessage
+STATUS_BUCKETS = {
+    "queued": "pending",
+    "processing": "pending",
+    "pending": "pending",
+    "sending": "sent",
+    "sent": "sent",
+    "delivered": "delivered",
+    "failed": "failed"
+}
+COUNTERS = ("total", "pending", "sent", "delivered", "failed")
+
+
+class StatusTransition(NamedTuple):
+    sender_id: str
+    created_at: datetime
+    old_status: Optional[str]  # None: SMS créé
+    new_status: str
+
+
+def rollup_date(created_at: datetime) -> datetime:
+    """
+    Jour (minuit UTC) auquel un SMS est compté
+    """
+    return datetime(created_at.year, created_at.month, created_at.day)
+
+
+def build_rollup_operations(transitions: Iterable[StatusTransition]) -> List[UpdateOne]:
+    """
+    Regroupe des changements de statut en une opération $inc par (utilisateur, jour)
+    """
+    deltas: Dict[Tuple[str, datetime], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    for transition in transitions:
+        old = STATUS_BUCKETS.get(transition.old_status) if transition.old_status else None
+        new = STATUS_BUCKETS.get(transition.new_status)
+        if old == new and transition.old_status is not None:
+            continue
+        counts = deltas[(str(transition.sender_id), rollup_date(transition.created_at))]
+        if transition.old_status is None:
+            counts["total"] += 1
+        if old:
+            counts[old] -= 1
+        if new:
+            counts[new] += 1
+
+    operations = []
+    for (user_id, date), counts in deltas.items():
+        increments = {counter: delta for counter, delta in counts.items() if delta}
+        if increments:
+            operations.append(UpdateOne(
+                {"user_id": user_id, "date": date},
+                {"$inc": increments},
+                upsert=True
+            ))
+    return operations
+
+
+async def record_status_transitions(transitions: Iterable[StatusTransition]) -> None:
+    """
+    Répercute des changements de statut sur les compteurs journaliers.
+    Une erreur est journalisée sans être propagée: les statistiques ne doivent
+    jamais faire échouer un envoi.
+    """
+    transitions = list(transitions)
+    for transition in transitions:
+        record_status_transition(transition.old_status, transition.new_status)
+    operations = build_rollup_operations(transitions)
+    if not operations:
+        return
+    try:
+        await SMSDailyStats.get_motor_collection().bulk_write(operations, ordered=False)
+    except Exception as e:
+        logger.error(f"Erreur lors de la mise à jour des statistiques journalières: {str(e)}")
+
+
+async def applied_transitions(
+    collection: AsyncIOMotorCollection,
+    result: BulkWriteResult,
+    operation_count: int,
+    changes: Dict[ObjectId, StatusTransition],
+    updated_at: datetime
+) -> List[StatusTransition]:
+    """
+    Changements de statut réellement appliqués par un bulk_write dont chaque
+    UpdateOne filtre sur l'ancien statut (un SMS modifié entre-temps n'est pas touché).
+
+    Args:
+        collection: Collection des SMS
+        result: Résultat du bulk_write
+        operation_count: Nombre d'opérations du bulk_write
+        changes: Changement de statut prévu pour chaque SMS (_id)
+        updated_at: Valeur de updated_at écrite par les changements de statut
+
+    Returns:
+        Les changements dont l'opération a trouvé le SMS
+    """
+    if result.matched_count == operation_count:
+        return list(changes.values())
+    # Cas rare (mise à jour concurrente): relecture des SMS portant la date écrite par ce lot
+    applied = await collection.find(
+        {"_id": {"$in": list(changes)}, "updated_at": updated_at},
+        projection={"_id": 1}
+    ).to_list(length=None)
+    return [changes[document["_id"]] for document in applied]
+
+
+async def backfill_daily_stats(db: AsyncIOMotorDatabase, batch_size: int = 1000) -> int:
+    """
+    Reconstruit les compteurs journaliers depuis la collection sms_messages.
+    Les compteurs existants sont remplacés; à lancer de préférence hors des
+    heures d'envoi (un changement de statut concurrent peut être écrasé).
+
+    Returns:
+        int: Nombre de documents (utilisateur, jour) écrits
+    """
+    pipeline = [
+        {"$group": {
+            "_id": {
+                "user_id": "$sender_id",
+                "date": {"$dateFromParts": {
+                    "year": {"$year": "$created_at"},
+                    "month": {"$month": "$created_at"},
+                    "day": {"$dayOfMonth": "$created_at"}
+                }},
+                "status": "$status"
+            },
+            "count": {"$sum": 1}
+        }},
+        {"$sort": {"_id.user_id": 1, "_id.date": 1}}
+    ]
+    stats = db.get_collection(SMSDailyStats.Settings.name)
+
+    written = 0
+    operations: List[UpdateOne] = []
+    current_key = None
+    counts: Dict[str, int] = {}
+
+    def close_group() -> None:
+        if current_key is not None:
+            operations.append(UpdateOne(
+                {"user_id": current_key[0], "date": current_key[1]},
+                {"$set": counts},
+                upsert=True
+            ))
+
+    cursor = db.get_collection("sms_messages").aggregate(pipeline, allowDiskUse=True)
+    async for group in cursor:
+        key = (str(group["_id"]["user_id"]), group["_id"]["date"])
+        if key != current_key:
+            close_group()
+            current_key, counts = key, {counter: 0 for counter in COUNTERS}
+            if len(operations) >= batch_size:
+                written += len(operations)
+                await stats.bulk_write(operations, ordered=False)
+                operations = []
+        counts["total"] += group["count"]
+        bucket = STATUS_BUCKETS.get(group["_id"]["status"])
+        if bucket:
+            counts[bucket] += group["count"]
+    close_group()
+    if operations:
+        written += len(operations)
+        await stats.bulk_write(operations, ordered=False)
+    return written
@@ -0,0 +1,79 @@
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, Tuple, TypeVar
+
+from app.core.config import settings
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """
+    Cache en mémoire du processus, borné en taille (LRU) et en durée (TTL).
+    Conçu pour la boucle asyncio: pas de verrou, aucune opération n'attend.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: V, ttl: Optional[float] = None) -> None:
+        if self.max_size <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        entry = self._data.pop(key, None)
+        return entry[1] if entry else None
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class UserCache:
+    """
+    Caches utilisés par get_current_user pour éviter un décodage JWT et une
+    lecture MongoDB à chaque requête authentifiée:
+    - tokens: token JWT -> ID utilisateur (jamais au-delà de l'expiration du token)
+    - users: ID utilisateur (ou "email:<email>") -> document User
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.tokens: TTLCache[str] = TTLCache(max_size, ttl)
+        self.users: TTLCache = TTLCache(max_size, ttl)
+
+    def invalidate_user(self, user_id: Optional[str], email: Optional[str] = None) -> None:
+        """
+        Retire un utilisateur du cache (mise à jour, désactivation, suppression)
+        """
+        if user_id:
+            self.users.pop(str(user_id))
+        if email:
+            self.users.pop(f"email:{email}")
+
+    def clear(self) -> None:
+        self.tokens.clear()
+        self.users.clear()
+
+
+# Instance partagée par le processus
+user_cache = UserCache(settings.AUTH_CACHE_MAX_SIZE, settings.AUTH_CACHE_TTL_SECONDS)
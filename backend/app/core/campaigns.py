@@ -0,0 +1,342 @@
+"""
+Campagnes de SMS personnalisés ("Bonjour {name}").
+
+Le modèle est compilé une seule fois, puis rendu pour chaque contact de
+l'audience au fil d'un curseur MongoDB: l'audience n'est jamais chargée en
+mémoire. Les SMS sont insérés par lots dans la file d'attente d'envoi et la
+position du dernier contact traité est enregistrée après chaque lot, ce qui
+permet de reprendre une campagne interrompue sans doublon.
+"""
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta
+from string import Formatter
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from app.core.analytics import StatusTransition, record_status_transitions
+from app.core.config import settings
+from app.db.models import Campaign, Contact, SMSMessage
+from app.services.sms_queue import sms_queue
+from app.utils.pagination import keyset_filter
+from app.utils.phone_normalization import normalize_phone
+from app.utils.sms_encoding import analyze_message, transliterate
+
+logger = logging.getLogger(__name__)
+
+# Champs du contact utilisables dans un modèle
+TEMPLATE_FIELDS = ("name", "phone_number", "notes")
+
+# Parcours de l'audience: clé couverte par l'index owner_id_name_id des contacts
+AUDIENCE_SORT = [("name", ASCENDING), ("_id", ASCENDING)]
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class CampaignTemplateError(ValueError):
+    pass
+
+
+class CompiledTemplate:
+    """
+    Modèle de message analysé une seule fois: une liste de couples
+    (texte fixe, champ du contact à insérer ensuite).
+    """
+
+    def __init__(self, template: str):
+        try:
+            parsed = list(Formatter().parse(template))
+        except ValueError as e:
+            raise CampaignTemplateError(f"Modèle invalide: {e}")
+
+        self.parts: List[Tuple[str, Optional[str]]] = []
+        for literal, field, format_spec, conversion in parsed:
+            if field is not None and (field not in TEMPLATE_FIELDS or format_spec or conversion):
+                raise CampaignTemplateError(
+                    f"Champ inconnu dans le modèle: {{{field}}}. "
+                    f"Champs disponibles: {', '.join(TEMPLATE_FIELDS)}"
+                )
+            self.parts.append((literal, field))
+        self.fields = {field for _, field in self.parts if field}
+
+    def render(self, values: Dict[str, Any]) -> str:
+        return "".join([
+            literal + str(values.get(field) or "") if field else literal
+            for literal, field in self.parts
+        ])
+
+
+def build_audience_query(user_id: str, audience: Dict[str, Any]) -> Dict:
+    """
+    Traduit les critères d'audience d'une campagne en filtre MongoDB,
+    toujours limité aux contacts de l'utilisateur
+    """
+    query: Dict[str, Any] = {"owner_id": user_id}
+    if audience.get("name_prefix"):
+        query["name"] = {"$regex": f"^{re.escape(audience['name_prefix'])}"}
+    if audience.get("phone_prefix"):
+        query["phone_number"] = {"$regex": f"^{re.escape(audience['phone_prefix'])}"}
+    if audience.get("notes_contains"):
+        query["notes"] = {"$regex": re.escape(audience["notes_contains"]), "$options": "i"}
+    created_at = {}
+    if audience.get("created_from"):
+        created_at["$gte"] = audience["created_from"]
+    if audience.get("created_to"):
+        created_at["$lt"] = audience["created_to"]
+    if created_at:
+        query["created_at"] = created_at
+    return query
+
+
+async def render_campaign_messages(
+    contacts: AsyncIterator[Dict],
+    template: CompiledTemplate,
+    fold_to_gsm: bool = False
+) -> AsyncIterator[Tuple[Dict, Optional[str], Optional[str]]]:
+    """
+    Rend le message de chaque contact de l'audience, au fil du curseur.
+
+    Returns:
+        Triplets (contact, numéro E.164 ou None, message ou None si le contact est ignoré)
+    """
+    async for contact in contacts:
+        phone_number = normalize_phone(contact.get("phone_number") or "")
+        if phone_number is None:
+            yield contact, None, None
+            continue
+        message = template.render(contact)
+        if fold_to_gsm:
+            message = transliterate(message)
+        yield contact, phone_number, message if message.strip() else None
+
+
+class CampaignRunner:
+    """
+    Crée les SMS des campagnes en cours. Chaque campagne est réservée par un seul
+    processus grâce à un bail renouvelé après chaque lot; une campagne dont le bail
+    a expiré (arrêt du processus) est reprise là où elle s'était arrêtée.
+    """
+
+    def __init__(self):
+        self.batch_size = settings.CAMPAIGN_BATCH_SIZE
+        self.lease = timedelta(seconds=settings.CAMPAIGN_LEASE_SECONDS)
+        self._tasks: Set[asyncio.Task] = set()
+        self._resume_task: Optional[asyncio.Task] = None
+
+    @property
+    def collection(self):
+        return Campaign.get_motor_collection()
+
+    async def claim(self, campaign_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        Réserve une campagne en cours dont le bail est libre ou expiré
+        """
+        now = datetime.utcnow()
+        query: Dict[str, Any] = {
+            "status": "running",
+            "$or": [{"lease_expires_at": None}, {"lease_expires_at": {"$lt": now}}]
+        }
+        if campaign_id:
+            query["_id"] = ObjectId(campaign_id)
+        return await self.collection.find_one_and_update(
+            query,
+            {"$set": {"lease_expires_at": now + self.lease}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def launch(self, campaign_id: str) -> None:
+        """
+        Démarre la création des SMS d'une campagne dans une tâche de fond
+        """
+        campaign = await self.claim(campaign_id)
+        if campaign is not None:
+            self._spawn(campaign)
+
+    def _spawn(self, campaign: Dict) -> None:
+        task = asyncio.create_task(self.run(campaign), name=f"campaign-{campaign['_id']}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def run(self, campaign: Dict) -> None:
+        """
+        Rend et insère les SMS d'une campagne réservée, lot par lot
+        """
+        campaign_id = campaign["_id"]
+        lease = campaign["lease_expires_at"]
+        try:
+            template = CompiledTemplate(campaign["template"])
+            query = build_audience_query(str(campaign["owner_id"]), campaign.get("audience") or {})
+            if campaign.get("resume_after"):
+                query.update(keyset_filter(AUDIENCE_SORT, campaign["resume_after"]))
+            projection = {field: 1 for field in template.fields | {"name", "phone_number"}}
+            cursor = Contact.get_motor_collection().find(
+                query, projection=projection, batch_size=self.batch_size
+            ).sort(AUDIENCE_SORT)
+
+            batch: List[SMSMessage] = []
+            skipped = 0
+            last_contact = None
+            async for contact, phone_number, message in render_campaign_messages(
+                cursor, template, campaign.get("transliterate", False)
+            ):
+                last_contact = contact
+                if message is None:
+                    skipped += 1
+                else:
+                    batch.append(self._build_message(campaign, contact, phone_number, message))
+                if len(batch) + skipped >= self.batch_size:
+                    lease = await self._flush(campaign_id, lease, batch, skipped, last_contact)
+                    if lease is None:
+                        return
+                    batch, skipped = [], 0
+
+            if batch or skipped:
+                lease = await self._flush(campaign_id, lease, batch, skipped, last_contact)
+                if lease is None:
+                    return
+            await self._finish(campaign_id, lease)
+        except Exception as e:
+            logger.exception(f"Échec de la campagne {campaign_id}")
+            await self.collection.update_one(
+                {"_id": campaign_id, "lease_expires_at": lease},
+                {"$set": {"status": "failed", "last_error": str(e), "updated_at": datetime.utcnow()},
+                 "$unset": {"lease_expires_at": ""}}
+            )
+
+    @staticmethod
+    def _build_message(campaign: Dict, contact: Dict, phone_number: str, message: str) -> SMSMessage:
+        encoding_info = analyze_message(message)
+        return SMSMessage(
+            content=message,
+            recipient_number=phone_number,
+            sender_id=str(campaign["owner_id"]),
+            recipient_id=str(contact["_id"]),
+            campaign_id=str(campaign["_id"]),
+            encoding=encoding_info.encoding,
+            segments=encoding_info.segments,
+            status="queued",
+            next_attempt_at=datetime.utcnow()
+        )
+
+    async def _flush(
+        self,
+        campaign_id: ObjectId,
+        lease: datetime,
+        batch: List[SMSMessage],
+        skipped: int,
+        last_contact: Dict
+    ) -> Optional[datetime]:
+        """
+        Insère un lot de SMS, met à jour la progression et renouvelle le bail.
+
+        Returns:
+            La nouvelle fin du bail, ou None si la campagne a été reprise par un autre processus
+        """
+        inserted = 0
+        if batch:
+            duplicates = set()
+            try:
+                await SMSMessage.insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                # SMS déjà créés avant une interruption: l'index unique (campaign_id, recipient_id) les écarte
+                write_errors = (e.details or {}).get("writeErrors", [])
+                if any(error.get("code") != DUPLICATE_KEY_ERROR for error in write_errors):
+                    raise
+                duplicates = {error["index"] for error in write_errors}
+            sms_queue.notify()
+            created = [sms for index, sms in enumerate(batch) if index not in duplicates]
+            inserted = len(created)
+            await record_status_transitions(
+                StatusTransition(sms.sender_id, sms.created_at, None, "queued") for sms in created
+            )
+
+        now = datetime.utcnow()
+        # MongoDB conserve les dates à la milliseconde: le bail sert ensuite de filtre d'égalité
+        new_lease = now + self.lease
+        new_lease = new_lease.replace(microsecond=new_lease.microsecond // 1000 * 1000)
+        result = await self.collection.update_one(
+            {"_id": campaign_id, "status": "running", "lease_expires_at": lease},
+            {
+                "$inc": {"total": inserted, "skipped": skipped},
+                "$set": {
+                    "resume_after": [last_contact["name"], last_contact["_id"]],
+                    "lease_expires_at": new_lease,
+                    "updated_at": now
+                }
+            }
+        )
+        if not result.modified_count:
+            logger.warning(f"Campagne {campaign_id}: bail perdu, création des SMS interrompue")
+            return None
+        return new_lease
+
+    async def _finish(self, campaign_id: ObjectId, lease: datetime) -> None:
+        """
+        Tous les SMS sont dans la file: la campagne attend la fin des envois
+        """
+        now = datetime.utcnow()
+        await self.collection.update_one(
+            {"_id": campaign_id, "status": "running", "lease_expires_at": lease},
+            {"$set": {"status": "queued", "updated_at": now}, "$unset": {"lease_expires_at": ""}}
+        )
+        # Les envois ont pu se terminer pendant la création des derniers SMS
+        await self.collection.update_one(
+            {
+                "_id": campaign_id,
+                "status": "queued",
+                "$expr": {"$gte": [{"$add": ["$sent", "$failed"]}, "$total"]}
+            },
+            {"$set": {"status": "completed", "completed_at": now}}
+        )
+        logger.info(f"Campagne {campaign_id}: tous les SMS sont dans la file d'attente")
+
+    async def resume_expired(self) -> int:
+        """
+        Reprend les campagnes en cours dont le bail a expiré
+
+        Returns:
+            int: Nombre de campagnes reprises
+        """
+        resumed = 0
+        while True:
+            campaign = await self.claim()
+            if campaign is None:
+                return resumed
+            logger.info(f"Reprise de la campagne {campaign['_id']}")
+            self._spawn(campaign)
+            resumed += 1
+
+    async def _resume_loop(self) -> None:
+        while True:
+            try:
+                await self.resume_expired()
+            except Exception as e:
+                logger.error(f"Erreur lors de la reprise des campagnes: {e}")
+            await asyncio.sleep(self.lease.total_seconds())
+
+    def start(self) -> None:
+        """
+        Lance la reprise périodique des campagnes interrompues (appelé au démarrage)
+        """
+        if self._resume_task is None:
+            self._resume_task = asyncio.create_task(self._resume_loop(), name="campaign-resume")
+
+    async def stop(self) -> None:
+        """
+        Interrompt les campagnes en cours; elles seront reprises à l'expiration du bail
+        """
+        tasks = list(self._tasks)
+        if self._resume_task is not None:
+            tasks.append(self._resume_task)
+            self._resume_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Instance singleton pour l'utilisation dans l'application
+campaign_runner = CampaignRunner()
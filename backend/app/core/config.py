@@ -10,6 +10,18 @@ class Settings(BaseSettings):
     SECRET_KEY: str = secrets.token_urlsafe(32)
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # Cache en mémoire des tokens décodés et des utilisateurs authentifiés
+    AUTH_CACHE_TTL_SECONDS: int = 60  # Délai max avant relecture de l'utilisateur en base
+    AUTH_CACHE_MAX_SIZE: int = 10000  # Entrées max par cache (0 = cache désactivé)
+    # TEMPORAIRE: seconde recherche sur l'email exact pour les comptes sans email_normalized.
+    # À activer seulement tant que backfill_normalized_emails n'a pas été exécuté
+    # (python -m app.db.migrations); double les allers-retours des connexions échouées.
+    AUTH_LEGACY_EMAIL_LOOKUP: bool = False
+    # Hachage des mots de passe (bcrypt), exécuté hors de la boucle asyncio
+    BCRYPT_ROUNDS: int = 12  # Coût bcrypt; les hashs d'un autre coût sont recalculés à la connexion
+    PASSWORD_HASH_WORKERS: int = 2  # Threads dédiés au calcul bcrypt
+    PASSWORD_HASH_MAX_PENDING: int = 32  # Calculs en cours ou en attente au maximum
+    PASSWORD_HASH_QUEUE_TIMEOUT: float = 5.0  # Attente max d'une place avant de répondre 503
     
     # CORS settings
     # Pour le développement, autoriser toutes les origines en local
@@ -30,12 +42,116 @@ class Settings(BaseSettings):
     # L'URL sera chargée depuis le fichier .env
     MONGODB_URL: str = ""
     MONGODB_DB_NAME: str = "sms_orange" 
+    # Pool de connexions du client Motor partagé par tout le processus
+    MONGODB_MAX_POOL_SIZE: int = 100
+    MONGODB_MIN_POOL_SIZE: int = 0
+    MONGODB_MAX_IDLE_TIME_MS: int = 60000
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 10000  # 10 secondes max
+    MONGODB_CONNECT_TIMEOUT_MS: int = 10000
+    MONGODB_SOCKET_TIMEOUT_MS: int = 10000
+    # Synchroniser les index au démarrage. Sinon, aucun index n'est créé au démarrage:
+    # lancer python -m app.db.migrations avant chaque déploiement qui en ajoute
+    MONGODB_MIGRATE_ON_STARTUP: bool = False
     # Orange API configuration
     ORANGE_CLIENT_ID: str = ""
     ORANGE_CLIENT_SECRET: str = ""
     ORANGE_AUTH_URL: str = "https://api.orange.com/oauth/v3/token"
     ORANGE_SMS_URL: str = "https://api.orange.com/smsmessaging/v1/outbound"
     ORANGE_SENDER_NAME: str = "API"  # Nom de l'expéditeur affiché
+
+    # Client HTTP partagé pour l'API Orange (pool de connexions keep-alive)
+    ORANGE_HTTP_MAX_CONNECTIONS: int = 100  # Connexions simultanées maximum
+    ORANGE_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20  # Connexions gardées ouvertes au repos
+    ORANGE_HTTP_KEEPALIVE_EXPIRY: float = 30.0  # Secondes avant fermeture d'une connexion inactive
+    ORANGE_HTTP2: bool = False  # Multiplexage HTTP/2 (nécessite le paquet "h2")
+    ORANGE_HTTP_TIMEOUT: float = 10.0  # Timeout global (lecture/écriture/pool) en secondes
+    ORANGE_HTTP_CONNECT_TIMEOUT: float = 5.0  # Timeout d'établissement de connexion en secondes
+
+    # Token OAuth Orange
+    ORANGE_TOKEN_REFRESH_MARGIN: int = 300  # Renouveler le token 5 minutes avant son expiration
+    ORANGE_TOKEN_DEFAULT_EXPIRES_IN: int = 3600  # Durée utilisée si la réponse ne contient pas expires_in
+
+    # Nouvelles tentatives et disjoncteur autour des appels Orange
+    ORANGE_RETRY_MAX_ATTEMPTS: int = 3  # Tentatives par appel (1 = pas de nouvelle tentative)
+    ORANGE_RETRY_BASE_DELAY: float = 0.5  # Délai de base du backoff exponentiel (secondes)
+    ORANGE_RETRY_MAX_DELAY: float = 10.0  # Délai maximum entre deux tentatives (et Retry-After accepté)
+    ORANGE_BREAKER_FAILURE_THRESHOLD: int = 5  # Échecs consécutifs avant ouverture du circuit
+    ORANGE_BREAKER_RESET_TIMEOUT: float = 30.0  # Secondes avant un appel de test
+
+    # Limitation du débit d'envoi (doit rester sous le débit du contrat Orange)
+    ORANGE_RATE_LIMIT_PER_SECOND: float = 5.0  # Envois par seconde (0 = pas de limite)
+    ORANGE_RATE_LIMIT_BURST: int = 5  # Envois autorisés en rafale
+    ORANGE_RATE_LIMIT_BACKEND: str = "local"  # "local" (par processus) ou "mongodb" (partagé entre workers)
+
+    # Accusés de réception poussés par Orange (notifyURL)
+    # URL publique de l'endpoint /sms/delivery-receipts (vide = pas d'enregistrement du callback)
+    ORANGE_DELIVERY_NOTIFY_URL: str = ""
+    # Jeton attendu dans le paramètre "token" du callback, ajouté à notifyURL lors de l'envoi.
+    # Obligatoire dès que ORANGE_DELIVERY_NOTIFY_URL est configurée; sans jeton, le callback refuse tout.
+    ORANGE_DELIVERY_CALLBACK_TOKEN: str = ""
+    DELIVERY_RECEIPT_BATCH_SIZE: int = 500  # Accusés écrits par bulk_write
+    DELIVERY_RECEIPT_FLUSH_INTERVAL: float = 1.0  # Délai max (secondes) avant écriture d'un lot
+
+    @validator("ORANGE_DELIVERY_CALLBACK_TOKEN")
+    def require_callback_token(cls, v: str, values: Dict[str, Any]) -> str:
+        if values.get("ORANGE_DELIVERY_NOTIFY_URL") and not v:
+            raise ValueError("ORANGE_DELIVERY_CALLBACK_TOKEN est obligatoire quand ORANGE_DELIVERY_NOTIFY_URL est configurée")
+        return v
+
+    # Réconciliation périodique des statuts "sent"/"pending" restés sans évolution
+    SMS_RECONCILE_ENABLED: bool = True
+    SMS_RECONCILE_INTERVAL_SECONDS: int = 60  # Intervalle entre deux passes
+    SMS_RECONCILE_STALE_AFTER_SECONDS: int = 300  # Ancienneté minimale du dernier changement de statut
+    SMS_RECONCILE_BATCH_SIZE: int = 200  # SMS vérifiés par lot (une écriture groupée par lot)
+    SMS_RECONCILE_CONCURRENCY: int = 10  # Appels simultanés à l'API Orange
+    SMS_RECONCILE_BACKOFF_BASE_SECONDS: int = 300  # Délai de base entre deux vérifications d'un même SMS
+    SMS_RECONCILE_BACKOFF_MAX_SECONDS: int = 21600  # Délai maximum (6 heures)
+    SMS_RECONCILE_MAX_CHECKS: int = 20  # Vérifications sans changement avant abandon
+
+    # Envoi groupé de SMS
+    SMS_BULK_MAX_RECIPIENTS: int = 10000  # Nombre maximum de destinataires par requête
+    SMS_BULK_CONCURRENCY: int = 20  # Appels simultanés à l'API Orange pendant un envoi groupé
+
+    # File d'attente d'envoi persistante (MongoDB) et pool de workers
+    SMS_QUEUE_ENABLED: bool = True  # False: envoi synchrone pendant la requête HTTP
+    SMS_QUEUE_WORKERS: int = 10  # Nombre de workers asyncio par processus
+    SMS_QUEUE_LEASE_SECONDS: int = 60  # Durée du bail d'un worker sur un SMS
+    SMS_QUEUE_POLL_INTERVAL: float = 1.0  # Attente max (secondes) d'un worker inactif
+    SMS_QUEUE_MAX_ATTEMPTS: int = 5  # Tentatives avant de passer le SMS en "failed"
+    SMS_QUEUE_RETRY_BASE_DELAY: float = 5.0  # Délai de base (secondes) du backoff exponentiel
+    SMS_QUEUE_RETRY_MAX_DELAY: float = 300.0  # Délai maximum entre deux tentatives
+    
+    # Idempotence de l'envoi (en-tête Idempotency-Key)
+    SMS_IDEMPOTENCY_TTL_SECONDS: int = 86400  # Durée pendant laquelle une clé renvoie le SMS d'origine
+    SMS_IDEMPOTENCY_WAIT_TIMEOUT: float = 30.0  # Attente max d'une requête d'origine encore en cours
+    
+    # Import de contacts en masse (CSV / NDJSON)
+    CONTACT_IMPORT_CHUNK_SIZE: int = 1000  # Lignes validées et insérées par lot
+    CONTACT_IMPORT_MAX_ERRORS_REPORTED: int = 100  # Lignes en erreur détaillées dans la réponse
+    # Enregistrement CSV sur plusieurs lignes (champ entre guillemets): au-delà, guillemet considéré non refermé
+    CONTACT_IMPORT_MAX_RECORD_LINES: int = 20
+    CONTACT_IMPORT_MAX_RECORD_SIZE: int = 10000  # Caractères
+    
+    # Campagnes personnalisées
+    CAMPAIGN_BATCH_SIZE: int = 500  # Contacts rendus et SMS insérés par lot
+    CAMPAIGN_LEASE_SECONDS: int = 120  # Bail d'un processus sur une campagne en cours de création
+    
+    # Normalisation des numéros de téléphone (voir app.utils.phone_normalization)
+    PHONE_DEFAULT_COUNTRY: str = "SN"  # Pays des numéros saisis sans indicatif
+    PHONE_ALLOWED_COUNTRIES: List[str] = ["SN"]  # Pays acceptés (codes ISO, ex: ["SN", "CI", "ML"])
+    PHONE_NORMALIZATION_CACHE_SIZE: int = 65536  # Numéros normalisés gardés en cache (LRU)
+    
+    # Export en flux des contacts et de l'historique des SMS
+    EXPORT_BATCH_SIZE: int = 1000  # Documents lus par aller-retour avec MongoDB
+    
+    # Métriques Prometheus (endpoint /metrics)
+    METRICS_ENABLED: bool = True
+    
+    # Journalisation structurée, écrite par un thread dédié (voir app.core.logging_config)
+    LOG_LEVEL: str = "INFO"  # Niveau par défaut de tous les loggers
+    LOG_FORMAT: str = "json"  # "json" (une ligne JSON par événement) ou "text"
+    # Niveaux par module, ex: {"app.services.orange_api": "DEBUG", "app.db.commands": "DEBUG"}
+    LOG_LEVELS: Dict[str, str] = {}
     
     class Config:
         case_sensitive = True
@@ -0,0 +1,242 @@
+"""
+Import de contacts en masse depuis un fichier CSV ou NDJSON.
+
+Le fichier est lu au fil de l'eau (jamais entièrement en mémoire) et traité par
+lots: une seule requête $in par lot pour écarter les numéros déjà enregistrés,
+puis un insert_many non ordonné.
+"""
+import codecs
+import csv
+import json
+from collections import deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Deque, Dict, List, Tuple
+
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.db.models import Contact
+from app.utils.phone_normalization import normalize_phone
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# Colonnes reconnues dans l'en-tête CSV (insensibles à la casse)
+CSV_COLUMNS = {"name", "phone_number", "notes"}
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class ContactImportError(ValueError):
+    """
+    Fichier inexploitable dans son ensemble (en-tête absent ou incomplet)
+    """
+    pass
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Découpe un flux d'octets UTF-8 en lignes numérotées (à partir de 1).
+    Le BOM éventuel est ignoré et les fins de ligne Windows sont acceptées.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    line_no = 0
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            line_no += 1
+            yield line_no, line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield line_no + 1, pending.rstrip("\r")
+
+
+async def iter_csv_rows(lines: AsyncIterator[Tuple[int, str]]) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Lit les enregistrements d'un CSV avec en-tête (séparateur "," ou ";").
+    Un champ entre guillemets peut s'étendre sur plusieurs lignes, dans la limite
+    de CONTACT_IMPORT_MAX_RECORD_LINES lignes et CONTACT_IMPORT_MAX_RECORD_SIZE
+    caractères. Au-delà (ou en fin de fichier), le guillemet est considéré comme
+    jamais refermé: la première ligne est rejetée et les suivantes sont relues.
+
+    Returns:
+        Couples (numéro de la première ligne de l'enregistrement, dict des colonnes ou None)
+    """
+    header = None
+    delimiter = ","
+    record: List[Tuple[int, str]] = []  # Lignes de l'enregistrement en cours
+    quotes = 0
+    size = 0
+    replay: Deque[Tuple[int, str]] = deque()
+    source = lines.__aiter__()
+    while True:
+        if replay:
+            line_no, line = replay.popleft()
+        else:
+            try:
+                line_no, line = await source.__anext__()
+            except StopAsyncIteration:
+                if not record:
+                    break
+                line_no = None
+
+        if line_no is not None:
+            record.append((line_no, line))
+            # Compteurs incrémentaux: chaque ligne n'est parcourue qu'une fois
+            quotes += line.count('"')
+            size += len(line) + 1
+            # Nombre impair de guillemets: le champ continue sur la ligne suivante
+            if quotes % 2 and len(record) < settings.CONTACT_IMPORT_MAX_RECORD_LINES \
+                    and size <= settings.CONTACT_IMPORT_MAX_RECORD_SIZE:
+                continue
+
+        if quotes % 2:
+            yield record[0][0], None
+            replay.extendleft(reversed(record[1:]))
+            record, quotes, size = [], 0, 0
+            continue
+
+        record_line = record[0][0]
+        text = "\n".join(part for _, part in record)
+        record, quotes, size = [], 0, 0
+        if not text.strip():
+            continue
+
+        if header is None:
+            delimiter = ";" if text.count(";") > text.count(",") else ","
+            header = [column.strip().lower() for column in next(csv.reader([text], delimiter=delimiter))]
+            missing = {"name", "phone_number"} - set(header)
+            if missing:
+                raise ContactImportError(
+                    f"Colonnes manquantes dans l'en-tête CSV: {', '.join(sorted(missing))}"
+                )
+            continue
+
+        values = next(csv.reader([text], delimiter=delimiter))
+        yield record_line, {
+            column: value for column, value in zip(header, values) if column in CSV_COLUMNS
+        }
+
+    if header is None:
+        raise ContactImportError("Fichier CSV vide ou sans en-tête")
+
+
+async def iter_ndjson_rows(lines: AsyncIterator[Tuple[int, str]]) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Lit un objet JSON par ligne. Une ligne illisible produit un enregistrement None.
+    """
+    async for line_no, line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_no, row if isinstance(row, dict) else None
+
+
+async def _insert_chunk(user_id: str, chunk: List[Dict], result: Dict) -> None:
+    """
+    Insère un lot de contacts valides et dédoublonnés dans le lot, en écartant
+    ceux dont le numéro est déjà enregistré pour l'utilisateur.
+    """
+    numbers = [row["phone_number"] for row in chunk]
+    existing = {
+        contact["phone_number"]
+        for contact in await Contact.get_motor_collection().find(
+            {"owner_id": user_id, "phone_number": {"$in": numbers}},
+            projection={"phone_number": 1, "_id": 0}
+        ).to_list(length=None)
+    }
+
+    now = datetime.utcnow()
+    documents = []
+    for row in chunk:
+        if row["phone_number"] in existing:
+            result["skipped"] += 1
+            continue
+        documents.append(Contact(**row, owner_id=user_id, created_at=now, updated_at=now))
+    if not documents:
+        return
+
+    try:
+        await Contact.insert_many(documents, ordered=False)
+        result["inserted"] += len(documents)
+    except BulkWriteError as e:
+        # L'index unique (owner_id, phone_number) couvre un import concurrent du même numéro
+        details = e.details or {}
+        result["inserted"] += details.get("nInserted", 0)
+        write_errors = details.get("writeErrors", [])
+        duplicates = sum(1 for error in write_errors if error.get("code") == DUPLICATE_KEY_ERROR)
+        result["skipped"] += duplicates
+        if duplicates != len(write_errors):
+            raise
+
+
+async def import_contacts(
+    user_id: str,
+    chunks: AsyncIterator[bytes],
+    file_format: str = "csv"
+) -> Dict:
+    """
+    Importe des contacts depuis un flux CSV ou NDJSON.
+
+    Args:
+        user_id: ID de l'utilisateur propriétaire des contacts
+        chunks: Flux d'octets du fichier (corps de la requête)
+        file_format: "csv" (en-tête name, phone_number, notes) ou "ndjson"
+
+    Returns:
+        Dict avec les compteurs total, inserted, skipped, invalid et les lignes en erreur
+    """
+    result = {"total": 0, "inserted": 0, "skipped": 0, "invalid": 0, "errors": []}
+
+    def reject(line: int, phone_number: Any, error: str) -> None:
+        result["invalid"] += 1
+        if len(result["errors"]) < settings.CONTACT_IMPORT_MAX_ERRORS_REPORTED:
+            result["errors"].append({
+                "line": line,
+                "phone_number": str(phone_number) if phone_number is not None else None,
+                "error": error
+            })
+
+    lines = iter_lines(chunks)
+    rows = iter_ndjson_rows(lines) if file_format == "ndjson" else iter_csv_rows(lines)
+
+    # Lot en cours, par numéro: un doublon du lot est écarté ici, un doublon d'un
+    # lot précédent par la requête $in (ou l'index unique) de _insert_chunk
+    chunk: Dict[str, Dict] = {}
+    async for line, row in rows:
+        result["total"] += 1
+        if row is None:
+            reject(line, None, "Ligne illisible")
+            continue
+
+        name = str(row.get("name") or "").strip()
+        raw_number = row.get("phone_number")
+        if not name:
+            reject(line, raw_number, "Nom manquant")
+            continue
+        formatted_number = normalize_phone(str(raw_number or ""))
+        if formatted_number is None:
+            reject(line, raw_number, "Format de numéro invalide")
+            continue
+        if formatted_number in chunk:
+            result["skipped"] += 1
+            continue
+
+        notes = row.get("notes")
+        chunk[formatted_number] = {
+            "name": name,
+            "phone_number": formatted_number,
+            "notes": str(notes) if notes not in (None, "") else None
+        }
+        if len(chunk) >= settings.CONTACT_IMPORT_CHUNK_SIZE:
+            await _insert_chunk(user_id, list(chunk.values()), result)
+            chunk = {}
+
+    if chunk:
+        await _insert_chunk(user_id, list(chunk.values()), result)
+    return result
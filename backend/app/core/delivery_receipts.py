@@ -0,0 +1,217 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+
+from app.core.analytics import StatusTransition, applied_transitions, record_status_transitions
+from app.core.config import settings
+from app.core.sms import STATUS_MAPPING, is_status_downgrade
+from app.db.models import DeliveryReceipt, SMSMessage
+
+logger = logging.getLogger(__name__)
+
+
+def parse_delivery_notifications(payload: Any) -> List[Tuple[str, str]]:
+    """
+    Extrait les accusés de réception d'une notification Orange.
+
+    Accepte une notification unique ou une liste de notifications au format:
+    {"deliveryInfoNotification": {"callbackData": "...", "deliveryInfo": {"address": "...", "deliveryStatus": "..."}}}
+
+    Returns:
+        Liste de tuples (ID du SMSMessage, statut de livraison Orange)
+    """
+    notifications = payload if isinstance(payload, list) else [payload]
+    receipts = []
+    for notification in notifications:
+        if not isinstance(notification, dict):
+            continue
+        body = notification.get("deliveryInfoNotification", notification)
+        sms_id = body.get("callbackData")
+        delivery_info = body.get("deliveryInfo") or {}
+        if isinstance(delivery_info, list):
+            delivery_info = delivery_info[0] if delivery_info else {}
+        delivery_status = delivery_info.get("deliveryStatus")
+        if sms_id and delivery_status:
+            receipts.append((sms_id, delivery_status))
+    return receipts
+
+
+def latest_receipt_statuses(receipts: List[Tuple[str, str]]) -> Dict[ObjectId, str]:
+    """
+    Convertit des accusés de réception en statuts internes.
+    Seul le dernier accusé reçu pour un même SMS est conservé.
+    """
+    latest: Dict[ObjectId, str] = {}
+    for sms_id, delivery_status in receipts:
+        new_status = STATUS_MAPPING.get(delivery_status)
+        if new_status is None:
+            continue
+        try:
+            latest[ObjectId(sms_id)] = new_status
+        except (InvalidId, TypeError):
+            continue
+    return latest
+
+
+def build_receipt_operations(
+    latest: Dict[ObjectId, str],
+    messages: List[Dict],
+    now: datetime
+) -> Tuple[List[UpdateOne], Dict[ObjectId, StatusTransition]]:
+    """
+    Construit les mises à jour groupées des SMS concernés par des accusés de réception.
+
+    Args:
+        latest: Nouveau statut de chaque SMS (voir latest_receipt_statuses)
+        messages: État actuel de ces SMS (_id, status, sender_id, created_at)
+        now: Date écrite dans updated_at
+
+    Returns:
+        Tuple contenant (opérations pour bulk_write, changement de statut prévu pour chaque SMS)
+    """
+    operations = []
+    transitions = {}
+    for message in messages:
+        new_status = latest[message["_id"]]
+        old_status = message.get("status")
+        # Un accusé intermédiaire ("sending") n'écrase pas un statut définitif
+        if old_status == new_status or is_status_downgrade(old_status, new_status):
+            continue
+        # Le filtre sur l'ancien statut évite d'écraser une mise à jour arrivée entre-temps
+        operations.append(UpdateOne(
+            {"_id": message["_id"], "status": old_status},
+            {"$set": {"status": new_status, "updated_at": now}}
+        ))
+        transitions[message["_id"]] = StatusTransition(
+            message["sender_id"], message["created_at"], old_status, new_status
+        )
+    return operations, transitions
+
+
+class DeliveryReceiptBuffer:
+    """
+    Tampon des accusés de réception reçus sur le callback.
+
+    Les accusés sont enregistrés dans la collection "delivery_receipts" avant
+    la réponse à Orange: un arrêt du processus ne perd donc aucun accusé
+    acquitté. La tâche de fond les applique ensuite aux SMS par lots avec
+    bulk_write, dès que DELIVERY_RECEIPT_BATCH_SIZE accusés sont arrivés ou au
+    plus tard après DELIVERY_RECEIPT_FLUSH_INTERVAL secondes, puis les supprime.
+    """
+
+    def __init__(self):
+        self.batch_size = settings.DELIVERY_RECEIPT_BATCH_SIZE
+        self.flush_interval = settings.DELIVERY_RECEIPT_FLUSH_INTERVAL
+        self._received = 0
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def add(self, receipts: List[Tuple[str, str]]) -> None:
+        """
+        Enregistre des accusés en attente d'écriture. Sans tâche de fond
+        (scripts, tests), les accusés sont écrits immédiatement.
+        """
+        if self._task is None:
+            await self.write(receipts)
+            return
+        now = datetime.utcnow()
+        await DeliveryReceipt.get_motor_collection().insert_many([
+            {"sms_id": sms_id, "delivery_status": delivery_status, "received_at": now}
+            for sms_id, delivery_status in receipts
+        ])
+        self._received += len(receipts)
+        if self._received >= self.batch_size:
+            self._full.set()
+
+    async def write(self, receipts: List[Tuple[str, str]]) -> int:
+        """
+        Écrit un lot d'accusés: une lecture des SMS concernés puis une seule opération bulk_write
+        """
+        latest = latest_receipt_statuses(receipts)
+        if not latest:
+            return 0
+        collection = SMSMessage.get_motor_collection()
+        messages = await collection.find(
+            {"_id": {"$in": list(latest)}},
+            projection={"status": 1, "sender_id": 1, "created_at": 1}
+        ).to_list(length=None)
+        now = datetime.utcnow()
+        operations, transitions = build_receipt_operations(latest, messages, now)
+        if not operations:
+            return 0
+        result = await collection.bulk_write(operations, ordered=False)
+        await record_status_transitions(
+            await applied_transitions(collection, result, len(operations), transitions, now)
+        )
+        return result.modified_count
+
+    async def flush(self) -> None:
+        """
+        Applique tous les accusés enregistrés, par lots de `batch_size`, dans l'ordre d'arrivée.
+
+        Un lot n'est supprimé qu'après son écriture: après un arrêt brutal, il
+        est rejoué sans effet de bord (le filtre sur l'ancien statut écarte les
+        SMS déjà mis à jour).
+        """
+        self._received = 0
+        receipts_collection = DeliveryReceipt.get_motor_collection()
+        while True:
+            documents = await receipts_collection.find(
+                {}, projection={"sms_id": 1, "delivery_status": 1}
+            ).sort("_id", 1).limit(self.batch_size).to_list(length=None)
+            if not documents:
+                return
+            try:
+                await self.write([(document["sms_id"], document["delivery_status"]) for document in documents])
+            except Exception as e:
+                # Le lot reste en base et sera repris au prochain passage
+                logger.error(f"Erreur lors de l'écriture de {len(documents)} accusés de réception: {str(e)}")
+                return
+            await receipts_collection.delete_many({"_id": {"$in": [document["_id"] for document in documents]}})
+
+    def start(self) -> None:
+        """
+        Démarre la tâche d'écriture périodique
+        """
+        if self._task is None:
+            self._stopping = False
+            self._full = asyncio.Event()
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """
+        Arrête la tâche d'écriture et applique les accusés restants
+        """
+        if self._task is not None:
+            # Pas d'annulation: un lot en cours d'écriture serait rejoué au démarrage suivant
+            self._stopping = True
+            self._full.set()
+            await self._task
+            self._task = None
+            await self._flush_safely()
+
+    async def _flush_safely(self) -> None:
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Erreur lors de la lecture des accusés de réception en attente: {str(e)}")
+
+    async def _flush_loop(self) -> None:
+        # Reprend aussi les accusés enregistrés avant un arrêt du processus
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self._flush_safely()
+
+
+# Instance singleton pour l'utilisation dans l'application
+delivery_receipt_buffer = DeliveryReceiptBuffer()
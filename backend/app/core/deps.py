@@ -1,3 +1,4 @@
+import time
 from typing import Optional
 
 from beanie import PydanticObjectId
@@ -9,6 +10,7 @@ from pydantic import ValidationError
 
 from app.api import schemas
 from app.core import security
+from app.core.cache import user_cache
 from app.core.config import settings
 from app.db import models
 from app.db.database import get_db
@@ -18,26 +20,64 @@ oauth2_scheme = OAuth2PasswordBearer(
 )
 
 
+def _decode_token(token: str) -> str:
+    """
+    Décode le JWT et retourne l'ID utilisateur, avec mise en cache du résultat
+    jusqu'à l'expiration du token (au plus AUTH_CACHE_TTL_SECONDS)
+    """
+    user_id = user_cache.tokens.get(token)
+    if user_id is not None:
+        return user_id
+    
+    try:
+        payload = jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
+        )
+        token_data = schemas.TokenPayload(**payload)
+    except (jwt.JWTError, ValidationError):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Impossible de valider les identifiants",
+        )
+    
+    if not token_data.sub:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Impossible de valider les identifiants",
+        )
+    expires_in = payload.get("exp", 0) - time.time()
+    if expires_in > 0:
+        user_cache.tokens.set(token, token_data.sub, ttl=expires_in)
+    return token_data.sub
+
+
 async def get_current_user(
     db: AsyncIOMotorDatabase = Depends(get_db), token: str = Depends(oauth2_scheme)
 ) -> models.User:
     """
-    Valide le JWT token et retourne l'utilisateur courant
+    Valide le JWT token et retourne l'utilisateur courant.
+    Le token décodé et l'utilisateur sont gardés en cache (AUTH_CACHE_TTL_SECONDS);
+    le cache est invalidé à chaque mise à jour de l'utilisateur.
     """
     # Mode de développement - permettre d'accéder sans token valide
     dev_mode = True  # Désactiver en production
     
     if dev_mode:
+        cache_key = "email:user@example.com"
+        test_user = user_cache.users.get(cache_key)
+        if test_user:
+            return test_user
+        
         # Vérifier si un utilisateur de test existe déjà
         test_user = await models.User.find_one({"email": "user@example.com"})
         if test_user:
+            user_cache.users.set(cache_key, test_user)
             return test_user
             
         # Créer un utilisateur de test si nécessaire
-        from app.core.security import get_password_hash
         new_test_user = models.User(
             email="user@example.com",
-            hashed_password=get_password_hash("password"),
+            hashed_password=await security.get_password_hash_async("password"),
             full_name="Utilisateur Test",
             is_active=True
         )
@@ -45,19 +85,13 @@ async def get_current_user(
         return new_test_user
     
     # Mode normal (production) - validation complète du token
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
-        )
-        token_data = schemas.TokenPayload(**payload)
-    except (jwt.JWTError, ValidationError):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Impossible de valider les identifiants",
-        )
+    user_id = _decode_token(token)
     
-    user_id = token_data.sub
-    user = await models.User.get(PydanticObjectId(user_id))
+    user = user_cache.users.get(user_id)
+    if user is None:
+        user = await models.User.get(PydanticObjectId(user_id))
+        if user:
+            user_cache.users.set(user_id, user)
     
     if not user:
         raise HTTPException(
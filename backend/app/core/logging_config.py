@@ -0,0 +1,189 @@
+"""
+Journalisation structurée (une ligne JSON par événement) et non bloquante.
+
+Les loggers de l'application n'écrivent jamais directement sur la sortie
+standard: un QueueHandler dépose chaque enregistrement dans une file en mémoire
+et un thread dédié (QueueListener) les formate et les écrit. La boucle asyncio
+ne fait donc que préparer le message et l'ajouter à la file.
+
+Chaque enregistrement porte l'ID de la requête HTTP en cours (contextvar
+request_id_var, positionnée par le middleware de main.py), y compris pour les
+appels à l'API Orange et les commandes MongoDB qu'elle déclenche.
+"""
+import atexit
+import json
+import logging
+import queue
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from pymongo import monitoring
+
+from app.core.config import settings
+
+# ID de la requête HTTP (ou du SMS traité par un worker) en cours
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributs d'un LogRecord qui ne sont pas des champs ajoutés via `extra`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "request_id", "asctime"
+}
+
+_listener: Optional[QueueListener] = None
+
+
+def current_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Ajoute l'ID de la requête en cours à l'enregistrement. Appliqué dans le
+    contexte de l'appelant, avant le passage au thread d'écriture.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class _QueueHandler(QueueHandler):
+    """
+    QueueHandler qui conserve la trace d'une exception à part du message
+    (le QueueHandler standard la concatène au message)
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Une ligne JSON par enregistrement; les champs passés via `extra` sont inclus
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if getattr(record, "request_id", None) is None:
+            record.request_id = "-"
+        return super().format(record)
+
+
+class MongoCommandLogger(monitoring.CommandListener):
+    """
+    Journalise chaque commande MongoDB (niveau DEBUG du logger app.db.commands).
+    N'est enregistré auprès du client que si ce niveau est actif.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger("app.db.commands")
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self.logger.debug(
+            f"MongoDB {event.command_name} ({event.duration_micros / 1000:.2f} ms)",
+            extra={"command": event.command_name, "duration_ms": event.duration_micros / 1000}
+        )
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self.logger.debug(
+            f"MongoDB {event.command_name} en échec ({event.duration_micros / 1000:.2f} ms): {event.failure}",
+            extra={"command": event.command_name, "duration_ms": event.duration_micros / 1000}
+        )
+
+
+def mongo_command_loggers() -> list:
+    """
+    Listeners de journalisation à passer au client MongoDB (aucun si DEBUG est inactif)
+    """
+    if logging.getLogger("app.db.commands").isEnabledFor(logging.DEBUG):
+        return [MongoCommandLogger()]
+    return []
+
+
+def setup_logging() -> None:
+    """
+    Remplace les handlers du logger racine (et ceux d'uvicorn) par la file
+    d'écriture asynchrone, et applique les niveaux configurés dans Settings.
+    Sans effet si la journalisation est déjà configurée.
+    """
+    global _listener
+
+    if _listener is not None:
+        return
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    # uvicorn installe ses propres handlers synchrones: passer par la file
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    for name, level in settings.LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """
+    Écrit les derniers enregistrements en attente et arrête le thread d'écriture
+    """
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,286 @@
+"""
+Métriques de l'application au format texte Prometheus (endpoint /metrics).
+
+Implémentation minimale et sans dépendance: compteurs, jauges et histogrammes
+avec labels. Les séries d'un jeu de labels sont créées une seule fois puis
+réutilisées (labels() est un simple accès à un dict), et les mises à jour ne
+prennent pas de verrou: elles s'exécutent sur la boucle asyncio ou dans les
+threads de Motor (listeners pymongo), où le GIL rend chaque opération atomique.
+Une incrémentation concurrente depuis deux threads peut exceptionnellement être
+perdue, ce qui est acceptable pour de la supervision.
+"""
+import math
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+# Bornes (secondes) adaptées aux requêtes HTTP et aux appels externes
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bornes plus fines pour les opérations MongoDB
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values: str):
+        """
+        Retourne la série correspondant aux valeurs des labels (créée au premier appel)
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: {len(self.labelnames)} labels attendus")
+            child = self._children.setdefault(tuple(str(value) for value in values), self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self, values: Tuple[str, ...], child) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._samples(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def _samples(self, values, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # Un compteur par intervalle (non cumulé), le dernier pour +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def _samples(self, values, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), list(child.counts)):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Requêtes HTTP de l'API
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP par route",
+    ["method", "route", "status"]
+))
+HTTP_REQUESTS_IN_PROGRESS = REGISTRY.register(Gauge(
+    "http_requests_in_progress", "Requêtes HTTP en cours de traitement"
+))
+
+# Appels à l'API Orange
+ORANGE_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "orange_request_duration_seconds", "Durée des appels à l'API Orange par opération",
+    ["operation"]
+))
+ORANGE_RESPONSES = REGISTRY.register(Counter(
+    "orange_responses_total", "Réponses de l'API Orange par opération et code HTTP (error: erreur réseau)",
+    ["operation", "status"]
+))
+ORANGE_REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "orange_requests_in_flight", "Appels à l'API Orange en cours", ["operation"]
+))
+
+# MongoDB
+MONGO_COMMAND_DURATION = REGISTRY.register(Histogram(
+    "mongodb_command_duration_seconds", "Durée des commandes MongoDB",
+    ["command", "outcome"], buckets=MONGO_BUCKETS
+))
+MONGO_POOL_CONNECTIONS = REGISTRY.register(Gauge(
+    "mongodb_pool_connections", "Connexions du pool MongoDB ouvertes"
+))
+MONGO_POOL_CHECKED_OUT = REGISTRY.register(Gauge(
+    "mongodb_pool_checked_out_connections", "Connexions du pool MongoDB en cours d'utilisation"
+))
+
+# SMS
+SMS_STATUS_TRANSITIONS = REGISTRY.register(Counter(
+    "sms_status_transitions_total", "Changements de statut des SMS (from=created: création)",
+    ["from", "to"]
+))
+SMS_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "sms_queue_depth", "SMS dans la file d'attente d'envoi par statut", ["status"]
+))
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    Mesure la durée de chaque commande MongoDB (durée fournie par le pilote)
+    """
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        MONGO_COMMAND_DURATION.labels(event.command_name, "success").observe(event.duration_micros / 1e6)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        MONGO_COMMAND_DURATION.labels(event.command_name, "failure").observe(event.duration_micros / 1e6)
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Suit le nombre de connexions ouvertes et utilisées du pool MongoDB
+    """
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        MONGO_POOL_CONNECTIONS.inc()
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        MONGO_POOL_CONNECTIONS.dec()
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def connection_check_out_failed(self, event) -> None:
+        pass
+
+    def connection_checked_out(self, event) -> None:
+        MONGO_POOL_CHECKED_OUT.inc()
+
+    def connection_checked_in(self, event) -> None:
+        MONGO_POOL_CHECKED_OUT.dec()
+
+
+def mongo_event_listeners() -> list:
+    """
+    Listeners à passer au client MongoDB (paramètre event_listeners)
+    """
+    return [MongoCommandMetrics(), MongoPoolMetrics()]
+
+
+def record_status_transition(old_status: Optional[str], new_status: str, count: int = 1) -> None:
+    SMS_STATUS_TRANSITIONS.labels(old_status or "created", new_status).inc(count)
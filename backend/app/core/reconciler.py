@@ -0,0 +1,172 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from app.core.analytics import StatusTransition, applied_transitions, record_status_transitions
+from app.core.config import settings
+from app.core.sms import STATUS_MAPPING
+from app.db.models import SMSMessage
+from app.services.orange_api import orange_sms_service
+
+logger = logging.getLogger(__name__)
+
+# Statuts qui peuvent encore évoluer côté Orange
+RECONCILABLE_STATUSES = ["pending", "sent", "sending"]
+
+
+class SMSStatusReconciler:
+    """
+    Tâche de fond qui rafraîchit les statuts des SMS restés en "sent"/"pending".
+
+    À chaque passe, les SMS dont le statut n'a pas changé depuis
+    SMS_RECONCILE_STALE_AFTER_SECONDS sont lus par lots (index status/updated_at),
+    leur statut est demandé à Orange en parallèle avec une concurrence limitée,
+    et toutes les modifications d'un lot sont écrites en un seul bulk_write.
+    Un SMS dont le statut n'évolue pas est revérifié avec un backoff exponentiel.
+    """
+
+    def __init__(self):
+        self.interval = settings.SMS_RECONCILE_INTERVAL_SECONDS
+        self.stale_after = timedelta(seconds=settings.SMS_RECONCILE_STALE_AFTER_SECONDS)
+        self.batch_size = settings.SMS_RECONCILE_BATCH_SIZE
+        self.concurrency = settings.SMS_RECONCILE_CONCURRENCY
+        self.max_checks = settings.SMS_RECONCILE_MAX_CHECKS
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def collection(self):
+        return SMSMessage.get_motor_collection()
+
+    def backoff(self, checks: int) -> timedelta:
+        """
+        Délai avant la prochaine vérification d'un SMS déjà vérifié `checks` fois
+        """
+        delay = settings.SMS_RECONCILE_BACKOFF_BASE_SECONDS * (2 ** checks)
+        return timedelta(seconds=min(delay, settings.SMS_RECONCILE_BACKOFF_MAX_SECONDS))
+
+    async def find_stale(self, now: datetime) -> List[Dict]:
+        """
+        Retourne un lot de SMS dont le statut doit être vérifié
+        """
+        return await self.collection.find(
+            {
+                "status": {"$in": RECONCILABLE_STATUSES},
+                "updated_at": {"$lt": now - self.stale_after},
+                "message_id": {"$ne": None},
+                "status_checks": {"$not": {"$gte": self.max_checks}},
+                "$or": [
+                    {"next_status_check_at": None},
+                    {"next_status_check_at": {"$lte": now}}
+                ]
+            },
+            projection={
+                "_id": 1, "message_id": 1, "status": 1, "status_checks": 1,
+                "sender_id": 1, "created_at": 1
+            }
+        ).sort("updated_at", 1).limit(self.batch_size).to_list(length=self.batch_size)
+
+    async def reconcile_batch(self) -> int:
+        """
+        Vérifie un lot de SMS et écrit les changements en une seule opération.
+
+        Returns:
+            int: Nombre de SMS vérifiés dans le lot
+        """
+        now = datetime.utcnow()
+        messages = await self.find_stale(now)
+        if not messages:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_status(message: Dict) -> Optional[str]:
+            async with semaphore:
+                try:
+                    response = await orange_sms_service.get_sms_delivery_status(message["message_id"])
+                except Exception as e:
+                    logger.warning(f"Statut indisponible pour le SMS {message['_id']}: {str(getattr(e, 'detail', e))}")
+                    return None
+            delivery_status = response.get("deliveryInfos", {}).get("deliveryStatus", "")
+            return STATUS_MAPPING.get(delivery_status)
+
+        new_statuses = await asyncio.gather(*(fetch_status(message) for message in messages))
+
+        now = datetime.utcnow()
+        operations = []
+        transitions = {}
+        for message, new_status in zip(messages, new_statuses):
+            if new_status and new_status != message["status"]:
+                transitions[message["_id"]] = StatusTransition(
+                    message["sender_id"], message["created_at"], message["status"], new_status
+                )
+                update = {
+                    "$set": {"status": new_status, "updated_at": now, "status_checks": 0},
+                    "$unset": {"next_status_check_at": ""}
+                }
+            else:
+                checks = message.get("status_checks", 0)
+                update = {
+                    "$set": {"next_status_check_at": now + self.backoff(checks)},
+                    "$inc": {"status_checks": 1}
+                }
+            # Le filtre sur le statut évite d'écraser un accusé de réception arrivé entre-temps
+            operations.append(UpdateOne({"_id": message["_id"], "status": message["status"]}, update))
+
+        result = await self.collection.bulk_write(operations, ordered=False)
+        if transitions:
+            await record_status_transitions(
+                await applied_transitions(self.collection, result, len(operations), transitions, now)
+            )
+        return len(messages)
+
+    async def run_once(self) -> int:
+        """
+        Traite les lots jusqu'à épuisement des SMS à vérifier
+
+        Returns:
+            int: Nombre total de SMS vérifiés
+        """
+        total = 0
+        while True:
+            checked = await self.reconcile_batch()
+            total += checked
+            if checked < self.batch_size:
+                return total
+
+    def start(self) -> None:
+        """
+        Démarre la réconciliation périodique
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """
+        Arrête la réconciliation périodique
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                checked = await self.run_once()
+                if checked:
+                    logger.info(f"Réconciliation: {checked} SMS vérifiés auprès d'Orange")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erreur lors de la réconciliation des statuts: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+
+# Instance singleton pour l'utilisation dans l'application
+sms_status_reconciler = SMSStatusReconciler()
@@ -1,13 +1,33 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Optional, Union
+from typing import Any, Callable, Optional, Tuple, Union
 
+from fastapi import HTTPException, status
 from jose import jwt
 from passlib.context import CryptContext
 from pydantic import ValidationError
 
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min/max = coût configuré: un hash d'un autre coût est signalé par needs_update
+# et recalculé à la connexion suivante
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+# bcrypt libère le GIL: un pool de threads suffit pour sortir le calcul de la boucle asyncio
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+# Limite le nombre de calculs en cours ou en attente (créé dans la boucle asyncio)
+_hash_slots: Optional[asyncio.Semaphore] = None
 
 ALGORITHM = "HS256"
 
@@ -41,3 +61,56 @@ def get_password_hash(password: str) -> str:
     Crée un hash sécurisé pour le mot de passe
     """
     return pwd_context.hash(password)
+
+
+async def _run_password_hashing(func: Callable, *args) -> Any:
+    """
+    Exécute un calcul bcrypt dans le pool dédié.
+    Au-delà de PASSWORD_HASH_MAX_PENDING calculs simultanés, attend une place
+    au plus PASSWORD_HASH_QUEUE_TIMEOUT secondes puis répond 503, pour qu'un
+    afflux de connexions ne ralentisse pas le reste de l'application.
+    """
+    global _hash_slots
+    if _hash_slots is None:
+        _hash_slots = asyncio.Semaphore(settings.PASSWORD_HASH_MAX_PENDING)
+    
+    try:
+        await asyncio.wait_for(_hash_slots.acquire(), timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Trop de tentatives de connexion simultanées, réessayez dans un instant",
+            headers={"Retry-After": "1"}
+        )
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, functools.partial(func, *args))
+    finally:
+        _hash_slots.release()
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Version non bloquante de verify_password
+    """
+    return await _run_password_hashing(pwd_context.verify, plain_password, hashed_password)
+
+
+async def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Vérifie le mot de passe sans bloquer la boucle asyncio.
+    
+    Returns:
+        Tuple contenant (mot_de_passe_valide, nouveau_hash). nouveau_hash est
+        renseigné si le hash stocké n'utilise plus le coût bcrypt configuré.
+    """
+    return await _run_password_hashing(pwd_context.verify_and_update, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Version non bloquante de get_password_hash
+    """
+    return await _run_password_hashing(pwd_context.hash, password)
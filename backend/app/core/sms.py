@@ -1,9 +1,129 @@
-from typing import Dict, Optional
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 from beanie import PydanticObjectId
+from bson import ObjectId
+from bson.errors import InvalidId
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
 
+from app.core.analytics import StatusTransition, record_status_transitions
+from app.core.config import settings
 from app.db.models import SMSMessage, Contact
-from app.services.orange_api import orange_sms_service
+from app.services.orange_api import extract_message_id, orange_sms_service
+from app.services.sms_queue import sms_queue
+from app.utils.phone_normalization import normalize_many
+from app.utils.sms_encoding import analyze_message
+
+# Mapping des statuts de livraison Orange vers nos statuts internes
+STATUS_MAPPING = {
+    "DeliveredToTerminal": "delivered",
+    "DeliveredToNetwork": "delivered",
+    "MessageWaiting": "sending",
+    "DeliveryImpossible": "failed"
+}
+
+# Statuts définitifs qu'un statut intermédiaire ("sending") ne doit pas écraser
+FINAL_STATUSES = ["delivered", "failed"]
+
+
+def is_status_downgrade(old_status: Optional[str], new_status: str) -> bool:
+    """
+    Indique si `new_status` ferait revenir un SMS d'un statut définitif à un statut intermédiaire
+    """
+    return old_status in FINAL_STATUSES and new_status not in FINAL_STATUSES
+
+
+def _created(db_sms: SMSMessage) -> StatusTransition:
+    """
+    Création d'un SMS (directement dans son statut actuel) pour les statistiques journalières
+    """
+    return StatusTransition(db_sms.sender_id, db_sms.created_at, None, db_sms.status)
+
+
+class IdempotencyConflictError(Exception):
+    """
+    Clé d'idempotence réutilisée pour une autre requête, ou requête d'origine
+    toujours en cours après le délai d'attente
+    """
+    pass
+
+
+def _request_fingerprint(recipient_number: str, message: str, recipient_id: Optional[str]) -> str:
+    """
+    Empreinte du contenu d'une requête d'envoi, comparée lors d'une répétition
+    """
+    payload = json.dumps([recipient_number, message, recipient_id], ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def _insert_idempotent(
+    db_sms: SMSMessage,
+    idempotency_key: str,
+    fingerprint: str
+) -> Tuple[SMSMessage, bool]:
+    """
+    Insère un SMS sous une clé d'idempotence. L'index unique (sender_id, idempotency_key)
+    garantit qu'une seule requête crée le SMS, même entre plusieurs processus.
+
+    Returns:
+        Tuple contenant (SMS créé ou SMS d'origine, True si le SMS vient d'être créé)
+    """
+    now = datetime.utcnow()
+    db_sms.idempotency_key = idempotency_key
+    db_sms.idempotency_fingerprint = fingerprint
+    db_sms.idempotency_expires_at = now + timedelta(seconds=settings.SMS_IDEMPOTENCY_TTL_SECONDS)
+
+    # Deux tentatives: la seconde après libération d'une clé expirée
+    for _ in range(2):
+        try:
+            await db_sms.insert()
+            return db_sms, True
+        except DuplicateKeyError:
+            db_sms.id = None
+        existing = await SMSMessage.find_one(
+            {"sender_id": db_sms.sender_id, "idempotency_key": idempotency_key}
+        )
+        if existing is None:
+            continue
+        if existing.idempotency_expires_at and existing.idempotency_expires_at <= now:
+            # Clé expirée: elle est retirée de l'ancien SMS (qui reste dans l'historique)
+            await SMSMessage.get_motor_collection().update_one(
+                {"_id": ObjectId(existing.id), "idempotency_key": idempotency_key},
+                {"$unset": {"idempotency_key": "", "idempotency_fingerprint": "", "idempotency_expires_at": ""}}
+            )
+            continue
+        if existing.idempotency_fingerprint != fingerprint:
+            raise IdempotencyConflictError(
+                "Cette clé d'idempotence a déjà été utilisée pour une requête différente"
+            )
+        return existing, False
+    raise IdempotencyConflictError("Cette clé d'idempotence est utilisée par une requête concurrente")
+
+
+async def _wait_for_send(db_sms: SMSMessage) -> SMSMessage:
+    """
+    Attend que la requête d'origine ait fini d'envoyer le SMS (statut différent de "pending").
+    Un SMS d'origine supprimé pendant l'attente est signalé comme un conflit (409).
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.SMS_IDEMPOTENCY_WAIT_TIMEOUT
+    delay = 0.05
+    while db_sms.status == "pending":
+        if loop.time() >= deadline:
+            raise IdempotencyConflictError("La requête d'origine est toujours en cours de traitement")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 1.0)
+        sms_id = db_sms.id
+        db_sms = await SMSMessage.get(sms_id)
+        if db_sms is None:
+            raise IdempotencyConflictError(
+                f"Le SMS d'origine {sms_id} de cette clé d'idempotence a été supprimé"
+            )
+    return db_sms
 
 
 async def send_sms(
@@ -11,7 +131,8 @@ async def send_sms(
     user_id: str, 
     recipient_number: str, 
     message: str, 
-    recipient_id: Optional[str] = None
+    recipient_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None
 ) -> SMSMessage:
     """
     Envoie un SMS et enregistre les détails dans la base de données
@@ -22,31 +143,44 @@ async def send_sms(
         recipient_number: Numéro de téléphone du destinataire
         message: Contenu du message
         recipient_id: ID du contact (optionnel)
+        idempotency_key: Clé d'idempotence du client (optionnel). Une requête répétée
+            avec la même clé renvoie le SMS d'origine sans nouvel appel à l'API Orange.
         
     Returns:
         SMSMessage: L'objet SMS créé avec les détails de l'envoi
     """
+    encoding_info = analyze_message(message)
+    
     # Créer l'objet SMS en base de données (avec statut initial "pending")
     db_sms = SMSMessage(
         content=message,
         recipient_number=recipient_number,
         sender_id=user_id,
         recipient_id=recipient_id,
+        encoding=encoding_info.encoding,
+        segments=encoding_info.segments,
         status="pending"
     )
     
-    # Sauvegarder l'objet dans MongoDB
-    await db_sms.save()
+    if idempotency_key:
+        db_sms, created = await _insert_idempotent(
+            db_sms, idempotency_key, _request_fingerprint(recipient_number, message, recipient_id)
+        )
+        if not created:
+            # Attendre la fin de la requête d'origine plutôt que d'envoyer une seconde fois
+            return await _wait_for_send(db_sms)
+    else:
+        # Sauvegarder l'objet dans MongoDB
+        await db_sms.insert()
     
     try:
         # Appel à l'API Orange pour envoyer le SMS
-        response = await orange_sms_service.send_sms(recipient_number, message)
+        response = await orange_sms_service.send_sms(
+            recipient_number, message, callback_data=str(db_sms.id)
+        )
         
         # Extraire l'ID du message de la réponse
-        # Format de réponse attendu de l'API Orange:
-        # {"outboundSMSMessageRequest": {"resourceURL": "URL_AVEC_ID"}}
-        resource_url = response.get("outboundSMSMessageRequest", {}).get("resourceURL", "")
-        message_id = resource_url.split("/")[-1] if resource_url else None
+        message_id = extract_message_id(response)
         
         # Mettre à jour le statut et l'ID du message
         db_sms.status = "sent"
@@ -57,12 +191,261 @@ async def send_sms(
         # En cas d'erreur, mettre à jour le statut
         db_sms.status = "failed"
         await db_sms.save()
+        await record_status_transitions([_created(db_sms)])
         # Re-lever l'exception pour la gestion d'erreur de l'API
         raise e
     
+    await record_status_transitions([_created(db_sms)])
     return db_sms
 
 
+async def enqueue_sms(
+    db: AsyncIOMotorDatabase,
+    user_id: str,
+    recipient_number: str,
+    message: str,
+    recipient_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None
+) -> SMSMessage:
+    """
+    Enregistre un SMS dans la file d'attente d'envoi sans attendre l'API Orange.
+    Le SMS est envoyé ensuite par les workers de la file (voir app.services.sms_queue).
+    
+    Args:
+        db: Base de données MongoDB
+        user_id: ID de l'utilisateur qui envoie le SMS
+        recipient_number: Numéro de téléphone du destinataire
+        message: Contenu du message
+        recipient_id: ID du contact (optionnel)
+        idempotency_key: Clé d'idempotence du client (optionnel). Une requête répétée
+            avec la même clé renvoie le SMS d'origine sans en créer un second.
+        
+    Returns:
+        SMSMessage: L'objet SMS créé avec le statut "queued"
+    """
+    encoding_info = analyze_message(message)
+    db_sms = SMSMessage(
+        content=message,
+        recipient_number=recipient_number,
+        sender_id=user_id,
+        recipient_id=recipient_id,
+        encoding=encoding_info.encoding,
+        segments=encoding_info.segments,
+        status="queued",
+        next_attempt_at=datetime.utcnow()
+    )
+    if idempotency_key:
+        db_sms, created = await _insert_idempotent(
+            db_sms, idempotency_key, _request_fingerprint(recipient_number, message, recipient_id)
+        )
+        if not created:
+            return db_sms
+    else:
+        await db_sms.insert()
+    sms_queue.notify()
+    await record_status_transitions([_created(db_sms)])
+    return db_sms
+
+
+async def _resolve_bulk_recipients(
+    user_id: str,
+    recipient_numbers: List[str],
+    recipient_ids: List[str]
+) -> Tuple[List[Tuple[str, Optional[str]]], List[Dict], int]:
+    """
+    Normalise et dédoublonne les destinataires d'un envoi groupé.
+
+    Returns:
+        Tuple contenant (destinataires valides sous forme (numéro, id_contact),
+        résultats pour les destinataires invalides, nombre de doublons ignorés)
+    """
+    recipients: List[Tuple[str, Optional[str]]] = []
+    invalid: List[Dict] = []
+    seen = set()
+    duplicates = 0
+
+    def add(raw_number: str, formatted_number: Optional[str], contact_id: Optional[str] = None) -> None:
+        nonlocal duplicates
+        if formatted_number is None:
+            invalid.append({
+                "recipient_number": raw_number,
+                "recipient_id": contact_id,
+                "status": "invalid",
+                "error": "Format de numéro invalide"
+            })
+            return
+        if formatted_number in seen:
+            duplicates += 1
+            return
+        seen.add(formatted_number)
+        recipients.append((formatted_number, contact_id))
+
+    # Résoudre les contacts en une seule requête, en ne gardant que ceux de l'utilisateur
+    if recipient_ids:
+        object_ids = []
+        for contact_id in recipient_ids:
+            try:
+                object_ids.append(ObjectId(contact_id))
+            except (InvalidId, TypeError):
+                invalid.append({
+                    "recipient_number": "",
+                    "recipient_id": contact_id,
+                    "status": "invalid",
+                    "error": "ID de contact invalide"
+                })
+        contacts = await Contact.find(
+            {"_id": {"$in": object_ids}, "owner_id": user_id}
+        ).to_list()
+        found = {str(contact.id): contact for contact in contacts}
+        resolved = []
+        for object_id in object_ids:
+            contact = found.get(str(object_id))
+            if contact is None:
+                invalid.append({
+                    "recipient_number": "",
+                    "recipient_id": str(object_id),
+                    "status": "invalid",
+                    "error": "Contact non trouvé"
+                })
+                continue
+            resolved.append((contact.phone_number, str(object_id)))
+        normalized = normalize_many([number for number, _ in resolved])
+        for (number, contact_id), formatted_number in zip(resolved, normalized):
+            add(number, formatted_number, contact_id)
+
+    for number, formatted_number in zip(recipient_numbers, normalize_many(recipient_numbers)):
+        add(number, formatted_number)
+
+    return recipients, invalid, duplicates
+
+
+async def send_bulk_sms(
+    db: AsyncIOMotorDatabase,
+    user_id: str,
+    message: str,
+    recipient_numbers: List[str],
+    recipient_ids: List[str]
+) -> Dict:
+    """
+    Envoie le même SMS à plusieurs destinataires.
+
+    Les numéros sont normalisés et dédoublonnés et tous les SMSMessage sont créés
+    en une seule insertion. Si la file d'attente est activée, les SMS y sont déposés
+    et envoyés par les workers. Sinon les appels à l'API Orange sont lancés en
+    parallèle avec une concurrence limitée (SMS_BULK_CONCURRENCY) et les statuts
+    finaux sont enregistrés en une seule écriture groupée.
+
+    Args:
+        db: Base de données MongoDB
+        user_id: ID de l'utilisateur qui envoie les SMS
+        message: Contenu du message
+        recipient_numbers: Numéros de téléphone des destinataires
+        recipient_ids: IDs des contacts destinataires
+
+    Returns:
+        Dict: Résumé de l'envoi avec le résultat par destinataire
+    """
+    recipients, invalid, duplicates = await _resolve_bulk_recipients(
+        user_id, recipient_numbers, recipient_ids
+    )
+    # Le même contenu pour tous les destinataires: encodage calculé une seule fois
+    encoding_info = analyze_message(message)
+
+    results: List[Dict] = []
+    if recipients and settings.SMS_QUEUE_ENABLED:
+        # Mettre tous les SMS dans la file d'attente en une seule insertion
+        now = datetime.utcnow()
+        db_messages = [
+            SMSMessage(
+                content=message,
+                recipient_number=number,
+                sender_id=user_id,
+                recipient_id=contact_id,
+                encoding=encoding_info.encoding,
+                segments=encoding_info.segments,
+                status="queued",
+                next_attempt_at=now
+            )
+            for number, contact_id in recipients
+        ]
+        insert_result = await SMSMessage.insert_many(db_messages)
+        sms_queue.notify()
+        await record_status_transitions(_created(db_sms) for db_sms in db_messages)
+        for db_sms, inserted_id in zip(db_messages, insert_result.inserted_ids):
+            results.append({
+                "recipient_number": db_sms.recipient_number,
+                "recipient_id": db_sms.recipient_id,
+                "sms_id": str(inserted_id),
+                "status": "queued"
+            })
+    elif recipients:
+        # Créer tous les SMS en base en une seule insertion (statut initial "pending")
+        db_messages = [
+            SMSMessage(
+                content=message,
+                recipient_number=number,
+                sender_id=user_id,
+                recipient_id=contact_id,
+                encoding=encoding_info.encoding,
+                segments=encoding_info.segments,
+                status="pending"
+            )
+            for number, contact_id in recipients
+        ]
+        insert_result = await SMSMessage.insert_many(db_messages)
+        for db_sms, inserted_id in zip(db_messages, insert_result.inserted_ids):
+            db_sms.id = str(inserted_id)
+
+        semaphore = asyncio.Semaphore(settings.SMS_BULK_CONCURRENCY)
+
+        async def send_one(db_sms: SMSMessage) -> Dict:
+            async with semaphore:
+                try:
+                    response = await orange_sms_service.send_sms(
+                        db_sms.recipient_number, message, callback_data=db_sms.id
+                    )
+                    return {"status": "sent", "message_id": extract_message_id(response)}
+                except Exception as e:
+                    return {"status": "failed", "error": str(getattr(e, "detail", e))}
+
+        outcomes = await asyncio.gather(*(send_one(db_sms) for db_sms in db_messages))
+
+        # Enregistrer tous les statuts en une seule écriture groupée
+        now = datetime.utcnow()
+        operations = []
+        for db_sms, outcome in zip(db_messages, outcomes):
+            update = {"status": outcome["status"], "updated_at": now}
+            if outcome.get("message_id"):
+                update["message_id"] = outcome["message_id"]
+            operations.append(UpdateOne({"_id": ObjectId(db_sms.id)}, {"$set": update}))
+            results.append({
+                "recipient_number": db_sms.recipient_number,
+                "recipient_id": db_sms.recipient_id,
+                "sms_id": db_sms.id,
+                **outcome
+            })
+        await SMSMessage.get_motor_collection().bulk_write(operations, ordered=False)
+        for db_sms, outcome in zip(db_messages, outcomes):
+            db_sms.status = outcome["status"]
+        await record_status_transitions(_created(db_sms) for db_sms in db_messages)
+
+    results.extend(invalid)
+    queued = sum(1 for result in results if result["status"] == "queued")
+    sent = sum(1 for result in results if result["status"] == "sent")
+    failed = sum(1 for result in results if result["status"] == "failed")
+    return {
+        "total": len(results),
+        "queued": queued,
+        "sent": sent,
+        "failed": failed,
+        "invalid": len(invalid),
+        "duplicates": duplicates,
+        "encoding": encoding_info.encoding,
+        "segments": encoding_info.segments,
+        "results": results
+    }
+
+
 async def check_sms_status(db: AsyncIOMotorDatabase, sms_id: str) -> Dict:
     """
     Vérifie le statut de livraison d'un SMS auprès de l'API Orange
@@ -86,20 +469,27 @@ async def check_sms_status(db: AsyncIOMotorDatabase, sms_id: str) -> Dict:
     delivery_info = status_response.get("deliveryInfos", {})
     delivery_status = delivery_info.get("deliveryStatus", "")
     
-    # Mapping des statuts Orange vers nos statuts internes
-    status_mapping = {
-        "DeliveredToTerminal": "delivered",
-        "DeliveredToNetwork": "delivered",
-        "MessageWaiting": "sending",
-        "DeliveryImpossible": "failed"
-    }
+    old_status = db_sms.status
+    new_status = STATUS_MAPPING.get(delivery_status, old_status)
+    if is_status_downgrade(old_status, new_status):
+        # Un statut intermédiaire ("sending") n'écrase pas un statut définitif
+        new_status = old_status
     
-    new_status = status_mapping.get(delivery_status, db_sms.status)
-    
-    # Mettre à jour le statut en base de données si nécessaire
-    if new_status != db_sms.status:
-        db_sms.status = new_status
-        await db_sms.save()
+    # Mettre à jour le statut en base de données si nécessaire. Le filtre sur l'ancien
+    # statut évite d'écraser un accusé de réception ou une réconciliation arrivés entre-temps.
+    if new_status != old_status:
+        collection = SMSMessage.get_motor_collection()
+        result = await collection.update_one(
+            {"_id": ObjectId(db_sms.id), "status": old_status},
+            {"$set": {"status": new_status, "updated_at": datetime.utcnow()}}
+        )
+        if result.modified_count == 1:
+            await record_status_transitions([
+                StatusTransition(db_sms.sender_id, db_sms.created_at, old_status, new_status)
+            ])
+        else:
+            current = await collection.find_one({"_id": ObjectId(db_sms.id)}, projection={"status": 1})
+            new_status = current["status"] if current else old_status
     
     return {
         "message_id": db_sms.message_id,
@@ -1,71 +1,100 @@
+import logging
+from typing import Optional
+
 import motor.motor_asyncio
 from beanie import init_beanie
 from fastapi import Depends
 from pymongo import MongoClient
 
 from app.core.config import settings
-from app.db.models import User, Contact, SMSMessage
+from app.core.logging_config import mongo_command_loggers
+from app.core.metrics import mongo_event_listeners
+from app.db.migrations import sync_indexes
+from app.db.models import DOCUMENT_MODELS
+
+logger = logging.getLogger(__name__)
+
+# Client Motor et base de données partagés par tout le processus.
+# Initialisés une seule fois au démarrage de l'application (voir init_db).
+_client: Optional[motor.motor_asyncio.AsyncIOMotorClient] = None
+_db: Optional[motor.motor_asyncio.AsyncIOMotorDatabase] = None
+
 
-# Connexion asynchrone pour FastAPI
-# Base de données en mémoire pour le développement
-from mongomock_motor import AsyncMongoMockClient
+async def init_db() -> motor.motor_asyncio.AsyncIOMotorDatabase:
+    """
+    Crée le client MongoDB partagé et initialise Beanie.
+    Appelé une seule fois dans le lifespan de l'application.
+    """
+    global _client, _db
 
-# Variable globale pour conserver l'instance de la base de données en mémoire entre les appels
-_mock_db_instance = None
+    if _db is not None:
+        return _db
 
-async def get_db():
-    # Désérialiser les paramètres de connexion pour le debug
-    print(f"Tentative de connexion à la base de données: {settings.MONGODB_DB_NAME}")
+    logger.info(f"Connexion à la base de données: {settings.MONGODB_DB_NAME}")
     # Ne pas afficher l'URL complète pour des raisons de sécurité
     mongo_url_masked = settings.MONGODB_URL.split('@')[-1] if '@' in settings.MONGODB_URL else 'non défini'
-    print(f"URL MongoDB: ...@{mongo_url_masked}")
-    
+    logger.info(f"URL MongoDB: ...@{mongo_url_masked}")
+
     try:
-        # Connexion au client MongoDB avec timeout ajusté
+        # Connexion au client MongoDB avec pool de connexions configurable
         client = motor.motor_asyncio.AsyncIOMotorClient(
             settings.MONGODB_URL,
-            serverSelectionTimeoutMS=10000,  # 10 secondes max
-            connectTimeoutMS=10000,  # Timeout de connexion
-            socketTimeoutMS=10000  # Timeout de socket
+            maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+            minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+            maxIdleTimeMS=settings.MONGODB_MAX_IDLE_TIME_MS,
+            serverSelectionTimeoutMS=settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=settings.MONGODB_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=settings.MONGODB_SOCKET_TIMEOUT_MS,
+            # Durée des commandes et occupation du pool exposées sur /metrics
+            event_listeners=(mongo_event_listeners() if settings.METRICS_ENABLED else []) + mongo_command_loggers()
         )
-        
+
         # Vérification que la connexion fonctionne
         await client.admin.command('ping')
-        print("Connexion à MongoDB réussie !")
-        
-        # Afficher les bases de données disponibles
-        db_list = await client.list_database_names()
-        print(f"Bases de données disponibles: {db_list}")
-        
-        # Vérifier si la base cible existe
-        target_db = settings.MONGODB_DB_NAME
-        if target_db not in db_list:
-            print(f"ATTENTION: La base de données '{target_db}' n'existe pas. Les collections seront créées automatiquement.")
-        
+        logger.info("Connexion à MongoDB réussie")
+
         # Initialisation de Beanie avec les modèles de documents
-        db = client[target_db]
-        print(f"Collections disponibles: {await db.list_collection_names()}")
-        
-        await init_beanie(
-            database=db,
-            document_models=[
-                User,
-                Contact,
-                SMSMessage
-            ]
-        )
-        
-        # Vérifier si des utilisateurs existent
-        user_count = await User.count()
-        print(f"Nombre d'utilisateurs dans la base: {user_count}")
-        
-        return db
-        
+        db = client[settings.MONGODB_DB_NAME]
+        if settings.MONGODB_MIGRATE_ON_STARTUP:
+            # Crée les index manquants et supprime les index redondants
+            await sync_indexes(db)
+        else:
+            # Les index ne sont créés que par sync_indexes (python -m app.db.migrations):
+            # l'index unique des contacts échouerait ici sur une base contenant des doublons
+            await init_beanie(
+                database=db,
+                document_models=DOCUMENT_MODELS,
+                skip_indexes=True
+            )
     except Exception as e:
         # Arrêter l'application en cas d'erreur de connexion
         # pour éviter de tomber silencieusement sur la base en mémoire
-        print(f"ERREUR CRITIQUE de connexion à MongoDB: {e}")
-        raise e  # Ré-émettre l'exception pour arrêter l'application
+        logger.critical(f"ERREUR CRITIQUE de connexion à MongoDB: {e}")
+        raise
+
+    _client, _db = client, db
+    return db
+
+
+def close_db() -> None:
+    """
+    Ferme le client MongoDB partagé (appelé à l'arrêt de l'application)
+    """
+    global _client, _db
+
+    if _client is not None:
+        _client.close()
+    _client, _db = None, None
+
+
+async def get_db() -> motor.motor_asyncio.AsyncIOMotorDatabase:
+    """
+    Dépendance FastAPI: retourne la base de données partagée.
+    L'initialisation n'a lieu qu'au premier appel si le lifespan ne l'a pas déjà faite.
+    """
+    if _db is None:
+        return await init_db()
+    return _db
 
 # Pour les opérations sync (si nécessaire)
 def get_sync_db():
@@ -0,0 +1,173 @@
+"""
+Migrations de la base MongoDB.
+
+Synchronise les index avec ceux déclarés dans les modèles Beanie: les index
+manquants sont créés et les index qui ne sont plus déclarés (devenus redondants
+avec les index composés) sont supprimés. Renseigne aussi l'email normalisé des
+comptes créés avant son introduction.
+
+Utilisation:
+    python -m app.db.migrations
+    python -m app.db.migrations --dedupe-contacts
+    python -m app.db.migrations --backfill-sms-stats
+"""
+import argparse
+import asyncio
+import logging
+from typing import Dict, List
+
+import motor.motor_asyncio
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from app.core.analytics import backfill_daily_stats
+from app.core.config import settings
+from app.db.models import DOCUMENT_MODELS
+from app.utils.email_normalization import normalize_email
+
+logger = logging.getLogger(__name__)
+
+
+async def find_duplicate_contacts(db: AsyncIOMotorDatabase) -> List[Dict]:
+    """
+    Retourne les groupes de contacts qui empêchent la création de l'index unique
+    (owner_id, phone_number): un élément par couple en double, avec les IDs concernés.
+    """
+    pipeline = [
+        {"$group": {
+            "_id": {"owner_id": "$owner_id", "phone_number": "$phone_number"},
+            "ids": {"$push": "$_id"},
+            "count": {"$sum": 1}
+        }},
+        {"$match": {"count": {"$gt": 1}}}
+    ]
+    return await db.get_collection("contacts").aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
+
+async def remove_duplicate_contacts(db: AsyncIOMotorDatabase) -> int:
+    """
+    Supprime les contacts en double (même numéro pour le même utilisateur)
+    en conservant le plus ancien de chaque groupe.
+
+    Returns:
+        int: Nombre de contacts supprimés
+    """
+    removed = 0
+    for group in await find_duplicate_contacts(db):
+        # Les ObjectId sont croissants dans le temps: le plus petit est le plus ancien
+        duplicates = sorted(group["ids"])[1:]
+        result = await db.get_collection("contacts").delete_many({"_id": {"$in": duplicates}})
+        removed += result.deleted_count
+    return removed
+
+
+async def backfill_normalized_emails(db: AsyncIOMotorDatabase, batch_size: int = 1000) -> int:
+    """
+    Renseigne email_normalized pour les utilisateurs qui ne l'ont pas encore.
+    Les comptes dont l'email ne diffère que par la casse d'un autre compte sont
+    ignorés (l'index unique les refuserait) et signalés dans les logs.
+
+    Returns:
+        int: Nombre d'utilisateurs mis à jour
+    """
+    users = db.get_collection("users")
+    taken = set()
+    async for user in users.find({"email_normalized": {"$type": "string"}}, projection={"email_normalized": 1}):
+        taken.add(user["email_normalized"])
+
+    updated = 0
+    conflicts = []
+    operations = []
+    cursor = users.find(
+        {"email_normalized": {"$not": {"$type": "string"}}},
+        projection={"email": 1}
+    ).sort("_id", 1)
+    async for user in cursor:
+        normalized = normalize_email(user["email"])
+        if normalized in taken:
+            conflicts.append(user["email"])
+            continue
+        taken.add(normalized)
+        operations.append(UpdateOne({"_id": user["_id"]}, {"$set": {"email_normalized": normalized}}))
+        if len(operations) >= batch_size:
+            updated += (await users.bulk_write(operations, ordered=False)).modified_count
+            operations = []
+    if operations:
+        updated += (await users.bulk_write(operations, ordered=False)).modified_count
+
+    if conflicts:
+        logger.warning(
+            f"{len(conflicts)} comptes ont un email qui ne diffère d'un autre que par la casse "
+            f"et n'ont pas été migrés: {', '.join(conflicts[:20])}"
+        )
+    return updated
+
+
+async def sync_indexes(db: AsyncIOMotorDatabase, dedupe_contacts: bool = False) -> None:
+    """
+    Crée les index déclarés dans les modèles et supprime ceux qui ne le sont plus.
+
+    Args:
+        db: Base de données MongoDB
+        dedupe_contacts: Supprimer les contacts en double avant de créer l'index unique
+    """
+    if dedupe_contacts:
+        removed = await remove_duplicate_contacts(db)
+        logger.info(f"{removed} contacts en double supprimés")
+    else:
+        duplicates = await find_duplicate_contacts(db)
+        if duplicates:
+            raise RuntimeError(
+                f"{len(duplicates)} numéros en double dans les contacts empêchent la création de "
+                f"l'index unique (owner_id, phone_number). Relancez avec --dedupe-contacts."
+            )
+
+    migrated = await backfill_normalized_emails(db)
+    if migrated:
+        logger.info(f"Email normalisé renseigné pour {migrated} utilisateurs")
+
+    await init_beanie(
+        database=db,
+        document_models=DOCUMENT_MODELS,
+        allow_index_dropping=True
+    )
+    for model in DOCUMENT_MODELS:
+        indexes = await model.get_motor_collection().index_information()
+        logger.info(f"Index de {model.Settings.name}: {', '.join(sorted(indexes))}")
+
+
+async def run_migrations(dedupe_contacts: bool = False, backfill_sms_stats: bool = False) -> None:
+    client = motor.motor_asyncio.AsyncIOMotorClient(settings.MONGODB_URL)
+    try:
+        db = client[settings.MONGODB_DB_NAME]
+        await sync_indexes(db, dedupe_contacts=dedupe_contacts)
+        if backfill_sms_stats:
+            written = await backfill_daily_stats(db)
+            logger.info(f"Statistiques journalières reconstruites: {written} jours")
+    finally:
+        client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migrations de la base MongoDB")
+    parser.add_argument(
+        "--dedupe-contacts",
+        action="store_true",
+        help="Supprimer les contacts en double avant de créer l'index unique (conserve le plus ancien)"
+    )
+    parser.add_argument(
+        "--backfill-sms-stats",
+        action="store_true",
+        help="Reconstruire les statistiques journalières des SMS depuis l'historique"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(run_migrations(
+        dedupe_contacts=args.dedupe_contacts,
+        backfill_sms_stats=args.backfill_sms_stats
+    ))
+
+
+if __name__ == "__main__":
+    main()
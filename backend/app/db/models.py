@@ -1,9 +1,14 @@
 from datetime import datetime
-from typing import List, Optional, Annotated
+from typing import Any, Dict, List, Optional, Annotated
 
-from beanie import Document, Indexed, Link, before_event, Insert, Replace, SaveChanges
+from beanie import Document, Indexed, Link, after_event, before_event, Delete, Insert, Replace, SaveChanges
 from pydantic import Field, EmailStr, BeforeValidator
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from app.core.cache import user_cache
+from app.core.logging_config import current_request_id
+from app.utils.email_normalization import normalize_email
 
 # Type personnalisé pour gérer ObjectId avec Pydantic v2
 def validate_object_id(v) -> str:
@@ -17,6 +22,7 @@ PydanticObjectId = Annotated[str, BeforeValidator(validate_object_id)]
 class User(Document):
     id: Optional[PydanticObjectId] = Field(default=None, alias="_id")
     email: Indexed(str, unique=True)  # Email unique indexé
+    email_normalized: Optional[str] = None  # Email en minuscules, clé de recherche à la connexion
     hashed_password: str
     full_name: Optional[str] = None
     is_active: bool = True
@@ -27,14 +33,29 @@ class User(Document):
     class Settings:
         name = "users"
         indexes = [
-            "email",
-            "full_name"
+            "full_name",
+            # Unicité insensible à la casse; partiel tant que les anciens comptes ne sont pas migrés
+            IndexModel(
+                [("email_normalized", ASCENDING)],
+                name="email_normalized_unique",
+                unique=True,
+                partialFilterExpression={"email_normalized": {"$type": "string"}}
+            )
         ]
     
     @before_event([Replace, SaveChanges])
     def update_timestamp(self):
         self.updated_at = datetime.utcnow()
 
+    @before_event([Insert, Replace, SaveChanges])
+    def update_email_normalized(self):
+        self.email_normalized = normalize_email(self.email)
+
+    @after_event([Replace, SaveChanges, Delete])
+    def invalidate_cache(self):
+        # get_current_user ne doit pas servir une version périmée (ex: compte désactivé)
+        user_cache.invalidate_user(self.id, self.email)
+
 
 class Contact(Document):
     id: Optional[PydanticObjectId] = Field(default=None, alias="_id")
@@ -48,9 +69,17 @@ class Contact(Document):
     class Settings:
         name = "contacts"
         indexes = [
-            "name",
-            "phone_number",
-            "owner_id"
+            # Liste des contacts d'un utilisateur triée par nom (_id départage les homonymes)
+            IndexModel(
+                [("owner_id", ASCENDING), ("name", ASCENDING), ("_id", ASCENDING)],
+                name="owner_id_name_id"
+            ),
+            # Un seul contact par numéro et par utilisateur
+            IndexModel(
+                [("owner_id", ASCENDING), ("phone_number", ASCENDING)],
+                name="owner_id_phone_number_unique",
+                unique=True
+            )
         ]
     
     @before_event([Replace, SaveChanges])
@@ -62,22 +91,138 @@ class SMSMessage(Document):
     id: Optional[PydanticObjectId] = Field(default=None, alias="_id")
     content: str  # Contenu du message
     recipient_number: str  # Le numéro de téléphone du destinataire
-    status: str = "pending"  # "pending", "sent", "delivered", "failed"
+    status: str = "pending"  # "queued", "processing", "pending", "sent", "delivered", "failed"
     message_id: Optional[str] = None  # ID de retour de l'API Orange
     sender_id: PydanticObjectId  # ID de l'utilisateur expéditeur
     recipient_id: Optional[PydanticObjectId] = None  # ID du contact destinataire (si applicable)
+    campaign_id: Optional[PydanticObjectId] = None  # Campagne d'origine (si applicable)
+    encoding: Optional[str] = None  # "GSM-7" ou "UCS-2"
+    segments: Optional[int] = None  # Nombre de SMS facturés pour ce message
+    # File d'attente d'envoi
+    attempts: int = 0  # Nombre de tentatives d'envoi
+    next_attempt_at: Optional[datetime] = None  # Date à partir de laquelle le SMS peut être (re)pris
+    lease_expires_at: Optional[datetime] = None  # Fin du bail du worker qui traite le SMS
+    last_error: Optional[str] = None  # Dernière erreur d'envoi
+    # Réconciliation des statuts auprès de l'API Orange
+    status_checks: int = 0  # Vérifications de statut sans changement
+    next_status_check_at: Optional[datetime] = None  # Prochaine vérification autorisée (backoff)
+    # Idempotence des envois (en-tête Idempotency-Key)
+    idempotency_key: Optional[str] = None
+    idempotency_fingerprint: Optional[str] = None  # Empreinte de la requête d'origine
+    idempotency_expires_at: Optional[datetime] = None  # Après cette date, la clé peut être réutilisée
+    # Requête HTTP d'origine, reprise dans les logs du worker qui envoie le SMS
+    request_id: Optional[str] = Field(default_factory=current_request_id)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Settings:
         name = "sms_messages"
         indexes = [
-            "sender_id",
+            # Historique d'un utilisateur trié du plus récent au plus ancien (_id départage les égalités)
+            IndexModel(
+                [("sender_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                name="sender_id_created_at_id"
+            ),
             "recipient_id",
-            "status",
-            "created_at"
+            "created_at",
+            # Prise des SMS en attente par les workers
+            IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)]),
+            # Récupération des baux expirés
+            IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)]),
+            # Recherche des SMS dont le statut n'a pas évolué depuis longtemps
+            IndexModel([("status", ASCENDING), ("updated_at", ASCENDING)]),
+            # Un seul SMS par contact et par campagne (reprise d'une campagne interrompue)
+            IndexModel(
+                [("campaign_id", ASCENDING), ("recipient_id", ASCENDING)],
+                name="campaign_id_recipient_id_unique",
+                unique=True,
+                partialFilterExpression={"campaign_id": {"$type": "string"}}
+            ),
+            # Une clé d'idempotence par utilisateur. Pas d'index TTL: il supprimerait
+            # l'historique; l'expiration est gérée par idempotency_expires_at
+            IndexModel(
+                [("sender_id", ASCENDING), ("idempotency_key", ASCENDING)],
+                name="sender_id_idempotency_key_unique",
+                unique=True,
+                partialFilterExpression={"idempotency_key": {"$type": "string"}}
+            )
+        ]
+    
+    @before_event([Replace, SaveChanges])
+    def update_timestamp(self):
+        self.updated_at = datetime.utcnow()
+
+
+class Campaign(Document):
+    id: Optional[PydanticObjectId] = Field(default=None, alias="_id")
+    name: str
+    template: str  # Modèle du message, ex: "Bonjour {name}"
+    audience: Dict[str, Any] = Field(default_factory=dict)  # Critères de sélection des contacts
+    transliterate: bool = False  # Translittération des messages en GSM-7
+    owner_id: PydanticObjectId  # ID de l'utilisateur propriétaire
+    status: str = "running"  # "running", "queued", "completed", "failed"
+    # Compteurs de progression
+    total: int = 0  # SMS créés dans la file d'attente
+    skipped: int = 0  # Contacts ignorés (numéro invalide, message vide)
+    sent: int = 0
+    failed: int = 0
+    # Reprise après interruption: clé (name, _id) du dernier contact traité
+    resume_after: Optional[List[Any]] = None
+    lease_expires_at: Optional[datetime] = None  # Fin du bail du processus qui crée les SMS
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    completed_at: Optional[datetime] = None
+    
+    class Settings:
+        name = "campaigns"
+        indexes = [
+            IndexModel([("owner_id", ASCENDING), ("created_at", DESCENDING)]),
+            # Reprise des campagnes dont le bail a expiré
+            IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)])
         ]
     
     @before_event([Replace, SaveChanges])
     def update_timestamp(self):
         self.updated_at = datetime.utcnow()
+
+
+class SMSDailyStats(Document):
+    """
+    Compteurs journaliers des SMS d'un utilisateur, par statut actuel.
+    Maintenus par $inc à chaque changement de statut (voir app.core.analytics).
+    """
+    user_id: PydanticObjectId
+    date: datetime  # Jour de création des SMS (minuit UTC)
+    total: int = 0
+    pending: int = 0  # "queued", "processing" ou "pending"
+    sent: int = 0  # Acceptés par Orange, livraison non confirmée ("sent" ou "sending")
+    delivered: int = 0
+    failed: int = 0
+    
+    class Settings:
+        name = "sms_daily_stats"
+        indexes = [
+            IndexModel(
+                [("user_id", ASCENDING), ("date", ASCENDING)],
+                name="user_id_date_unique",
+                unique=True
+            )
+        ]
+
+
+class DeliveryReceipt(Document):
+    """
+    Accusé de réception reçu sur le callback Orange, pas encore appliqué au SMS.
+    Enregistré avant de répondre à Orange, supprimé une fois appliqué (voir app.core.delivery_receipts).
+    """
+    sms_id: str  # callbackData: ID du SMSMessage
+    delivery_status: str  # Statut de livraison Orange (DeliveredToTerminal, ...)
+    received_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "delivery_receipts"
+
+
+# Modèles Beanie initialisés au démarrage et par les migrations
+DOCUMENT_MODELS = [User, Contact, SMSMessage, Campaign, SMSDailyStats, DeliveryReceipt]
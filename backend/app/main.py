@@ -1,17 +1,64 @@
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 
 from app.api.routes import api_router
+from app.core.campaigns import campaign_runner
 from app.core.config import settings
+from app.core.delivery_receipts import delivery_receipt_buffer
+from app.core.logging_config import new_request_id, request_id_var, setup_logging
+from app.core.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_PROGRESS, REGISTRY, SMS_QUEUE_DEPTH
+from app.core.reconciler import sms_status_reconciler
+from app.db.database import close_db, init_db
+from app.db.models import SMSMessage
+from app.services.orange_api import orange_sms_service
+from app.services.sms_queue import sms_queue
+
+# Journalisation JSON non bloquante, configurée avant la création de l'application
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# ID de requête fourni par le client ou un proxy (X-Request-ID), repris s'il est raisonnable
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Ouvre les ressources partagées au démarrage et les libère à l'arrêt
+    """
+    db = await init_db()
+    await orange_sms_service.start(db)
+    if settings.SMS_QUEUE_ENABLED:
+        await sms_queue.start()
+        campaign_runner.start()
+    delivery_receipt_buffer.start()
+    if settings.SMS_RECONCILE_ENABLED:
+        sms_status_reconciler.start()
+    try:
+        yield
+    finally:
+        await sms_status_reconciler.stop()
+        await delivery_receipt_buffer.stop()
+        await campaign_runner.stop()
+        await sms_queue.stop()
+        await orange_sms_service.close()
+        close_db()
+
 
 # Création de l'application FastAPI pour Orange SMS Pro Senegal
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     description="API pour l'envoi de SMS via Orange SMS Pro Senegal",
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # Configuration CORS sécurisée pour permettre les requêtes frontend
@@ -21,7 +68,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Authorization", "Content-Type"],
+    expose_headers=["Authorization", "Content-Type", "X-Next-Cursor", "X-Request-ID"],
     max_age=86400,
 )
 
@@ -37,6 +84,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 # Gestion des exceptions générales
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
+    logger.exception(f"Erreur non gérée sur {request.method} {request.url.path}")
     return JSONResponse(
         status_code=500,
         content={"detail": f"Erreur interne du serveur: {str(exc)}"},
@@ -53,12 +101,48 @@ async def exception_handling_middleware(request: Request, call_next):
             response.headers["Access-Control-Allow-Origin"] = "http://localhost:5173"
         return response
     except Exception as e:
+        logger.exception(f"Erreur non gérée sur {request.method} {request.url.path}")
         return JSONResponse(
             status_code=500,
             content={"detail": f"Erreur serveur: {str(e)}"},
             headers={"Access-Control-Allow-Origin": "http://localhost:5173"}
         )
 
+# Durée des requêtes par route (modèle de chemin, pour borner le nombre de séries)
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    if not settings.METRICS_ENABLED:
+        return await call_next(request)
+    HTTP_REQUESTS_IN_PROGRESS.inc()
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        HTTP_REQUESTS_IN_PROGRESS.dec()
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.labels(
+            request.method,
+            getattr(route, "path", "unmatched"),
+            str(status_code)
+        ).observe(time.perf_counter() - started)
+
+# ID de requête: repris dans tous les logs de la requête (appels Orange et MongoDB compris)
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    request_id = request.headers.get("X-Request-ID", "")
+    if not REQUEST_ID_PATTERN.match(request_id):
+        request_id = new_request_id()
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
 # Inclure toutes les routes d'API définies dans les modules
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -67,6 +151,29 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 def root():
     return {"message": "API Orange SMS Pro Senegal. Accédez à /docs pour la documentation."}
 
+# État de santé et des dépendances externes (supervision)
+@app.get("/health")
+def health():
+    return {
+        "status": "ok",
+        "circuit_breakers": [
+            orange_sms_service.breaker.snapshot(),
+            orange_sms_service.auth_breaker.snapshot()
+        ]
+    }
+
+# Métriques au format Prometheus
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Profondeur de la file d'attente mesurée au moment de la collecte
+    for queue_status in ("queued", "processing"):
+        SMS_QUEUE_DEPTH.labels(queue_status).set(
+            await SMSMessage.find({"status": queue_status}).count()
+        )
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 # Route spéciale pour les requêtes OPTIONS (preflight CORS)
 @app.options("/{full_path:path}")
 async def options_route(full_path: str):
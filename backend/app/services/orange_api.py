@@ -1,16 +1,64 @@
+import asyncio
 import base64
-import json
+import importlib.util
 import logging
-from typing import Dict, Optional
+import time
+from typing import Dict, Optional, Tuple
 
 import httpx
 from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from app.core.config import settings
+from app.core.logging_config import current_request_id
+from app.core.metrics import ORANGE_REQUEST_DURATION, ORANGE_REQUESTS_IN_FLIGHT, ORANGE_RESPONSES
+from app.services.orange_token import OrangeTokenManager
+from app.services.rate_limiter import build_rate_limiter
+from app.services.resilience import (
+    TRANSIENT_STATUS_CODES,
+    CircuitBreaker,
+    backoff_delay,
+    parse_retry_after,
+)
+from app.utils.phone_normalization import normalize_phone
 
 logger = logging.getLogger(__name__)
 
 
+def extract_message_id(response: Dict) -> Optional[str]:
+    """
+    Extrait l'ID du message de la réponse de l'API Orange.
+    Format de réponse attendu: {"outboundSMSMessageRequest": {"resourceURL": "URL_AVEC_ID"}}
+    """
+    resource_url = response.get("outboundSMSMessageRequest", {}).get("resourceURL", "")
+    return resource_url.split("/")[-1] if resource_url else None
+
+
+def delivery_notify_url() -> str:
+    """
+    URL du callback des accusés de réception, avec le jeton attendu par
+    /sms/delivery-receipts dans le paramètre "token" (s'il n'y figure pas déjà)
+    """
+    url = httpx.URL(settings.ORANGE_DELIVERY_NOTIFY_URL)
+    if "token" not in url.params:
+        url = url.copy_merge_params({"token": settings.ORANGE_DELIVERY_CALLBACK_TOKEN})
+    return str(url)
+
+
+async def _add_request_id(request: httpx.Request) -> None:
+    # Corrélation de nos logs avec les appels sortants vers Orange
+    request_id = current_request_id()
+    if request_id:
+        request.headers["X-Request-ID"] = request_id
+
+
+class OrangeNotSentError(HTTPException):
+    """
+    La requête n'a pas été traitée par Orange (circuit ouvert, connexion impossible,
+    réponse 429/503, token indisponible): la rejouer ne peut pas envoyer un doublon
+    """
+
+
 class OrangeSMSService:
     """
     Service pour interagir avec l'API SMS d'Orange Sénégal.
@@ -22,13 +70,216 @@ class OrangeSMSService:
         self.client_secret = settings.ORANGE_CLIENT_SECRET
         self.auth_url = settings.ORANGE_AUTH_URL
         self.sms_url = settings.ORANGE_SMS_URL
-        self.access_token = None
         self.sender_name = settings.ORANGE_SENDER_NAME
+        self._client: Optional[httpx.AsyncClient] = None
+        self.token_manager = OrangeTokenManager(
+            self._fetch_access_token,
+            refresh_margin=settings.ORANGE_TOKEN_REFRESH_MARGIN,
+        )
+        # Limiteur de débit des envois (débit du contrat Orange)
+        self.rate_limiter = build_rate_limiter()
+        # Disjoncteurs: échec immédiat tant que l'API Orange est en panne.
+        # L'authentification a le sien pour ne pas consommer l'appel de test de l'API SMS.
+        self.breaker = CircuitBreaker(
+            "orange_sms",
+            failure_threshold=settings.ORANGE_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.ORANGE_BREAKER_RESET_TIMEOUT,
+        )
+        self.auth_breaker = CircuitBreaker(
+            "orange_auth",
+            failure_threshold=settings.ORANGE_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.ORANGE_BREAKER_RESET_TIMEOUT,
+        )
+
+    def _build_client(self) -> httpx.AsyncClient:
+        """
+        Construit le client HTTP partagé avec son pool de connexions.
+        Les connexions TCP/TLS vers api.orange.com sont réutilisées entre les appels.
+        """
+        http2 = settings.ORANGE_HTTP2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("ORANGE_HTTP2 activé mais le paquet 'h2' est absent, utilisation de HTTP/1.1")
+            http2 = False
+
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.ORANGE_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.ORANGE_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.ORANGE_HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                settings.ORANGE_HTTP_TIMEOUT,
+                connect=settings.ORANGE_HTTP_CONNECT_TIMEOUT,
+            ),
+            event_hooks={"request": [_add_request_id]},
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        Client HTTP partagé. Créé à la demande si le service n'a pas été démarré
+        (scripts, tests), sinon ouvert par le lifespan de l'application.
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    async def start(self, db: Optional[AsyncIOMotorDatabase] = None) -> None:
+        """
+        Ouvre le client HTTP partagé (appelé au démarrage de l'application).
+        Si `db` est fourni, le limiteur de débit peut être partagé via MongoDB.
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        self.rate_limiter = build_rate_limiter(db)
+        # Renouvellement anticipé du token, uniquement si les identifiants sont configurés
+        if self.client_id and self.client_secret:
+            self.token_manager.start()
+
+    async def close(self) -> None:
+        """
+        Ferme le client HTTP partagé et libère les connexions du pool.
+        """
+        await self.token_manager.stop()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
-    async def get_access_token(self) -> str:
+    async def _request(
+        self,
+        operation: str,
+        method: str,
+        url: str,
+        *,
+        authorized: bool = True,
+        idempotent: bool = True,
+        rate_limited: bool = False,
+        **kwargs
+    ) -> httpx.Response:
         """
-        Obtient un token d'accès en utilisant les identifiants OAuth.
+        Exécute une requête vers l'API Orange avec nouvelles tentatives et disjoncteur.
+
+        Les erreurs transitoires (5xx, 429, timeouts, erreurs réseau) sont retentées
+        avec un backoff exponentiel avec jitter, en respectant l'en-tête Retry-After.
+        Pour une requête non idempotente (envoi de SMS), seules les erreurs qui
+        garantissent que la requête n'a pas été traitée (connexion impossible, 429, 503)
+        sont retentées, pour ne pas envoyer deux fois le même SMS.
+        Tant que le disjoncteur est ouvert, les appels échouent immédiatement (503).
+
+        Args:
+            operation: Nom de l'opération pour les logs ("auth", "send", "status")
+            method: Méthode HTTP
+            url: URL appelée
+            authorized: Ajouter le token OAuth. Sur une réponse 401, le token est
+                invalidé et la requête rejouée une fois (sans compter comme tentative).
+                Les appels non authentifiés (obtention du token) utilisent `auth_breaker`.
+            idempotent: La requête peut être rejouée sans effet de bord
+            rate_limited: Consommer un jeton du limiteur de débit à chaque tentative
+
+        Returns:
+            httpx.Response: Dernière réponse reçue (non transitoire ou tentatives épuisées)
+        """
+        breaker = self.breaker if authorized else self.auth_breaker
+        max_attempts = max(1, settings.ORANGE_RETRY_MAX_ATTEMPTS)
+        headers = kwargs.pop("headers", {})
+        token_refreshed = False
+        attempt = 1
+        holds_probe = False
+        try:
+            while True:
+                if not holds_probe:
+                    if not breaker.allow_request():
+                        raise OrangeNotSentError(
+                            status_code=503,
+                            detail=f"API Orange indisponible (circuit ouvert, nouvel essai dans {int(breaker.retry_in) + 1}s)"
+                        )
+                    # Appel de test du disjoncteur (demi-ouvert): ses nouvelles tentatives
+                    # ne redemandent pas de créneau, sinon elles seraient refusées
+                    holds_probe = breaker.state == CircuitBreaker.HALF_OPEN
+
+                if rate_limited and self.rate_limiter is not None:
+                    # Attendre un créneau dans le débit autorisé par le contrat Orange
+                    await self.rate_limiter.acquire()
+
+                retry_after = None
+                in_flight = ORANGE_REQUESTS_IN_FLIGHT.labels(operation)
+                in_flight.inc()
+                started = time.perf_counter()
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Orange {operation}: {method} {url} (tentative {attempt}/{max_attempts})")
+                try:
+                    if authorized:
+                        token = await self._token_or_not_sent()
+                        response = await self.client.request(
+                            method, url, headers={**headers, "Authorization": f"Bearer {token}"}, **kwargs
+                        )
+                    else:
+                        response = await self.client.request(method, url, headers=headers, **kwargs)
+                except httpx.TransportError as e:
+                    ORANGE_RESPONSES.labels(operation, "error").inc()
+                    # ConnectError/ConnectTimeout/PoolTimeout: la requête n'est jamais partie
+                    not_sent = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+                    breaker.record_failure()
+                    holds_probe = False
+                    logger.warning(f"Orange {operation}: erreur réseau (tentative {attempt}/{max_attempts}): {e!r}")
+                    if attempt == max_attempts or not (idempotent or not_sent):
+                        status_code = 504 if isinstance(e, httpx.TimeoutException) else 503
+                        raise (OrangeNotSentError if not_sent else HTTPException)(
+                            status_code=status_code,
+                            detail=f"API Orange injoignable ({operation}): {e!r}"
+                        )
+                else:
+                    ORANGE_RESPONSES.labels(operation, str(response.status_code)).inc()
+                    if authorized and response.status_code == 401 and not token_refreshed:
+                        # Token refusé (requête non traitée): une seule nouvelle tentative avec un
+                        # token renouvelé, soumise comme les autres au limiteur de débit
+                        logger.warning("Token Orange refusé (401), renouvellement et nouvelle tentative")
+                        # Ni succès ni échec du service: le créneau de test est libéré
+                        breaker.release_probe()
+                        self.token_manager.invalidate(token)
+                        token_refreshed = True
+                        continue
+                    if response.status_code not in TRANSIENT_STATUS_CODES:
+                        breaker.record_success()
+                        return response
+                    # 429: Orange limite notre débit mais reste en bonne santé
+                    if response.status_code == 429:
+                        breaker.release_probe()
+                    else:
+                        breaker.record_failure()
+                        holds_probe = False
+                    retryable = idempotent or response.status_code in (429, 503)
+                    logger.warning(
+                        f"Orange {operation}: réponse {response.status_code} (tentative {attempt}/{max_attempts})"
+                    )
+                    if attempt == max_attempts or not retryable:
+                        return response
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                finally:
+                    ORANGE_REQUEST_DURATION.labels(operation).observe(time.perf_counter() - started)
+                    in_flight.dec()
+
+                delay = backoff_delay(attempt, settings.ORANGE_RETRY_BASE_DELAY, settings.ORANGE_RETRY_MAX_DELAY)
+                if retry_after is not None:
+                    if retry_after > settings.ORANGE_RETRY_MAX_DELAY:
+                        # Attente demandée trop longue: rendre la main à l'appelant
+                        return response
+                    delay = max(delay, retry_after)
+                await asyncio.sleep(delay)
+                attempt += 1
+        finally:
+            if holds_probe:
+                # Sortie sans conclusion (429 final, token indisponible, annulation)
+                breaker.release_probe()
+
+    async def _fetch_access_token(self) -> Tuple[str, float]:
+        """
+        Demande un nouveau token au serveur OAuth Orange.
         Utilise l'authentification Basic avec client_id et client_secret.
+
+        Returns:
+            Tuple[str, float]: (token, durée de validité en secondes)
         """
         if not self.client_id or not self.client_secret:
             raise HTTPException(
@@ -49,52 +300,85 @@ class OrangeSMSService:
             
             data = {"grant_type": "client_credentials"}
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.auth_url,
-                    headers=headers,
-                    data=data
+            response = await self._request(
+                "auth",
+                "POST",
+                self.auth_url,
+                authorized=False,
+                headers=headers,
+                data=data
+            )
+            
+            if response.status_code != 200:
+                logger.error(f"Erreur lors de l'authentification Orange API: {response.text}")
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"Échec de l'authentification Orange API: {response.text}"
                 )
+            
+            result = response.json()
+            expires_in = float(result.get("expires_in") or settings.ORANGE_TOKEN_DEFAULT_EXPIRES_IN)
+            return result.get("access_token"), expires_in
                 
-                if response.status_code != 200:
-                    logger.error(f"Erreur lors de l'authentification Orange API: {response.text}")
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"Échec de l'authentification Orange API: {response.text}"
-                    )
-                
-                result = response.json()
-                self.access_token = result.get("access_token")
-                return self.access_token
-                
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Exception lors de l'authentification Orange API: {str(e)}")
             raise HTTPException(
                 status_code=500,
                 detail=f"Erreur lors de l'authentification Orange API: {str(e)}"
             )
-    
-    async def send_sms(self, phone_number: str, message: str) -> Dict:
+
+    @property
+    def access_token(self) -> Optional[str]:
+        """
+        Token d'accès courant s'il est encore valide
+        """
+        return self.token_manager.token
+
+    async def get_access_token(self) -> str:
+        """
+        Retourne un token d'accès valide, renouvelé uniquement s'il a expiré.
+        """
+        return await self.token_manager.get_token()
+
+    async def _token_or_not_sent(self) -> str:
+        """
+        Token d'accès; sans token, la requête à l'API SMS n'est jamais envoyée
+        """
+        try:
+            return await self.get_access_token()
+        except OrangeNotSentError:
+            raise
+        except HTTPException as e:
+            raise OrangeNotSentError(status_code=e.status_code, detail=e.detail)
+
+    async def send_sms(
+        self, phone_number: str, message: str, callback_data: Optional[str] = None
+    ) -> Dict:
         """
         Envoie un SMS à un numéro de téléphone spécifié.
+        Si ORANGE_DELIVERY_NOTIFY_URL est configurée, Orange y enverra l'accusé
+        de réception avec `callback_data` (l'ID de notre SMSMessage).
         
         Args:
             phone_number: Numéro de téléphone du destinataire (format international)
             message: Contenu du SMS
+            callback_data: Donnée renvoyée par Orange dans l'accusé de réception (optionnel)
             
         Returns:
             Dict: Réponse de l'API Orange
         """
-        if not self.access_token:
-            await self.get_access_token()
-            
-        # Formater le numéro de téléphone au format international si nécessaire
-        if not phone_number.startswith("+"):
-            # Supposons que c'est un numéro sénégalais
-            phone_number = "+221" + phone_number.lstrip("0")
+        # Formater le numéro de téléphone au format international (E.164)
+        formatted_number = normalize_phone(phone_number)
+        if formatted_number is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Numéro de téléphone invalide: {phone_number}"
+            )
+        phone_number = formatted_number
             
         headers = {
-            "Authorization": f"Bearer {self.access_token}",
             "Content-Type": "application/json",
             "Accept": "application/json"
         }
@@ -110,27 +394,39 @@ class OrangeSMSService:
             }
         }
         
+        # Demander à Orange de pousser l'accusé de réception sur notre callback
+        if settings.ORANGE_DELIVERY_NOTIFY_URL:
+            receipt_request = {"notifyURL": delivery_notify_url()}
+            if callback_data:
+                receipt_request["callbackData"] = callback_data
+            payload["outboundSMSMessageRequest"]["receiptRequest"] = receipt_request
+        
         try:
-            # Construction de l'URL complète (varie selon le pays)
-            country_code = "sn"  # Code pays pour le Sénégal
+            # Construction de l'URL complète
             sms_endpoint = f"{self.sms_url}/requests"
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    sms_endpoint,
-                    headers=headers,
-                    json=payload
+            response = await self._request(
+                "send",
+                "POST",
+                sms_endpoint,
+                idempotent=False,
+                rate_limited=True,
+                headers=headers,
+                json=payload
+            )
+            
+            if response.status_code not in (201, 200):
+                logger.error(f"Erreur lors de l'envoi du SMS: {response.text}")
+                # 429/503: Orange n'a pas pris le SMS en charge (même règle que _request)
+                raise (OrangeNotSentError if response.status_code in (429, 503) else HTTPException)(
+                    status_code=response.status_code,
+                    detail=f"Échec de l'envoi du SMS: {response.text}"
                 )
                 
-                if response.status_code not in (201, 200):
-                    logger.error(f"Erreur lors de l'envoi du SMS: {response.text}")
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"Échec de l'envoi du SMS: {response.text}"
-                    )
-                    
-                return response.json()
+            return response.json()
                 
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Exception lors de l'envoi du SMS: {str(e)}")
             raise HTTPException(
@@ -148,34 +444,32 @@ class OrangeSMSService:
         Returns:
             Dict: Statut de livraison
         """
-        if not self.access_token:
-            await self.get_access_token()
-            
         headers = {
-            "Authorization": f"Bearer {self.access_token}",
             "Accept": "application/json"
         }
         
         try:
             # Construction de l'URL pour vérifier le statut
-            country_code = "sn"  # Code pays pour le Sénégal
             status_endpoint = f"{self.sms_url}/requests/{message_id}/deliveryInfos"
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    status_endpoint,
-                    headers=headers
+            response = await self._request(
+                "status",
+                "GET",
+                status_endpoint,
+                headers=headers
+            )
+            
+            if response.status_code != 200:
+                logger.error(f"Erreur lors de la vérification du statut: {response.text}")
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"Échec de la vérification du statut: {response.text}"
                 )
                 
-                if response.status_code != 200:
-                    logger.error(f"Erreur lors de la vérification du statut: {response.text}")
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"Échec de la vérification du statut: {response.text}"
-                    )
-                    
-                return response.json()
+            return response.json()
                 
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Exception lors de la vérification du statut: {str(e)}")
             raise HTTPException(
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Fonction qui interroge le serveur OAuth et retourne (token, durée de validité en secondes)
+TokenFetcher = Callable[[], Awaitable[Tuple[str, float]]]
+
+
+class OrangeTokenManager:
+    """
+    Gestionnaire du token OAuth Orange.
+    Conserve la date d'expiration du token, le renouvelle en arrière-plan avant
+    son expiration et regroupe les appels concurrents sur un seul renouvellement.
+    """
+
+    def __init__(
+        self,
+        fetch_token: TokenFetcher,
+        refresh_margin: float,
+        min_refresh_interval: float = 5.0,
+    ):
+        self._fetch_token = fetch_token
+        self.refresh_margin = refresh_margin
+        self.min_refresh_interval = min_refresh_interval
+        self._token: Optional[str] = None
+        self._expires_at: float = 0.0
+        self._lifetime: float = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._background_task: Optional[asyncio.Task] = None
+
+    @property
+    def token(self) -> Optional[str]:
+        """
+        Token courant s'il est encore valide, None sinon
+        """
+        if self._token and time.monotonic() < self._expires_at:
+            return self._token
+        return None
+
+    @property
+    def expires_in(self) -> float:
+        """
+        Nombre de secondes avant l'expiration du token courant
+        """
+        return max(0.0, self._expires_at - time.monotonic())
+
+    async def get_token(self) -> str:
+        """
+        Retourne un token valide, en le renouvelant si nécessaire.
+        Les appelants concurrents attendent le même renouvellement.
+        """
+        token = self.token
+        if token:
+            return token
+        return await self.refresh()
+
+    async def refresh(self) -> str:
+        """
+        Renouvelle le token. Si un renouvellement est déjà en cours, l'attend
+        au lieu d'en lancer un second (single-flight).
+        """
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._do_refresh())
+        # shield: l'annulation d'un appelant ne doit pas annuler le renouvellement partagé
+        return await asyncio.shield(self._refresh_task)
+
+    async def _do_refresh(self) -> str:
+        token, expires_in = await self._fetch_token()
+        self._token = token
+        self._lifetime = expires_in
+        self._expires_at = time.monotonic() + expires_in
+        logger.info(f"Token Orange renouvelé, valide pendant {int(expires_in)} secondes")
+        return token
+
+    def invalidate(self, token: Optional[str] = None) -> None:
+        """
+        Invalide le token courant (par exemple après une réponse 401).
+        Si `token` est fourni, n'invalide que si c'est toujours le token courant,
+        pour éviter que plusieurs 401 concurrents déclenchent plusieurs renouvellements.
+        """
+        if token is None or token == self._token:
+            self._token = None
+            self._expires_at = 0.0
+
+    def start(self) -> None:
+        """
+        Démarre la tâche de renouvellement anticipé en arrière-plan
+        """
+        if self._background_task is None or self._background_task.done():
+            self._background_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        """
+        Arrête la tâche de renouvellement en arrière-plan
+        """
+        for task in (self._background_task, self._refresh_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._background_task = None
+        self._refresh_task = None
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            # Renouveler `refresh_margin` secondes avant l'expiration (au plus à mi-vie du token)
+            margin = min(self.refresh_margin, self._lifetime / 2)
+            delay = max(self.min_refresh_interval, self.expires_in - margin)
+            if self._token is None:
+                delay = 0.0
+            await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Échec du renouvellement anticipé du token Orange: {str(e)}")
+                await asyncio.sleep(self.min_refresh_interval)
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Limiteur de débit "token bucket" local au processus.
+    Les jetons se rechargent à `rate` par seconde jusqu'à `burst`.
+    Les appelants attendent un jeton au lieu d'être rejetés.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        """
+        Attend qu'un jeton soit disponible puis le consomme
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Le verrou sert les appelants dans l'ordre d'arrivée
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class MongoTokenBucket:
+    """
+    Token bucket partagé entre plusieurs processus (workers uvicorn) via MongoDB.
+
+    L'état du seau est un document de la collection `rate_limits`, mis à jour
+    atomiquement par un pipeline d'agrégation qui utilise l'horloge du serveur
+    ($$NOW): recharge, puis consommation d'un jeton si disponible.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase, key: str, rate: float, burst: int):
+        self.collection = db.get_collection("rate_limits")
+        self.key = key
+        self.rate = rate
+        self.burst = max(1, burst)
+
+    def _pipeline(self) -> list:
+        now_ms = {"$toLong": "$$NOW"}
+        elapsed_seconds = {
+            "$divide": [{"$subtract": [now_ms, {"$ifNull": ["$updated_at_ms", now_ms]}]}, 1000]
+        }
+        return [
+            {"$set": {
+                "tokens": {"$min": [
+                    self.burst,
+                    {"$add": [
+                        {"$ifNull": ["$tokens", self.burst]},
+                        {"$multiply": [elapsed_seconds, self.rate]}
+                    ]}
+                ]},
+                "updated_at_ms": now_ms
+            }},
+            {"$set": {"granted": {"$gte": ["$tokens", 1]}}},
+            {"$set": {"tokens": {"$cond": ["$granted", {"$subtract": ["$tokens", 1]}, "$tokens"]}}}
+        ]
+
+    async def acquire(self) -> None:
+        """
+        Attend qu'un jeton du seau partagé soit disponible puis le consomme
+        """
+        while True:
+            state = await self.collection.find_one_and_update(
+                {"_id": self.key},
+                self._pipeline(),
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            if state.get("granted"):
+                return
+            await asyncio.sleep(max(0.001, (1 - state.get("tokens", 0)) / self.rate))
+
+
+def build_rate_limiter(db: Optional[AsyncIOMotorDatabase] = None):
+    """
+    Construit le limiteur de débit des envois Orange selon la configuration.
+    Retourne None si la limitation est désactivée (ORANGE_RATE_LIMIT_PER_SECOND <= 0).
+    """
+    rate = settings.ORANGE_RATE_LIMIT_PER_SECOND
+    burst = settings.ORANGE_RATE_LIMIT_BURST
+    if rate <= 0:
+        return None
+    if settings.ORANGE_RATE_LIMIT_BACKEND == "mongodb":
+        if db is None:
+            logger.warning("Limiteur MongoDB demandé sans base de données, utilisation du limiteur local")
+        else:
+            return MongoTokenBucket(db, "orange_sms_send", rate, burst)
+    return TokenBucket(rate, burst)
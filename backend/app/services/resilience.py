@@ -0,0 +1,136 @@
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+# Codes HTTP considérés comme transitoires (une nouvelle tentative peut réussir)
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """
+    Délai avant la tentative suivante: backoff exponentiel avec "full jitter".
+
+    Args:
+        attempt: Numéro de la tentative qui vient d'échouer (à partir de 1)
+        base_delay: Délai de base en secondes
+        max_delay: Délai maximum en secondes
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Convertit un en-tête Retry-After (secondes ou date HTTP) en secondes d'attente
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur protégeant un service distant.
+
+    - "closed": les appels passent, les échecs consécutifs sont comptés.
+    - "open": après `failure_threshold` échecs, les appels échouent immédiatement
+      pendant `reset_timeout` secondes.
+    - "half_open": un seul appel de test est autorisé; son succès referme le
+      circuit, son échec le rouvre.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at: Optional[float] = None
+        self.total_failures = 0
+        self.total_rejections = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_started_at = None
+        return self._state
+
+    @property
+    def retry_in(self) -> float:
+        """
+        Secondes restantes avant le prochain appel de test (0 si le circuit n'est pas ouvert)
+        """
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def allow_request(self) -> bool:
+        """
+        Indique si un appel peut être tenté maintenant
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN:
+            now = time.monotonic()
+            # Un seul appel de test à la fois (un test bloqué expire après reset_timeout)
+            if self._probe_started_at is None or now - self._probe_started_at >= self.reset_timeout:
+                self._probe_started_at = now
+                return True
+        self.total_rejections += 1
+        return False
+
+    def release_probe(self) -> None:
+        """
+        Libère l'appel de test sans conclure sur l'état du service distant
+        (réponse 401 ou 429: ni succès ni échec)
+        """
+        if self._state == self.HALF_OPEN:
+            self._probe_started_at = None
+
+    def record_success(self) -> None:
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._probe_started_at = None
+
+    def record_failure(self) -> None:
+        self.total_failures += 1
+        self._consecutive_failures += 1
+        if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.times_opened += 1
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_started_at = None
+
+    def snapshot(self) -> Dict:
+        """
+        État du disjoncteur pour la supervision
+        """
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self._consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "retry_in_seconds": round(self.retry_in, 3),
+            "total_failures": self.total_failures,
+            "total_rejections": self.total_rejections,
+            "times_opened": self.times_opened,
+        }
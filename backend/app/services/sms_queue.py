@@ -0,0 +1,303 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+
+from app.core.analytics import StatusTransition, record_status_transitions
+from app.core.config import settings
+from app.core.logging_config import request_id_var
+from app.db.models import Campaign, SMSMessage
+from app.services.orange_api import OrangeNotSentError, extract_message_id, orange_sms_service
+
+logger = logging.getLogger(__name__)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Indique si un échec d'envoi peut être rejoué sans risque de doublon: seulement
+    si le SMS n'a assurément pas été pris en charge par Orange (circuit ouvert,
+    connexion impossible, 429, 503). Après un timeout de lecture ou une 5xx, Orange
+    a pu accepter le SMS: le rejouer le ferait envoyer (et facturer) deux fois.
+    """
+    return isinstance(error, OrangeNotSentError)
+
+
+def lease_until(now: datetime, lease: timedelta) -> datetime:
+    """
+    Fin de bail tronquée à la milliseconde (précision des dates MongoDB),
+    pour pouvoir servir de filtre d'égalité
+    """
+    expires_at = now + lease
+    return expires_at.replace(microsecond=expires_at.microsecond // 1000 * 1000)
+
+
+class SMSQueue:
+    """
+    File d'attente d'envoi de SMS persistée dans la collection sms_messages.
+
+    Les SMS sont enregistrés avec le statut "queued". Un pool de workers asyncio
+    les réserve de manière atomique (find_one_and_update) avec un bail, les envoie
+    à l'API Orange puis les passe en "sent", les replanifie avec un backoff
+    exponentiel ou les passe en "failed". Les SMS dont le bail a expiré (crash
+    du processus) sont remis dans la file.
+    """
+
+    def __init__(self):
+        self.worker_count = settings.SMS_QUEUE_WORKERS
+        self.lease = timedelta(seconds=settings.SMS_QUEUE_LEASE_SECONDS)
+        self.poll_interval = settings.SMS_QUEUE_POLL_INTERVAL
+        self.max_attempts = settings.SMS_QUEUE_MAX_ATTEMPTS
+        self._workers: List[asyncio.Task] = []
+        self._recovery_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    @property
+    def collection(self):
+        return SMSMessage.get_motor_collection()
+
+    def notify(self) -> None:
+        """
+        Réveille les workers inactifs après un ajout dans la file
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def retry_delay(self, attempts: int) -> timedelta:
+        """
+        Délai avant la prochaine tentative (backoff exponentiel borné)
+        """
+        delay = settings.SMS_QUEUE_RETRY_BASE_DELAY * (2 ** max(0, attempts - 1))
+        return timedelta(seconds=min(delay, settings.SMS_QUEUE_RETRY_MAX_DELAY))
+
+    async def start(self) -> None:
+        """
+        Remet en file les SMS dont le bail a expiré puis démarre les workers
+        """
+        if self._workers:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        recovered = await self.recover_expired_leases()
+        if recovered:
+            logger.warning(f"{recovered} SMS avec un bail expiré remis dans la file d'attente")
+        self._workers = [
+            asyncio.create_task(self._worker_loop(index))
+            for index in range(self.worker_count)
+        ]
+        self._recovery_task = asyncio.create_task(self._recovery_loop())
+        logger.info(f"File d'attente SMS démarrée avec {self.worker_count} workers")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        Arrête les workers. Les envois en cours disposent de `timeout` secondes
+        pour se terminer; les SMS interrompus seront repris à l'expiration du bail.
+        """
+        self._stopping = True
+        self.notify()
+        tasks = list(self._workers)
+        if self._recovery_task is not None:
+            self._recovery_task.cancel()
+            tasks.append(self._recovery_task)
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._recovery_task = None
+
+    async def recover_expired_leases(self) -> int:
+        """
+        Remet dans la file les SMS réservés par un worker qui n'a pas terminé à temps
+        """
+        now = datetime.utcnow()
+        result = await self.collection.update_many(
+            {"status": "processing", "lease_expires_at": {"$lt": now}},
+            {
+                "$set": {"status": "queued", "next_attempt_at": now, "updated_at": now},
+                "$unset": {"lease_expires_at": ""}
+            }
+        )
+        return result.modified_count
+
+    async def claim(self) -> Optional[Dict]:
+        """
+        Réserve atomiquement le prochain SMS à envoyer
+        """
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {"status": "queued", "next_attempt_at": {"$lte": now}},
+            {
+                "$set": {
+                    "status": "processing",
+                    "lease_expires_at": lease_until(now, self.lease),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _renew_lease(self, job: Dict, done: asyncio.Event) -> None:
+        """
+        Prolonge le bail tant que l'envoi est en cours (nouvelles tentatives, Retry-After,
+        renouvellement du token...), pour qu'aucun autre worker ne reprenne le SMS.
+        `job["lease_expires_at"]` suit le bail courant, utilisé comme filtre par process.
+        """
+        interval = self.lease.total_seconds() / 3
+        while True:
+            try:
+                await asyncio.wait_for(done.wait(), timeout=interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            new_lease = lease_until(datetime.utcnow(), self.lease)
+            result = await self.collection.update_one(
+                {"_id": job["_id"], "status": "processing", "lease_expires_at": job["lease_expires_at"]},
+                {"$set": {"lease_expires_at": new_lease}}
+            )
+            if not result.modified_count:
+                logger.warning(f"SMS {job['_id']}: bail perdu pendant l'envoi")
+                return
+            job["lease_expires_at"] = new_lease
+
+    async def _send(self, job: Dict) -> Dict:
+        """
+        Envoie le SMS en renouvelant le bail pendant toute la durée de l'envoi
+        """
+        done = asyncio.Event()
+        heartbeat = asyncio.create_task(self._renew_lease(job, done))
+        try:
+            return await orange_sms_service.send_sms(
+                job["recipient_number"], job["content"], callback_data=str(job["_id"])
+            )
+        finally:
+            # Pas d'annulation: un renouvellement en cours doit se terminer pour que
+            # job["lease_expires_at"] corresponde au bail enregistré
+            done.set()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+
+    async def process(self, job: Dict) -> None:
+        """
+        Envoie un SMS réservé et enregistre le résultat
+        """
+        try:
+            response = await self._send(job)
+        except Exception as e:
+            error = str(getattr(e, "detail", e))
+            now = datetime.utcnow()
+            if job["attempts"] < self.max_attempts and is_retryable_error(e):
+                update = {
+                    "$set": {
+                        "status": "queued",
+                        "next_attempt_at": now + self.retry_delay(job["attempts"]),
+                        "last_error": error,
+                        "updated_at": now
+                    },
+                    "$unset": {"lease_expires_at": ""}
+                }
+                logger.warning(f"Échec d'envoi du SMS {job['_id']} (tentative {job['attempts']}), nouvel essai planifié: {error}")
+            else:
+                if not is_retryable_error(e) and not (isinstance(e, HTTPException) and e.status_code < 500):
+                    # Timeout, 5xx ou erreur inattendue: Orange a peut-être accepté le SMS
+                    error = f"Envoi incertain, non rejoué pour éviter un doublon: {error}"
+                update = {
+                    "$set": {"status": "failed", "last_error": error, "updated_at": now},
+                    "$unset": {"lease_expires_at": "", "next_attempt_at": ""}
+                }
+                logger.error(f"Envoi du SMS {job['_id']} abandonné après {job['attempts']} tentative(s): {error}")
+        else:
+            update = {
+                "$set": {
+                    "status": "sent",
+                    "message_id": extract_message_id(response),
+                    "updated_at": datetime.utcnow()
+                },
+                "$unset": {"lease_expires_at": "", "next_attempt_at": "", "last_error": ""}
+            }
+        # Le filtre sur le bail évite d'écraser un SMS repris par un autre worker après expiration
+        result = await self.collection.update_one(
+            {"_id": job["_id"], "status": "processing", "lease_expires_at": job["lease_expires_at"]},
+            update
+        )
+        final_status = update["$set"]["status"]
+        if result.modified_count and final_status != "queued":
+            await record_status_transitions([
+                StatusTransition(job["sender_id"], job["created_at"], "processing", final_status)
+            ])
+            if job.get("campaign_id"):
+                await self.record_campaign_result(job["campaign_id"], final_status)
+
+    async def record_campaign_result(self, campaign_id: str, final_status: str) -> None:
+        """
+        Met à jour les compteurs de progression d'une campagne après un envoi
+        et la marque terminée quand tous ses SMS ont été traités
+        """
+        campaigns = Campaign.get_motor_collection()
+        now = datetime.utcnow()
+        await campaigns.update_one(
+            {"_id": ObjectId(campaign_id)},
+            {"$inc": {final_status: 1}, "$set": {"updated_at": now}}
+        )
+        await campaigns.update_one(
+            {
+                "_id": ObjectId(campaign_id),
+                "status": "queued",
+                "$expr": {"$gte": [{"$add": ["$sent", "$failed"]}, "$total"]}
+            },
+            {"$set": {"status": "completed", "completed_at": now}}
+        )
+
+    async def _worker_loop(self, index: int) -> None:
+        while not self._stopping:
+            # Effacer avant la réservation pour ne pas perdre un réveil arrivé entre-temps
+            self._wakeup.clear()
+            try:
+                job = await self.claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Worker SMS {index}: erreur lors de la réservation: {str(e)}")
+                job = None
+
+            if job is None:
+                # File vide: attendre un ajout ou l'intervalle de scrutation
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Les logs de l'envoi (appels Orange, MongoDB) reprennent l'ID de la requête d'origine
+            request_id = request_id_var.set(job.get("request_id") or f"sms-{job['_id']}")
+            try:
+                await self.process(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Worker SMS {index}: erreur lors du traitement de {job['_id']}: {str(e)}")
+            finally:
+                request_id_var.reset(request_id)
+
+    async def _recovery_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease.total_seconds())
+            try:
+                recovered = await self.recover_expired_leases()
+                if recovered:
+                    logger.warning(f"{recovered} SMS avec un bail expiré remis dans la file d'attente")
+                    self.notify()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erreur lors de la récupération des baux expirés: {str(e)}")
+
+
+# Instance singleton pour l'utilisation dans l'application
+sms_queue = SMSQueue()
@@ -0,0 +1,17 @@
+"""
+Utilitaires pour la normalisation des adresses email.
+"""
+
+
+def normalize_email(email: str) -> str:
+    """
+    Normalise une adresse email pour la recherche et l'unicité:
+    espaces retirés et casse ignorée.
+    
+    Args:
+        email: Adresse email saisie par l'utilisateur
+    
+    Returns:
+        Adresse email normalisée
+    """
+    return email.strip().lower()
@@ -0,0 +1,115 @@
+"""
+Utilitaires pour l'export en flux (CSV / NDJSON, éventuellement compressé en gzip).
+
+Les documents sont lus directement depuis un curseur Motor et convertis en octets
+au fil de l'eau: la mémoire utilisée ne dépend pas du nombre de lignes exportées.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from bson import ObjectId
+from fastapi.responses import StreamingResponse
+
+EXPORT_FORMATS = ("csv", "ndjson")
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson"
+}
+
+# Taille approximative (octets) des morceaux envoyés au client
+FLUSH_SIZE = 64 * 1024
+
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
+
+def export_row(document: Dict, columns: List[str]) -> Dict:
+    """
+    Extrait les colonnes exportées d'un document MongoDB ("id" correspond à "_id")
+    """
+    return {
+        column: _export_value(document.get("_id" if column == "id" else column))
+        for column in columns
+    }
+
+
+async def stream_export(
+    cursor: AsyncIterator[Dict],
+    columns: List[str],
+    file_format: str = "csv",
+    compress: bool = False
+) -> AsyncIterator[bytes]:
+    """
+    Convertit un curseur MongoDB en flux d'octets CSV ou NDJSON.
+
+    Args:
+        cursor: Curseur Motor (idéalement avec une projection sur les colonnes)
+        columns: Colonnes exportées, dans l'ordre
+        file_format: "csv" ou "ndjson"
+        compress: Compresser le flux au format gzip
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if file_format == "csv" else None
+    # wbits=31: en-tête et somme de contrôle gzip
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def take() -> Optional[bytes]:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        if compressor is not None:
+            data = compressor.compress(data)
+        return data or None
+
+    if writer is not None:
+        writer.writerow(columns)
+
+    async for document in cursor:
+        row = export_row(document, columns)
+        if writer is not None:
+            writer.writerow([row[column] for column in columns])
+        else:
+            buffer.write(json.dumps(row, ensure_ascii=False))
+            buffer.write("\n")
+        if buffer.tell() >= FLUSH_SIZE:
+            data = take()
+            if data:
+                yield data
+
+    data = take()
+    if compressor is not None:
+        data = (data or b"") + compressor.flush()
+    if data:
+        yield data
+
+
+def export_response(
+    cursor: AsyncIterator[Dict],
+    columns: List[str],
+    filename: str,
+    file_format: str = "csv",
+    compress: bool = False
+) -> StreamingResponse:
+    """
+    Construit la réponse HTTP d'un export (téléchargement en pièce jointe)
+    """
+    filename = f"{filename}.{file_format}"
+    media_type = MEDIA_TYPES[file_format]
+    if compress:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        stream_export(cursor, columns, file_format, compress),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
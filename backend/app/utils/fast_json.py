@@ -0,0 +1,52 @@
+"""
+Sérialisation rapide des listes (historique des SMS, contacts).
+
+Le chemin standard construit un document Beanie par ligne, le valide une
+seconde fois dans le schéma de réponse puis l'encode avec json. Ici, les
+documents sont lus bruts depuis Motor avec une projection sur les champs du
+schéma et encodés une seule fois par orjson. Le response_model des routes est
+conservé pour la documentation OpenAPI: la réponse produite a la même forme
+(mêmes champs, dans le même ordre, None pour un champ absent).
+"""
+from typing import Any, Dict, Iterable, List, Type
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type non sérialisable: {type(value).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Réponse JSON encodée par orjson (dates au format ISO 8601, ObjectId en str)
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default)
+
+
+def schema_fields(schema: Type[BaseModel]) -> List[str]:
+    return list(schema.model_fields)
+
+
+def schema_projection(schema: Type[BaseModel]) -> Dict[str, int]:
+    """
+    Projection MongoDB limitée aux champs du schéma de réponse ("id" correspond à "_id")
+    """
+    return {field: 1 for field in schema_fields(schema) if field != "id"}
+
+
+def serialize_documents(documents: Iterable[Dict], fields: List[str]) -> List[Dict]:
+    """
+    Met des documents MongoDB bruts à la forme du schéma de réponse
+    """
+    return [
+        {field: str(document["_id"]) if field == "id" else document.get(field) for field in fields}
+        for document in documents
+    ]
@@ -0,0 +1,60 @@
+"""
+Utilitaires pour la pagination par curseur (keyset pagination).
+
+Au lieu de sauter `skip` documents, chaque page reprend après la clé de tri du
+dernier élément de la page précédente. Le coût d'une page est ainsi constant,
+quelle que soit sa profondeur, à condition qu'un index couvre la clé de tri.
+"""
+import base64
+from typing import Any, Dict, List, Tuple
+
+from bson import json_util
+from pymongo import ASCENDING
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """
+    Encode les valeurs de la clé de tri du dernier élément en un curseur opaque.
+    Les types BSON (datetime, ObjectId) sont conservés grâce à l'Extended JSON.
+    """
+    raw = json_util.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Décode un curseur produit par encode_cursor
+
+    Args:
+        cursor: Curseur opaque reçu du client
+        size: Nombre de valeurs attendues (nombre de champs de la clé de tri)
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise InvalidCursorError("Curseur de pagination invalide")
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorError("Curseur de pagination invalide")
+    return values
+
+
+def keyset_filter(sort: List[Tuple[str, int]], values: List[Any]) -> Dict:
+    """
+    Construit le filtre MongoDB qui sélectionne les documents situés après
+    `values` dans l'ordre de tri `sort`.
+
+    Pour un tri (a, b), le filtre est: a > va OU (a = va ET b > vb),
+    avec $lt à la place de $gt pour les champs triés par ordre décroissant.
+    """
+    clauses = []
+    for index, (field, direction) in enumerate(sort):
+        operator = "$gt" if direction == ASCENDING else "$lt"
+        clause = {prefix: value for (prefix, _), value in zip(sort[:index], values[:index])}
+        clause[field] = {operator: values[index]}
+        clauses.append(clause)
+    return {"$or": clauses}
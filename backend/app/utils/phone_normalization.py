@@ -0,0 +1,153 @@
+"""
+Normalisation des numéros de téléphone mobiles au format international E.164.
+
+Les règles sont décrites par un tableau de plans de numérotation (un par pays où
+Orange opère) et les expressions régulières sont compilées une seule fois, au
+chargement du module. Les résultats sont mis en cache (LRU): les envois groupés
+et les imports retombent souvent sur les mêmes numéros.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Pattern, Tuple
+
+from app.core.config import settings
+
+
+class NumberingPlan(NamedTuple):
+    country: str  # Code ISO 3166-1 alpha-2
+    name: str
+    dial_code: str  # Indicatif international, sans "+"
+    mobile: Pattern  # Numéro national significatif d'un mobile (sans préfixe national)
+    trunk_prefix: str = ""  # Préfixe national ("0") à retirer du format local
+
+
+# Plans de numérotation mobile des pays où Orange opère
+NUMBERING_PLANS: Tuple[NumberingPlan, ...] = (
+    NumberingPlan("SN", "Sénégal", "221", re.compile(r"7[05-8]\d{7}")),
+    NumberingPlan("CI", "Côte d'Ivoire", "225", re.compile(r"0[157]\d{8}")),
+    NumberingPlan("ML", "Mali", "223", re.compile(r"[5-9]\d{7}")),
+    NumberingPlan("BF", "Burkina Faso", "226", re.compile(r"[5-7]\d{7}")),
+    NumberingPlan("GN", "Guinée", "224", re.compile(r"6\d{8}")),
+    NumberingPlan("GW", "Guinée-Bissau", "245", re.compile(r"9[5-6]\d{7}")),
+    NumberingPlan("CM", "Cameroun", "237", re.compile(r"6\d{8}")),
+    NumberingPlan("CF", "Centrafrique", "236", re.compile(r"7[0-7]\d{6}")),
+    NumberingPlan("CD", "RD Congo", "243", re.compile(r"[89]\d{8}"), "0"),
+    NumberingPlan("MG", "Madagascar", "261", re.compile(r"3[2-49]\d{7}"), "0"),
+    NumberingPlan("BW", "Botswana", "267", re.compile(r"7\d{7}")),
+    NumberingPlan("LR", "Liberia", "231", re.compile(r"(?:77|88)\d{7}"), "0"),
+    NumberingPlan("SL", "Sierra Leone", "232", re.compile(r"[2-9]\d{7}"), "0"),
+    NumberingPlan("MA", "Maroc", "212", re.compile(r"[67]\d{8}"), "0"),
+    NumberingPlan("TN", "Tunisie", "216", re.compile(r"[2-9]\d{7}")),
+    NumberingPlan("EG", "Égypte", "20", re.compile(r"1[0125]\d{8}"), "0"),
+    NumberingPlan("JO", "Jordanie", "962", re.compile(r"7[789]\d{7}"), "0"),
+)
+
+PLANS_BY_COUNTRY: Dict[str, NumberingPlan] = {plan.country: plan for plan in NUMBERING_PLANS}
+PLANS_BY_DIAL_CODE: Dict[str, NumberingPlan] = {plan.dial_code: plan for plan in NUMBERING_PLANS}
+DIAL_CODE_LENGTHS = sorted({len(plan.dial_code) for plan in NUMBERING_PLANS})
+
+# Séparateurs tolérés dans la saisie: espaces, tirets, points, parenthèses, "/"
+_SEPARATORS = re.compile(r"[\s\-\.\(\)/]")
+_DIGITS = re.compile(r"\d+")
+
+
+def _match_national(plan: NumberingPlan, national: str) -> Optional[str]:
+    """
+    Retourne le numéro E.164 si `national` est un mobile valide du plan
+    (avec ou sans le préfixe national)
+    """
+    if plan.mobile.fullmatch(national):
+        return f"+{plan.dial_code}{national}"
+    if plan.trunk_prefix and national.startswith(plan.trunk_prefix):
+        national = national[len(plan.trunk_prefix):]
+        if plan.mobile.fullmatch(national):
+            return f"+{plan.dial_code}{national}"
+    return None
+
+
+@lru_cache(maxsize=settings.PHONE_NORMALIZATION_CACHE_SIZE)
+def _normalize(phone_number: str, default_country: str, countries: Tuple[str, ...]) -> Optional[str]:
+    cleaned = _SEPARATORS.sub("", phone_number)
+    if cleaned.startswith("00"):
+        cleaned = "+" + cleaned[2:]
+
+    if cleaned.startswith("+"):
+        digits = cleaned[1:]
+        if not _DIGITS.fullmatch(digits):
+            return None
+        for length in DIAL_CODE_LENGTHS:
+            plan = PLANS_BY_DIAL_CODE.get(digits[:length])
+            if plan is not None and plan.country in countries:
+                return _match_national(plan, digits[length:])
+        return None
+
+    if not _DIGITS.fullmatch(cleaned):
+        return None
+    plan = PLANS_BY_COUNTRY.get(default_country)
+    if plan is None:
+        return None
+    # Indicatif saisi sans "+" (ex: 221771234567)
+    if cleaned.startswith(plan.dial_code):
+        formatted = _match_national(plan, cleaned[len(plan.dial_code):])
+        if formatted:
+            return formatted
+    return _match_national(plan, cleaned)
+
+
+def normalize_phone(
+    phone_number: str,
+    default_country: Optional[str] = None,
+    countries: Optional[Iterable[str]] = None
+) -> Optional[str]:
+    """
+    Normalise un numéro de mobile au format E.164.
+
+    Args:
+        phone_number: Numéro saisi (format local ou international, séparateurs tolérés)
+        default_country: Pays des numéros saisis sans indicatif (par défaut: PHONE_DEFAULT_COUNTRY)
+        countries: Pays acceptés (par défaut: PHONE_ALLOWED_COUNTRIES)
+
+    Returns:
+        Le numéro au format +<indicatif><numéro>, ou None s'il est invalide
+    """
+    return _normalize(
+        phone_number,
+        default_country or settings.PHONE_DEFAULT_COUNTRY,
+        tuple(countries) if countries is not None else tuple(settings.PHONE_ALLOWED_COUNTRIES)
+    )
+
+
+def normalize_many(
+    phone_numbers: Iterable[str],
+    default_country: Optional[str] = None,
+    countries: Optional[Iterable[str]] = None
+) -> List[Optional[str]]:
+    """
+    Normalise une liste de numéros (envois groupés, imports).
+    Chaque numéro distinct n'est traité qu'une fois; l'ordre est conservé.
+
+    Returns:
+        Liste alignée sur l'entrée: numéro E.164 ou None pour chaque numéro invalide
+    """
+    default_country = default_country or settings.PHONE_DEFAULT_COUNTRY
+    countries = tuple(countries) if countries is not None else tuple(settings.PHONE_ALLOWED_COUNTRIES)
+    results: Dict[str, Optional[str]] = {}
+    normalized = []
+    for phone_number in phone_numbers:
+        if phone_number not in results:
+            results[phone_number] = _normalize(phone_number, default_country, countries)
+        normalized.append(results[phone_number])
+    return normalized
+
+
+def validate_phone(phone_number: str) -> Tuple[bool, str]:
+    """
+    Valide et formate un numéro de mobile d'un des pays acceptés.
+
+    Returns:
+        Tuple contenant (est_valide, numéro_formaté), le numéro d'origine s'il est invalide
+    """
+    formatted = normalize_phone(phone_number)
+    if formatted is None:
+        return False, phone_number
+    return True, formatted
@@ -0,0 +1,114 @@
+"""
+Calcul de l'encodage (GSM-7 ou UCS-2) et du nombre de segments d'un SMS.
+
+Un seul caractère hors de l'alphabet GSM-7 (voyelle accentuée absente de
+l'alphabet, apostrophe typographique, emoji...) fait passer tout le message en
+UCS-2: 70 caractères par SMS au lieu de 160, et autant de segments facturés en
+plus. La translittération optionnelle remplace ces caractères par leur
+équivalent GSM-7 le plus proche.
+"""
+from typing import Iterable, List, NamedTuple, Tuple
+
+# Alphabet GSM 03.38 de base (un septet par caractère)
+GSM7_BASIC = frozenset(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞ\x1bÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+# Table d'extension: chaque caractère coûte deux septets (échappement + caractère)
+GSM7_EXTENDED = frozenset("^{}\\[~]|€\f")
+GSM7_CHARSET = GSM7_BASIC | GSM7_EXTENDED
+
+# Capacité d'un SMS (en septets ou en unités UTF-16) seul ou dans un message concaténé
+# (l'en-tête de concaténation UDH occupe 6 octets de chaque segment)
+GSM7_SINGLE, GSM7_MULTIPART = 160, 153
+UCS2_SINGLE, UCS2_MULTIPART = 70, 67
+
+# Équivalents GSM-7 des caractères courants en français absents de l'alphabet
+_TRANSLITERATIONS = {
+    "á": "a", "â": "a", "ã": "a",
+    "À": "A", "Á": "A", "Â": "A", "Ã": "A",
+    "ç": "c",
+    "ê": "e", "ë": "e", "È": "E", "Ê": "E", "Ë": "E",
+    "í": "i", "î": "i", "ï": "i", "Ì": "I", "Í": "I", "Î": "I", "Ï": "I",
+    "ó": "o", "ô": "o", "õ": "o", "Ò": "O", "Ó": "O", "Ô": "O", "Õ": "O",
+    "ú": "u", "û": "u", "Ù": "U", "Ú": "U", "Û": "U",
+    "ÿ": "y", "Ÿ": "Y",
+    "œ": "oe", "Œ": "OE",
+    "‘": "'", "’": "'", "‚": "'", "′": "'",
+    "“": '"', "”": '"', "„": '"', "«": '"', "»": '"', "″": '"',
+    "‐": "-", "‑": "-", "–": "-", "—": "-", "−": "-",
+    "…": "...",
+    "\u00a0": " ", "\u2007": " ", "\u202f": " ", "\u2009": " ",
+    "\t": " ",
+}
+_TRANSLITERATION_TABLE = str.maketrans(_TRANSLITERATIONS)
+
+
+class SMSEncodingInfo(NamedTuple):
+    encoding: str  # "GSM-7" ou "UCS-2"
+    length: int  # Septets (GSM-7) ou unités UTF-16 (UCS-2)
+    segments: int
+    per_segment: int  # Capacité d'un segment pour ce message
+    remaining: int  # Place restante dans le dernier segment
+
+
+def transliterate(message: str) -> str:
+    """
+    Remplace les caractères hors GSM-7 qui ont un équivalent (accents, guillemets
+    et apostrophes typographiques, espaces insécables...). Les autres caractères,
+    comme les emojis, sont conservés.
+    """
+    return message.translate(_TRANSLITERATION_TABLE)
+
+
+def non_gsm_characters(message: str) -> List[str]:
+    """
+    Caractères du message absents de l'alphabet GSM-7, dans leur ordre d'apparition
+    """
+    return [char for char in dict.fromkeys(message) if char not in GSM7_CHARSET]
+
+
+def _segments(costs: Iterable[int], single: int, multipart: int) -> Tuple[int, int, int, int]:
+    """
+    Remplit les segments caractère par caractère: un caractère de plusieurs
+    unités (échappement GSM-7, paire de substitution UTF-16) n'est jamais coupé.
+    """
+    costs = list(costs)
+    length = sum(costs)
+    if length <= single:
+        return length, 1, single, single - length
+    segments, used = 1, 0
+    for cost in costs:
+        if used + cost > multipart:
+            segments += 1
+            used = 0
+        used += cost
+    return length, segments, multipart, multipart - used
+
+
+def analyze_message(message: str) -> SMSEncodingInfo:
+    """
+    Détermine l'encodage d'un SMS et le nombre de segments facturés.
+
+    Args:
+        message: Contenu du SMS
+
+    Returns:
+        SMSEncodingInfo (encodage, longueur, segments, capacité et place restante)
+    """
+    characters = set(message)
+    if characters <= GSM7_BASIC:
+        # Cas le plus courant: un septet par caractère, pas de découpage à surveiller
+        length = len(message)
+        if length <= GSM7_SINGLE:
+            return SMSEncodingInfo("GSM-7", length, 1, GSM7_SINGLE, GSM7_SINGLE - length)
+        segments = -(-length // GSM7_MULTIPART)
+        return SMSEncodingInfo(
+            "GSM-7", length, segments, GSM7_MULTIPART, segments * GSM7_MULTIPART - length
+        )
+    if characters <= GSM7_CHARSET:
+        costs = (2 if char in GSM7_EXTENDED else 1 for char in message)
+        return SMSEncodingInfo("GSM-7", *_segments(costs, GSM7_SINGLE, GSM7_MULTIPART))
+    # Caractères hors du plan multilingue de base: deux unités UTF-16 (paire de substitution)
+    costs = (2 if ord(char) > 0xFFFF else 1 for char in message)
+    return SMSEncodingInfo("UCS-2", *_segments(costs, UCS2_SINGLE, UCS2_MULTIPART))
@@ -0,0 +1,314 @@
+"""
+Benchmark de bout en bout de l'API: envoi de SMS, historique et contacts.
+
+Démarre dans le même processus le simulateur de l'API Orange et le backend
+(uvicorn), sur une base MongoDB locale ou en mémoire (mongomock), puis mesure
+pour chaque scénario le débit et la latence (p50/p90/p99) vus par un client HTTP.
+Avec la file d'attente activée, le débit d'envoi réel vers Orange (SMS sortis
+de la file par seconde) est mesuré séparément.
+
+Le client, le backend et le simulateur partagent la même boucle asyncio: les
+chiffres servent à comparer deux versions du code sur la même machine, pas à
+dimensionner la production.
+
+Utilisation (depuis le dossier backend, après pip install -r requirements-dev.txt):
+    python -m benchmarks.bench_api --requests 2000 --concurrency 50
+    python -m benchmarks.bench_api --mongodb-url mongodb://localhost:27017 --latency-ms 100 --rate-limit 100
+    python -m benchmarks.bench_api --scenarios send --output resultats.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import uvicorn
+
+from benchmarks.mock_db import MOCK_MONGODB_URL, init_mock_db
+from benchmarks.orange_simulator import SimulatorConfig, create_simulator
+
+SCENARIOS = ("send", "history", "contacts")
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    requests: int
+    errors: int
+    duration: float
+    throughput: float  # Requêtes par seconde
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    Percentile par la méthode du rang le plus proche
+    """
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(rank, 1)) - 1]
+
+
+async def run_scenario(
+    name: str,
+    make_request: Callable[[int], Awaitable[httpx.Response]],
+    total: int,
+    concurrency: int
+) -> ScenarioResult:
+    """
+    Exécute `total` requêtes avec `concurrency` clients simultanés
+    """
+    latencies: List[float] = []
+    errors = 0
+    next_index = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal errors
+        for index in next_index:
+            started = time.perf_counter()
+            try:
+                response = await make_request(index)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    return ScenarioResult(
+        name=name,
+        requests=total,
+        errors=errors,
+        duration=duration,
+        throughput=total / duration if duration else 0.0,
+        p50_ms=percentile(latencies, 0.50) * 1000,
+        p90_ms=percentile(latencies, 0.90) * 1000,
+        p99_ms=percentile(latencies, 0.99) * 1000,
+        max_ms=(latencies[-1] if latencies else 0.0) * 1000
+    )
+
+
+def random_phone(rng: random.Random) -> str:
+    return f"+2217{rng.choice('05678')}{rng.randrange(10 ** 7):07d}"
+
+
+async def start_server(app, port: int) -> Tuple[uvicorn.Server, asyncio.Task]:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+            raise RuntimeError(f"Le serveur n'a pas démarré sur le port {port}")
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+async def stop_server(server: Tuple[uvicorn.Server, asyncio.Task]) -> None:
+    server[0].should_exit = True
+    await server[1]
+
+
+async def authenticate(client: httpx.AsyncClient, api: str) -> None:
+    email = f"bench-{os.getpid()}-{int(time.time())}@example.com"
+    password = "benchmark-password"
+    response = await client.post(f"{api}/auth/signup", json={
+        "email": email, "password": password, "full_name": "Benchmark"
+    })
+    response.raise_for_status()
+    response = await client.post(f"{api}/auth/login/access-token", data={
+        "username": email, "password": password
+    })
+    response.raise_for_status()
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+
+async def wait_for_queue_drain(timeout: float) -> Optional[float]:
+    """
+    Attend que la file d'attente soit vide
+
+    Returns:
+        Durée de l'attente en secondes, ou None si le délai est dépassé
+    """
+    from app.db.models import SMSMessage
+
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        pending = await SMSMessage.find({"status": {"$in": ["queued", "processing"]}}).count()
+        if not pending:
+            return time.perf_counter() - started
+        await asyncio.sleep(0.1)
+    return None
+
+
+def print_results(results: List[ScenarioResult]) -> None:
+    header = f"{'scénario':<18} {'requêtes':>9} {'erreurs':>8} {'req/s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(
+            f"{result.name:<18} {result.requests:>9} {result.errors:>8} {result.throughput:>9.1f} "
+            f"{result.p50_ms:>9.2f} {result.p90_ms:>9.2f} {result.p99_ms:>9.2f} {result.max_ms:>9.2f}"
+        )
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    simulator = create_simulator(SimulatorConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        rate_limit=args.rate_limit,
+        token_ttl=args.token_ttl,
+        seed=args.seed
+    ))
+    simulator_url = f"http://127.0.0.1:{args.simulator_port}"
+    api_url = f"http://127.0.0.1:{args.api_port}"
+    database_name = f"sms_bench_{os.getpid()}"
+
+    # Le backend lit sa configuration à l'import: l'environnement doit être prêt avant
+    os.environ.update({
+        "MONGODB_URL": args.mongodb_url,
+        "MONGODB_DB_NAME": database_name,
+        "MONGODB_MIGRATE_ON_STARTUP": "true",
+        "ORANGE_CLIENT_ID": "bench",
+        "ORANGE_CLIENT_SECRET": "bench",
+        "ORANGE_AUTH_URL": f"{simulator_url}/oauth/v3/token",
+        "ORANGE_SMS_URL": f"{simulator_url}/smsmessaging/v1/outbound",
+        "ORANGE_RATE_LIMIT_PER_SECOND": str(args.backend_rate_limit),
+        "ORANGE_DELIVERY_NOTIFY_URL": f"{api_url}/api/v1/sms/delivery-receipts" if args.receipts else "",
+        "ORANGE_DELIVERY_CALLBACK_TOKEN": "bench" if args.receipts else "",
+        "SMS_QUEUE_ENABLED": "false" if args.sync else "true",
+        "SMS_RECONCILE_ENABLED": "false",
+        "BCRYPT_ROUNDS": "4"
+    })
+    from app.core.config import settings
+    from app.db.database import get_db
+    from app.main import app
+
+    if args.mongodb_url == MOCK_MONGODB_URL:
+        await init_mock_db()
+
+    simulator_server = await start_server(simulator, args.simulator_port)
+    api_server = await start_server(app, args.api_port)
+    results: List[ScenarioResult] = []
+    drain: Dict = {}
+    rng = random.Random(args.seed)
+    api = f"{api_url}{settings.API_V1_STR}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    try:
+        async with httpx.AsyncClient(timeout=60.0, limits=limits) as client:
+            await authenticate(client, api)
+
+            if "send" in args.scenarios:
+                drain_started = time.perf_counter()
+                results.append(await run_scenario(
+                    "sms/send",
+                    lambda i: client.post(f"{api}/sms/send", json={
+                        "recipient_number": random_phone(rng),
+                        "message": f"Message de test {i}"
+                    }),
+                    args.requests, args.concurrency
+                ))
+                if not args.sync:
+                    waited = await wait_for_queue_drain(args.drain_timeout)
+                    if waited is not None:
+                        elapsed = time.perf_counter() - drain_started
+                        drain = {"sms": args.requests, "duration": elapsed, "sms_per_second": args.requests / elapsed}
+
+            if "history" in args.scenarios:
+                results.append(await run_scenario(
+                    "sms/history",
+                    lambda i: client.get(f"{api}/sms/history", params={"limit": args.page_size}),
+                    args.requests, args.concurrency
+                ))
+
+            if "contacts" in args.scenarios:
+                results.append(await run_scenario(
+                    "contacts (création)",
+                    lambda i: client.post(f"{api}/contacts/", json={
+                        "name": f"Contact {i:06d}", "phone_number": random_phone(rng), "notes": "benchmark"
+                    }),
+                    args.requests, args.concurrency
+                ))
+                results.append(await run_scenario(
+                    "contacts (liste)",
+                    lambda i: client.get(f"{api}/contacts/", params={"limit": args.page_size}),
+                    args.requests, args.concurrency
+                ))
+
+            orange_stats = (await client.get(f"{simulator_url}/stats")).json()
+    finally:
+        if args.mongodb_url != MOCK_MONGODB_URL and not args.keep_data:
+            await (await get_db()).client.drop_database(database_name)
+        await stop_server(api_server)
+        await stop_server(simulator_server)
+
+    print_results(results)
+    if drain:
+        print(f"\nEnvoi vers Orange: {drain['sms']} SMS en {drain['duration']:.2f} s "
+              f"({drain['sms_per_second']:.1f} SMS/s, file d'attente incluse)")
+    elif "send" in args.scenarios and not args.sync:
+        print(f"\nLa file d'attente ne s'est pas vidée en {args.drain_timeout} s")
+    print(f"Simulateur Orange: {orange_stats}")
+
+    return {
+        "parameters": {key: value for key, value in vars(args).items() if key != "output"},
+        "scenarios": [asdict(result) for result in results],
+        "queue_drain": drain,
+        "orange": orange_stats
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de bout en bout de l'API SMS")
+    parser.add_argument("--requests", type=int, default=1000, help="Requêtes par scénario")
+    parser.add_argument("--concurrency", type=int, default=20, help="Clients simultanés")
+    parser.add_argument("--scenarios", type=lambda v: v.split(","), default=list(SCENARIOS),
+                        help=f"Scénarios séparés par des virgules ({', '.join(SCENARIOS)})")
+    parser.add_argument("--page-size", type=int, default=100, help="Taille des pages d'historique et de contacts")
+    parser.add_argument("--mongodb-url", default=MOCK_MONGODB_URL,
+                        help=f"URL MongoDB (base temporaire supprimée à la fin) ou {MOCK_MONGODB_URL} (en mémoire)")
+    parser.add_argument("--keep-data", action="store_true", help="Conserver la base MongoDB temporaire")
+    parser.add_argument("--sync", action="store_true", help="Envoi synchrone (file d'attente désactivée)")
+    parser.add_argument("--receipts", action="store_true", help="Accusés de réception poussés par le simulateur")
+    parser.add_argument("--backend-rate-limit", type=float, default=0.0,
+                        help="Débit d'envoi du backend (ORANGE_RATE_LIMIT_PER_SECOND, 0 = illimité)")
+    parser.add_argument("--drain-timeout", type=float, default=120.0, help="Attente max de la file d'envoi")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Latence du simulateur Orange")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="Variation de la latence du simulateur")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proportion de 500/503 du simulateur")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Proportion de 429 aléatoires")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Débit accepté par le simulateur (0 = illimité)")
+    parser.add_argument("--token-ttl", type=int, default=3600, help="Validité des tokens du simulateur")
+    parser.add_argument("--api-port", type=int, default=8765)
+    parser.add_argument("--simulator-port", type=int, default=9090)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Écrire les résultats en JSON dans ce fichier")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Scénarios inconnus: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark de la sérialisation des listes (/sms/history et /contacts/).
+
+Compare, pour une page de N éléments, l'ancien chemin (documents Beanie puis
+validation dans le response_model par FastAPI et encodage json) au chemin
+rapide (documents bruts projetés depuis Motor, encodés une fois par orjson),
+et vérifie que les deux produisent le même JSON.
+
+Utilisation (depuis le dossier backend, après pip install -r requirements-dev.txt):
+    python -m benchmarks.bench_list_serialization --rows 5000 --limits 100,500,1000
+    MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.bench_list_serialization
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List
+
+from benchmarks.mock_db import MOCK_MONGODB_URL, init_mock_db
+
+os.environ.setdefault("MONGODB_URL", MOCK_MONGODB_URL)
+# Base temporaire, supprimée à la fin du benchmark
+os.environ["MONGODB_DB_NAME"] = f"sms_bench_{os.getpid()}"
+
+from bson import ObjectId  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from app.api import schemas  # noqa: E402
+from app.api.endpoints.contacts import CONTACTS_FIELDS, CONTACTS_PROJECTION, CONTACTS_SORT  # noqa: E402
+from app.api.endpoints.sms import HISTORY_FIELDS, HISTORY_PROJECTION, HISTORY_SORT  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.db.database import close_db, init_db  # noqa: E402
+from app.db.models import Contact, SMSMessage  # noqa: E402
+from app.utils.fast_json import FastJSONResponse, serialize_documents  # noqa: E402
+
+
+async def seed(owner_id: str, rows: int) -> None:
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    sms_documents, contact_documents = [], []
+    for i in range(rows):
+        created_at = start + timedelta(seconds=i * 7, milliseconds=rng.randrange(1000))
+        number = f"+2217{rng.choice('05678')}{rng.randrange(10 ** 7):07d}"
+        sms_documents.append({
+            "content": f"Bonjour, votre commande n°{i} est prête. Merci de votre confiance !",
+            "recipient_number": number,
+            "recipient_id": str(ObjectId()),
+            "sender_id": owner_id,
+            "status": rng.choice(["sent", "delivered", "failed"]),
+            "message_id": f"msg-{i}",
+            "encoding": "GSM-7",
+            "segments": 1,
+            "attempts": 1,
+            "status_checks": 0,
+            "created_at": created_at,
+            "updated_at": created_at
+        })
+        contact_documents.append({
+            "name": f"Contact {i:06d}",
+            "phone_number": number,
+            "notes": "client fidèle" if i % 3 else None,
+            "owner_id": owner_id,
+            "created_at": created_at,
+            "updated_at": created_at
+        })
+    await SMSMessage.get_motor_collection().insert_many(sms_documents)
+    await Contact.get_motor_collection().insert_many(contact_documents)
+
+
+async def measure(func: Callable[[], Awaitable[bytes]], repeat: int) -> float:
+    """
+    Durée médiane d'un appel, en millisecondes
+    """
+    durations: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        durations.append(time.perf_counter() - started)
+    durations.sort()
+    return durations[len(durations) // 2] * 1000
+
+
+async def run(rows: int, limits: List[int], repeat: int) -> None:
+    if settings.MONGODB_URL == MOCK_MONGODB_URL:
+        await init_mock_db()
+    else:
+        await init_db()
+    owner_id = str(ObjectId())
+    print(f"Insertion de {rows} SMS et {rows} contacts ({settings.MONGODB_URL.split('@')[-1]})")
+    await seed(owner_id, rows)
+
+    cases = [
+        ("sms/history", SMSMessage, schemas.SMS, {"sender_id": owner_id},
+         HISTORY_SORT, HISTORY_PROJECTION, HISTORY_FIELDS),
+        ("contacts", Contact, schemas.Contact, {"owner_id": owner_id},
+         CONTACTS_SORT, CONTACTS_PROJECTION, CONTACTS_FIELDS),
+    ]
+
+    print(f"\n{'liste':<12} {'limit':>6} {'ancien ms':>10} {'rapide ms':>10} {'gain':>7}  identique")
+    try:
+        for name, document, schema, query, sort, projection, fields in cases:
+            field = create_response_field(name=f"Response_{name}", type_=List[schema])
+
+            for limit in limits:
+                async def legacy() -> bytes:
+                    documents = await document.find(query).sort(*sort).limit(limit).to_list()
+                    content = await serialize_response(field=field, response_content=documents)
+                    return JSONResponse(content).body
+
+                async def fast() -> bytes:
+                    documents = await document.get_motor_collection().find(
+                        query, projection=projection
+                    ).sort(sort).limit(limit).to_list(length=None)
+                    return FastJSONResponse(serialize_documents(documents, fields)).body
+
+                identical = json.loads(await legacy()) == json.loads(await fast())
+                legacy_ms = await measure(legacy, repeat)
+                fast_ms = await measure(fast, repeat)
+                print(
+                    f"{name:<12} {limit:>6} {legacy_ms:>10.2f} {fast_ms:>10.2f} "
+                    f"{legacy_ms / fast_ms:>6.1f}x  {'oui' if identical else 'NON'}"
+                )
+    finally:
+        if settings.MONGODB_URL != MOCK_MONGODB_URL:
+            await SMSMessage.get_motor_collection().database.client.drop_database(settings.MONGODB_DB_NAME)
+        close_db()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de la sérialisation des listes")
+    parser.add_argument("--rows", type=int, default=5000, help="Documents insérés par collection")
+    parser.add_argument("--limits", type=lambda v: [int(x) for x in v.split(",")], default=[100, 500, 1000],
+                        help="Tailles de page mesurées")
+    parser.add_argument("--repeat", type=int, default=20, help="Mesures par cas (médiane)")
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.limits, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Microbenchmark de la normalisation des numéros de téléphone.
+
+Compare l'ancienne validation (expressions régulières recompilées à chaque appel)
+à normalize_phone / normalize_many, sur un jeu de numéros où chaque numéro
+distinct revient plusieurs fois, comme dans un envoi groupé.
+
+Utilisation (depuis le dossier backend):
+    python -m benchmarks.bench_phone_normalization --count 1000000 --distinct 50000
+"""
+import argparse
+import random
+import re
+import time
+from typing import Callable, List, Tuple
+
+from app.utils.phone_normalization import _normalize, normalize_many, normalize_phone
+
+
+def legacy_validate_senegal_phone(phone_number: str) -> Tuple[bool, str]:
+    # Implémentation d'origine, conservée comme référence
+    cleaned = re.sub(r'[\s\-\.\(\)]', '', phone_number)
+    match = re.match(r'^(\+221|221)?([7][0,5-8]\d{7})$', cleaned)
+    if not match:
+        return False, phone_number
+    formatted = f"+221{match.group(2)}"
+    if not re.match(r'^\+221[7][0,5-8]', formatted):
+        return False, phone_number
+    return True, formatted
+
+
+def generate_numbers(count: int, distinct: int, seed: int = 42) -> List[str]:
+    rng = random.Random(seed)
+    formats = [
+        "+221{}", "221{}", "{}", "00221{}",
+        "+221 {0[0]}{0[1]} {0[2]}{0[3]}{0[4]} {0[5]}{0[6]} {0[7]}{0[8]}",
+    ]
+    pool = []
+    for _ in range(distinct):
+        local = rng.choice("05678")
+        number = f"7{local}{rng.randrange(10 ** 7):07d}"
+        if rng.random() < 0.05:
+            number = number[:-1]  # Numéro invalide (trop court)
+        pool.append(rng.choice(formats).format(number))
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def measure(label: str, func: Callable[[], object], count: int) -> None:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed:8.3f} s  {count / elapsed / 1e6:8.2f} M numéros/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de la normalisation des numéros")
+    parser.add_argument("--count", type=int, default=1_000_000, help="Nombre de numéros")
+    parser.add_argument("--distinct", type=int, default=50_000, help="Nombre de numéros distincts")
+    args = parser.parse_args()
+
+    numbers = generate_numbers(args.count, args.distinct)
+    print(f"{args.count} numéros dont {args.distinct} distincts")
+
+    measure("validation d'origine", lambda: [legacy_validate_senegal_phone(n) for n in numbers], args.count)
+    _normalize.cache_clear()
+    measure("normalize_phone (cache froid)", lambda: [normalize_phone(n) for n in numbers], args.count)
+    measure("normalize_phone (cache chaud)", lambda: [normalize_phone(n) for n in numbers], args.count)
+    _normalize.cache_clear()
+    measure("normalize_many (cache froid)", lambda: normalize_many(numbers), args.count)
+
+    # Les deux implémentations doivent accepter les mêmes numéros sénégalais
+    mismatches = sum(
+        1 for n in set(numbers)
+        if legacy_validate_senegal_phone(n)[0] != (normalize_phone(n, "SN", ["SN"]) is not None)
+        and not n.startswith("00")
+    )
+    print(f"Différences avec la validation d'origine (hors préfixe 00): {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Base MongoDB en mémoire pour les benchmarks (paquet mongomock-motor, voir requirements-dev.txt).
+
+La base est injectée dans app.db.database avant le démarrage du backend:
+init_db et get_db la renvoient ensuite sans ouvrir de connexion MongoDB.
+Le code de production ne connaît pas mongomock.
+"""
+import logging
+
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
+# Valeur de --mongodb-url / MONGODB_URL qui sélectionne la base en mémoire
+MOCK_MONGODB_URL = "mongomock://"
+
+
+async def init_mock_db() -> AsyncIOMotorDatabase:
+    """
+    Crée une base en mémoire, initialise Beanie et l'installe comme base partagée
+    """
+    # Import tardif: les benchmarks préparent l'environnement avant que le backend lise sa configuration
+    from app.core.config import settings
+    from app.db import database
+    from app.db.models import DOCUMENT_MODELS
+
+    logger.warning("Base de données en mémoire (mongomock): les données sont perdues à l'arrêt")
+    client = AsyncMongoMockClient()
+    db = client[settings.MONGODB_DB_NAME]
+    await init_beanie(database=db, document_models=DOCUMENT_MODELS)
+    database._client, database._db = client, db
+    return db
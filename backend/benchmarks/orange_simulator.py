@@ -0,0 +1,268 @@
+"""
+Simulateur local de l'API Orange SMS, pour mesurer le débit du backend sans
+appeler api.orange.com.
+
+Expose les trois endpoints utilisés par OrangeSMSService:
+    POST /oauth/v3/token                                         token OAuth (client_credentials)
+    POST /smsmessaging/v1/outbound/requests                      envoi d'un SMS
+    GET  /smsmessaging/v1/outbound/requests/{id}/deliveryInfos   statut de livraison
+
+Latence, taux d'erreurs 5xx, limitation de débit (429 avec Retry-After) et durée
+de validité des tokens sont configurables. Si la requête d'envoi contient un
+receiptRequest.notifyURL, l'accusé de réception est poussé sur cette URL.
+
+Utilisation (depuis le dossier backend):
+    python -m benchmarks.orange_simulator --port 9090 --latency-ms 80 --error-rate 0.01 --rate-limit 50
+
+puis configurer le backend avec:
+    ORANGE_AUTH_URL=http://127.0.0.1:9090/oauth/v3/token
+    ORANGE_SMS_URL=http://127.0.0.1:9090/smsmessaging/v1/outbound
+    ORANGE_CLIENT_ID=bench ORANGE_CLIENT_SECRET=bench
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import secrets
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Set
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+SMS_PATH = "/smsmessaging/v1/outbound"
+
+
+@dataclass
+class SimulatorConfig:
+    latency_ms: float = 50.0  # Latence moyenne de chaque réponse
+    jitter_ms: float = 20.0  # Variation aléatoire (+/-) autour de la latence moyenne
+    error_rate: float = 0.0  # Proportion de réponses 500/503
+    throttle_rate: float = 0.0  # Proportion de réponses 429 tirées au hasard
+    rate_limit: float = 0.0  # Envois acceptés par seconde au-delà desquels Orange répond 429 (0 = illimité)
+    retry_after: int = 1  # Valeur de l'en-tête Retry-After des réponses 429
+    token_ttl: int = 3600  # Durée de validité des tokens (secondes)
+    delivery_delay_ms: float = 500.0  # Délai avant livraison (statut et accusé de réception)
+    delivery_failure_rate: float = 0.0  # Proportion de SMS jamais livrés (DeliveryImpossible)
+    seed: Optional[int] = None
+
+
+class _SendRateLimiter:
+    """
+    Seau à jetons: reproduit la limite de débit du contrat Orange
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = max(1.0, rate)
+        self.updated = time.monotonic()
+
+    def allow(self) -> bool:
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+def create_simulator(config: Optional[SimulatorConfig] = None) -> FastAPI:
+    """
+    Construit l'application du simulateur; son état (tokens, messages, compteurs)
+    est exposé dans app.state.simulator
+    """
+    config = config or SimulatorConfig()
+    rng = random.Random(config.seed)
+    tokens: Dict[str, float] = {}
+    messages: Dict[str, Dict] = {}
+    receipt_tasks: Set[asyncio.Task] = set()
+    limiter = _SendRateLimiter(config.rate_limit)
+    message_ids = itertools.count(1)
+    stats: Dict[str, int] = {"tokens": 0, "sent": 0, "throttled": 0, "errors": 0, "unauthorized": 0, "receipts": 0}
+    http_client: Dict[str, httpx.AsyncClient] = {}
+
+    app = FastAPI(title="Simulateur API Orange SMS", docs_url=None, redoc_url=None)
+    app.state.simulator = {"config": config, "stats": stats, "messages": messages}
+
+    async def simulate_latency() -> None:
+        delay = config.latency_ms + rng.uniform(-config.jitter_ms, config.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    def injected_failure() -> Optional[JSONResponse]:
+        if config.throttle_rate and rng.random() < config.throttle_rate:
+            stats["throttled"] += 1
+            return JSONResponse(
+                {"requestError": {"policyException": {"messageId": "POL3003", "text": "Too many requests"}}},
+                status_code=429,
+                headers={"Retry-After": str(config.retry_after)}
+            )
+        if config.error_rate and rng.random() < config.error_rate:
+            stats["errors"] += 1
+            return JSONResponse(
+                {"code": 1, "message": "Internal error", "description": "Erreur simulée"},
+                status_code=rng.choice((500, 503))
+            )
+        return None
+
+    def authorized(request: Request) -> bool:
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        expires_at = tokens.get(token)
+        if scheme.lower() != "bearer" or expires_at is None or expires_at < time.monotonic():
+            stats["unauthorized"] += 1
+            return False
+        return True
+
+    def unauthorized() -> JSONResponse:
+        return JSONResponse(
+            {"code": 42, "message": "Expired credentials", "description": "The requested service needs credentials"},
+            status_code=401
+        )
+
+    def delivery_status(message: Dict) -> str:
+        if time.monotonic() < message["delivered_at"]:
+            return "MessageWaiting"
+        return "DeliveryImpossible" if message["failed"] else "DeliveredToTerminal"
+
+    async def push_receipt(message_id: str, notify_url: str, callback_data: Optional[str]) -> None:
+        message = messages[message_id]
+        await asyncio.sleep(max(0.0, message["delivered_at"] - time.monotonic()))
+        notification = {"deliveryInfoNotification": {
+            "callbackData": callback_data,
+            "deliveryInfo": {"address": message["address"], "deliveryStatus": delivery_status(message)}
+        }}
+        if "client" not in http_client:
+            http_client["client"] = httpx.AsyncClient(timeout=10.0)
+        try:
+            await http_client["client"].post(notify_url, json=notification)
+            stats["receipts"] += 1
+        except httpx.HTTPError:
+            pass
+
+    @app.on_event("shutdown")
+    async def shutdown() -> None:
+        for task in receipt_tasks:
+            task.cancel()
+        if "client" in http_client:
+            await http_client.pop("client").aclose()
+
+    @app.post("/oauth/v3/token")
+    async def token(request: Request):
+        await simulate_latency()
+        failure = injected_failure()
+        if failure is not None:
+            return failure
+        form = await request.form()
+        if not request.headers.get("Authorization", "").startswith("Basic ") \
+                or form.get("grant_type") != "client_credentials":
+            return JSONResponse({"error": "invalid_client"}, status_code=401)
+        access_token = secrets.token_urlsafe(24)
+        tokens[access_token] = time.monotonic() + config.token_ttl
+        stats["tokens"] += 1
+        return {"token_type": "Bearer", "access_token": access_token, "expires_in": config.token_ttl}
+
+    @app.post(f"{SMS_PATH}/requests", status_code=201)
+    @app.post(f"{SMS_PATH}/{{sender_address}}/requests", status_code=201)
+    async def send(request: Request):
+        await simulate_latency()
+        if not authorized(request):
+            return unauthorized()
+        if not limiter.allow():
+            stats["throttled"] += 1
+            return JSONResponse(
+                {"requestError": {"policyException": {"messageId": "POL3003", "text": "Rate limit exceeded"}}},
+                status_code=429,
+                headers={"Retry-After": str(config.retry_after)}
+            )
+        failure = injected_failure()
+        if failure is not None:
+            return failure
+
+        body = (await request.json()).get("outboundSMSMessageRequest", {})
+        message_id = f"sim-{next(message_ids)}"
+        messages[message_id] = {
+            "address": body.get("address"),
+            "delivered_at": time.monotonic() + config.delivery_delay_ms / 1000,
+            "failed": rng.random() < config.delivery_failure_rate
+        }
+        stats["sent"] += 1
+
+        receipt_request = body.get("receiptRequest") or {}
+        if receipt_request.get("notifyURL"):
+            task = asyncio.create_task(push_receipt(
+                message_id, receipt_request["notifyURL"], receipt_request.get("callbackData")
+            ))
+            receipt_tasks.add(task)
+            task.add_done_callback(receipt_tasks.discard)
+
+        body["resourceURL"] = f"{str(request.base_url).rstrip('/')}{SMS_PATH}/requests/{message_id}"
+        return {"outboundSMSMessageRequest": body}
+
+    @app.get(f"{SMS_PATH}/requests/{{message_id}}/deliveryInfos")
+    @app.get(f"{SMS_PATH}/{{sender_address}}/requests/{{message_id}}/deliveryInfos")
+    async def delivery_infos(message_id: str, request: Request):
+        await simulate_latency()
+        if not authorized(request):
+            return unauthorized()
+        failure = injected_failure()
+        if failure is not None:
+            return failure
+        message = messages.get(message_id)
+        if message is None:
+            return JSONResponse(
+                {"requestError": {"serviceException": {"messageId": "SVC0004", "text": "Unknown message"}}},
+                status_code=404
+            )
+        return {"deliveryInfos": {"address": message["address"], "deliveryStatus": delivery_status(message)}}
+
+    @app.get("/stats")
+    async def read_stats():
+        return stats
+
+    return app
+
+
+def main() -> None:
+    defaults = SimulatorConfig()
+    parser = argparse.ArgumentParser(description="Simulateur local de l'API Orange SMS")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="Latence moyenne")
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms, help="Variation de la latence")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="Proportion de 500/503")
+    parser.add_argument("--throttle-rate", type=float, default=defaults.throttle_rate,
+                        help="Proportion de 429 aléatoires")
+    parser.add_argument("--rate-limit", type=float, default=defaults.rate_limit,
+                        help="Envois par seconde avant 429 (0 = illimité)")
+    parser.add_argument("--retry-after", type=int, default=defaults.retry_after, help="En-tête Retry-After des 429")
+    parser.add_argument("--token-ttl", type=int, default=defaults.token_ttl, help="Validité des tokens (secondes)")
+    parser.add_argument("--delivery-delay-ms", type=float, default=defaults.delivery_delay_ms,
+                        help="Délai avant livraison")
+    parser.add_argument("--delivery-failure-rate", type=float, default=defaults.delivery_failure_rate,
+                        help="Proportion de SMS non livrés")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = SimulatorConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        rate_limit=args.rate_limit,
+        retry_after=args.retry_after,
+        token_ttl=args.token_ttl,
+        delivery_delay_ms=args.delivery_delay_ms,
+        delivery_failure_rate=args.delivery_failure_rate,
+        seed=args.seed
+    )
+    uvicorn.run(create_simulator(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import asyncio
+import time
+
+import pytest
+
+
+class FakeClock:
+    """
+    Horloge monotone contrôlée par le test: les attentes (asyncio.sleep)
+    avancent l'horloge au lieu de bloquer
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(time, "monotonic", fake.monotonic)
+    monkeypatch.setattr(asyncio, "sleep", fake.sleep)
+    return fake
@@ -0,0 +1,105 @@
+import asyncio
+from typing import List
+
+import pytest
+
+pytest.importorskip("beanie")
+pytest.importorskip("pydantic_settings")
+
+from app.core.config import settings  # noqa: E402
+from app.core.contacts import ContactImportError, iter_csv_rows, iter_lines, iter_ndjson_rows  # noqa: E402
+
+
+async def _chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def _collect(rows) -> List:
+    return [row async for row in rows]
+
+
+def read_lines(data: bytes, size: int = 3) -> List:
+    return asyncio.run(_collect(iter_lines(_chunks(data, size))))
+
+
+def read_csv(text: str) -> List:
+    return asyncio.run(_collect(iter_csv_rows(iter_lines(_chunks(text.encode(), 7)))))
+
+
+def read_ndjson(text: str) -> List:
+    return asyncio.run(_collect(iter_ndjson_rows(iter_lines(_chunks(text.encode(), 7)))))
+
+
+def test_iter_lines_handles_bom_crlf_and_split_characters():
+    data = "\ufeffnom;numéro\r\nAïssatou;77\r\nfin".encode()
+    # Des morceaux d'un octet coupent les caractères UTF-8 multi-octets
+    assert read_lines(data, 1) == [(1, "nom;numéro"), (2, "Aïssatou;77"), (3, "fin")]
+
+
+def test_iter_lines_without_final_newline():
+    assert read_lines(b"a\nb\n") == [(1, "a"), (2, "b")]
+    assert read_lines(b"a\nb") == [(1, "a"), (2, "b")]
+
+
+def test_csv_comma_and_unknown_columns():
+    rows = read_csv("Name,Phone_Number,ville\nAwa,771234567,Dakar\n")
+    assert rows == [(2, {"name": "Awa", "phone_number": "771234567"})]
+
+
+def test_csv_semicolon_delimiter_and_blank_lines():
+    rows = read_csv("name;phone_number;notes\n\nAwa;771234567;cliente\nMoussa;781234567;\n")
+    assert rows == [
+        (3, {"name": "Awa", "phone_number": "771234567", "notes": "cliente"}),
+        (4, {"name": "Moussa", "phone_number": "781234567", "notes": ""}),
+    ]
+
+
+def test_csv_quoted_field_over_several_lines():
+    rows = read_csv('name,phone_number,notes\n"Diop, Awa",771234567,"ligne 1\nligne 2"\nMoussa,781234567,\n')
+    assert rows == [
+        (2, {"name": "Diop, Awa", "phone_number": "771234567", "notes": "ligne 1\nligne 2"}),
+        (4, {"name": "Moussa", "phone_number": "781234567", "notes": ""}),
+    ]
+
+
+def test_csv_unclosed_quote_is_rejected_and_parsing_resumes(monkeypatch):
+    monkeypatch.setattr(settings, "CONTACT_IMPORT_MAX_RECORD_LINES", 3)
+    lines = ["name,phone_number,notes", 'Awa,771234567,"non refermé'] + [
+        f"Contact {i},77000000{i}," for i in range(5)
+    ]
+    rows = read_csv("\n".join(lines))
+    assert rows[0] == (2, None)
+    assert [line for line, _ in rows[1:]] == [3, 4, 5, 6, 7]
+    assert all(row is not None for _, row in rows[1:])
+
+
+def test_csv_record_size_is_capped(monkeypatch):
+    monkeypatch.setattr(settings, "CONTACT_IMPORT_MAX_RECORD_SIZE", 50)
+    rows = read_csv('name,phone_number,notes\nAwa,771234567,"' + "x" * 100 + "\nMoussa,781234567,\n")
+    assert rows == [(2, None), (3, {"name": "Moussa", "phone_number": "781234567", "notes": ""})]
+
+
+def test_csv_unclosed_quote_at_end_of_file():
+    rows = read_csv('name,phone_number\nAwa,771234567\nMoussa,"78')
+    assert rows == [(2, {"name": "Awa", "phone_number": "771234567"}), (3, None)]
+
+
+def test_csv_missing_columns():
+    with pytest.raises(ContactImportError):
+        read_csv("name,notes\nAwa,cliente\n")
+
+
+def test_csv_empty_file():
+    with pytest.raises(ContactImportError):
+        read_csv("\n\n")
+
+
+def test_ndjson_rows():
+    rows = read_ndjson('{"name": "Awa", "phone_number": "771234567"}\n\npas du json\n[1, 2]\n{"name": "Moussa"}')
+    assert rows == [
+        (1, {"name": "Awa", "phone_number": "771234567"}),
+        (3, None),
+        (4, None),
+        (5, {"name": "Moussa"}),
+    ]
@@ -0,0 +1,64 @@
+import asyncio
+from typing import List
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("motor")
+pytest.importorskip("pydantic_settings")
+
+import httpx  # noqa: E402
+
+from app.services.orange_api import OrangeSMSService  # noqa: E402
+from app.services.orange_token import OrangeTokenManager  # noqa: E402
+from app.services.resilience import CircuitBreaker  # noqa: E402
+
+
+def half_open_service(statuses: List[int]) -> OrangeSMSService:
+    """
+    Service dont le disjoncteur attend un appel de test, et dont l'API SMS
+    répond successivement `statuses` (le dernier code est répété)
+    """
+    responses = list(statuses)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        status_code = responses.pop(0) if len(responses) > 1 else responses[0]
+        return httpx.Response(status_code, json={})
+
+    async def fetch_token():
+        return "token", 3600.0
+
+    service = OrangeSMSService()
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    service.token_manager = OrangeTokenManager(fetch_token, refresh_margin=0)
+    service.rate_limiter = None
+    service.breaker = CircuitBreaker("orange_sms", failure_threshold=1, reset_timeout=30)
+    service.breaker.record_failure()
+    return service
+
+
+def request(service: OrangeSMSService) -> httpx.Response:
+    return asyncio.run(service._request("status", "GET", "https://api.orange.test/status"))
+
+
+def test_token_refresh_retry_keeps_the_half_open_probe(clock):
+    service = half_open_service([401, 200])
+    clock.now += 30
+    assert request(service).status_code == 200
+    assert service.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_rate_limited_probe_is_retried_then_closes_the_circuit(clock):
+    service = half_open_service([429, 200])
+    clock.now += 30
+    assert request(service).status_code == 200
+    assert service.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_rate_limited_probe_releases_its_slot(clock):
+    service = half_open_service([429])
+    clock.now += 30
+    assert request(service).status_code == 429
+    assert service.breaker.state == CircuitBreaker.HALF_OPEN
+    # Le circuit n'est pas bloqué jusqu'au prochain reset_timeout
+    assert service.breaker.allow_request()
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from bson import ObjectId  # noqa: E402
+from pymongo import ASCENDING, DESCENDING  # noqa: E402
+
+from app.utils.pagination import InvalidCursorError, decode_cursor, encode_cursor, keyset_filter  # noqa: E402
+
+
+def test_cursor_round_trip_keeps_bson_types():
+    values = [datetime(2024, 5, 1, 12, 30, 15, 123000), ObjectId()]
+    cursor = encode_cursor(values)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, 2) == values
+
+
+def test_cursor_round_trip_strings():
+    values = ["Dupont", ObjectId()]
+    assert decode_cursor(encode_cursor(values), 2) == values
+
+
+@pytest.mark.parametrize("cursor", ["", "pas un curseur", "!!!!", encode_cursor({"a": 1})])
+def test_decode_cursor_rejects_garbage(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, 2)
+
+
+def test_decode_cursor_rejects_wrong_size():
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(encode_cursor(["Dupont"]), 2)
+
+
+def test_keyset_filter_descending():
+    created_at, last_id = datetime(2024, 5, 1), ObjectId()
+    assert keyset_filter([("created_at", DESCENDING), ("_id", DESCENDING)], [created_at, last_id]) == {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}},
+        ]
+    }
+
+
+def test_keyset_filter_mixed_directions():
+    last_id = ObjectId()
+    assert keyset_filter(
+        [("name", ASCENDING), ("created_at", DESCENDING), ("_id", ASCENDING)],
+        ["Dupont", datetime(2024, 1, 1), last_id]
+    ) == {
+        "$or": [
+            {"name": {"$gt": "Dupont"}},
+            {"name": "Dupont", "created_at": {"$lt": datetime(2024, 1, 1)}},
+            {"name": "Dupont", "created_at": datetime(2024, 1, 1), "_id": {"$gt": last_id}},
+        ]
+    }
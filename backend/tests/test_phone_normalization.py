@@ -0,0 +1,87 @@
+import pytest
+
+pytest.importorskip("pydantic_settings")
+
+from app.utils.phone_normalization import (  # noqa: E402
+    NUMBERING_PLANS,
+    PLANS_BY_COUNTRY,
+    normalize_many,
+    normalize_phone,
+    validate_phone,
+)
+
+ALL_COUNTRIES = [plan.country for plan in NUMBERING_PLANS]
+
+
+@pytest.mark.parametrize("raw", [
+    "771234567",
+    "77 123 45 67",
+    "77-123-45-67",
+    "(77) 123.45.67",
+    "+221771234567",
+    "+221 77 123 45 67",
+    "00221771234567",
+    "221771234567",
+])
+def test_senegal_formats(raw):
+    assert normalize_phone(raw, "SN", ["SN"]) == "+221771234567"
+
+
+@pytest.mark.parametrize("raw", [
+    "",
+    "abc",
+    "721234567",  # Préfixe non mobile
+    "77123456",  # Trop court
+    "7712345678",  # Trop long
+    "+22177123456a",
+    "+999771234567",  # Indicatif inconnu
+])
+def test_invalid_numbers(raw):
+    assert normalize_phone(raw, "SN", ["SN"]) is None
+
+
+def test_country_outside_allowed_list_is_rejected():
+    assert normalize_phone("+2250712345678", "SN", ["SN"]) is None
+    assert normalize_phone("+2250712345678", "SN", ["SN", "CI"]) == "+2250712345678"
+
+
+def test_trunk_prefix_is_removed():
+    assert normalize_phone("0812345678", "CD", ["CD"]) == "+243812345678"
+    assert normalize_phone("+2430812345678", "CD", ["CD"]) == "+243812345678"
+    assert normalize_phone("0612345678", "MA", ["MA"]) == "+212612345678"
+
+
+def test_plans_are_consistent():
+    assert len(PLANS_BY_COUNTRY) == len(NUMBERING_PLANS)
+    assert len({plan.dial_code for plan in NUMBERING_PLANS}) == len(NUMBERING_PLANS)
+    for plan in NUMBERING_PLANS:
+        assert plan.dial_code.isdigit()
+        assert plan.trunk_prefix in ("", "0")
+
+
+@pytest.mark.parametrize("country, local", [
+    ("SN", "701234567"),
+    ("CI", "0712345678"),
+    ("ML", "76123456"),
+    ("BF", "70123456"),
+    ("GN", "621234567"),
+    ("CM", "671234567"),
+    ("MG", "321234567"),
+    ("TN", "21234567"),
+    ("EG", "1012345678"),
+    ("JO", "791234567"),
+])
+def test_each_plan_accepts_its_mobiles(country, local):
+    dial_code = PLANS_BY_COUNTRY[country].dial_code
+    assert normalize_phone(local, country, ALL_COUNTRIES) == f"+{dial_code}{local}"
+    assert normalize_phone(f"+{dial_code}{local}", "SN", ALL_COUNTRIES) == f"+{dial_code}{local}"
+
+
+def test_normalize_many_keeps_order_and_duplicates():
+    assert normalize_many(["771234567", "bad", "+221771234567", "771234567"], "SN", ["SN"]) == [
+        "+221771234567", None, "+221771234567", "+221771234567"
+    ]
+
+
+def test_validate_phone_returns_input_when_invalid():
+    assert validate_phone("pas un numéro") == (False, "pas un numéro")
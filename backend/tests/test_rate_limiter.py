@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("motor")
+pytest.importorskip("pydantic_settings")
+
+from app.services.rate_limiter import TokenBucket  # noqa: E402
+
+
+def acquire(bucket: TokenBucket, count: int) -> None:
+    async def run():
+        for _ in range(count):
+            await bucket.acquire()
+    asyncio.run(run())
+
+
+def test_burst_is_served_without_waiting(clock):
+    bucket = TokenBucket(rate=5, burst=5)
+    acquire(bucket, 5)
+    assert clock.sleeps == []
+
+
+def test_callers_wait_for_the_refill_rate(clock):
+    bucket = TokenBucket(rate=5, burst=5)
+    acquire(bucket, 8)
+    assert clock.sleeps == pytest.approx([0.2, 0.2, 0.2])
+    assert clock.now == pytest.approx(1000.6)
+
+
+def test_tokens_refill_up_to_burst(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    acquire(bucket, 3)
+    clock.now += 60
+    acquire(bucket, 3)
+    assert clock.sleeps == []
+    acquire(bucket, 1)
+    assert clock.sleeps == pytest.approx([0.5])
+
+
+def test_burst_is_at_least_one(clock):
+    bucket = TokenBucket(rate=1, burst=0)
+    acquire(bucket, 2)
+    assert clock.sleeps == pytest.approx([1.0])
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from app.services import resilience
+from app.services.resilience import CircuitBreaker, backoff_delay, parse_retry_after
+
+
+def test_backoff_delay_uses_full_jitter_up_to_the_exponential_bound(monkeypatch):
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: high)
+    assert [backoff_delay(attempt, 0.5, 10.0) for attempt in range(1, 7)] == [0.5, 1.0, 2.0, 4.0, 8.0, 10.0]
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: low)
+    assert backoff_delay(3, 0.5, 10.0) == 0
+
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after(" 3 ") == 3.0
+
+
+@pytest.mark.parametrize("value", [None, "", "bientôt", "-5"])
+def test_parse_retry_after_invalid(value):
+    assert parse_retry_after(value) is None
+
+
+def test_parse_retry_after_http_date():
+    in_a_minute = datetime.now(timezone.utc) + timedelta(seconds=60)
+    assert 55 <= parse_retry_after(format_datetime(in_a_minute, usegmt=True)) <= 60
+
+
+def test_parse_retry_after_past_date_means_no_wait():
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("orange", failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_success()
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.retry_in == 30
+    assert breaker.snapshot()["total_rejections"] == 1
+    assert breaker.times_opened == 1
+
+
+def test_breaker_allows_a_single_probe_when_half_open(clock):
+    breaker = CircuitBreaker("orange", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    # Un test bloqué expire après reset_timeout
+    clock.now += 30
+    assert breaker.allow_request()
+
+
+def test_breaker_probe_success_closes_the_circuit(clock):
+    breaker = CircuitBreaker("orange", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request() and breaker.allow_request()
+
+
+def test_breaker_probe_failure_reopens_the_circuit(clock):
+    breaker = CircuitBreaker("orange", failure_threshold=5, reset_timeout=30)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 2
+    assert not breaker.allow_request()
+
+
+def test_breaker_release_probe_lets_the_next_caller_test(clock):
+    breaker = CircuitBreaker("orange", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.release_probe()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+
+
+def test_breaker_release_probe_is_a_no_op_when_closed_or_open(clock):
+    breaker = CircuitBreaker("orange", failure_threshold=1, reset_timeout=30)
+    breaker.release_probe()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    breaker.release_probe()
+    assert not breaker.allow_request()
@@ -0,0 +1,30 @@
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.db.database import get_db  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+def test_campaigns_router_is_mounted():
+    paths = {route.path for route in app.routes}
+    assert "/api/v1/campaigns/" in paths
+    assert "/api/v1/campaigns/{campaign_id}" in paths
+
+
+@pytest.fixture
+def client_without_db():
+    # get_current_user résout get_db avant le jeton: sans base, l'appel répondrait 500.
+    # Sans le contexte du client, le lifespan (connexion MongoDB) n'est pas exécuté.
+    app.dependency_overrides[get_db] = lambda: None
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+
+def test_campaigns_endpoint_requires_authentication(client_without_db):
+    response = client_without_db.get("/api/v1/campaigns/")
+    assert response.status_code == 401
@@ -0,0 +1,66 @@
+from app.utils.sms_encoding import (
+    GSM7_MULTIPART,
+    GSM7_SINGLE,
+    UCS2_MULTIPART,
+    UCS2_SINGLE,
+    analyze_message,
+    non_gsm_characters,
+    transliterate,
+)
+
+
+def test_gsm7_single_segment_limit():
+    info = analyze_message("a" * GSM7_SINGLE)
+    assert info.encoding == "GSM-7"
+    assert (info.length, info.segments, info.per_segment, info.remaining) == (160, 1, 160, 0)
+
+
+def test_gsm7_multipart_uses_153_septets_per_segment():
+    info = analyze_message("a" * (GSM7_SINGLE + 1))
+    assert (info.segments, info.per_segment, info.remaining) == (2, GSM7_MULTIPART, 2 * 153 - 161)
+    assert analyze_message("a" * 306).segments == 2
+    assert analyze_message("a" * 307).segments == 3
+
+
+def test_gsm7_extended_characters_cost_two_septets():
+    info = analyze_message("€" * 80)
+    assert info.encoding == "GSM-7"
+    assert (info.length, info.segments) == (160, 1)
+    assert analyze_message("€" * 80 + "a").segments == 2
+
+
+def test_gsm7_escape_sequence_is_never_split():
+    # 152 septets puis "€" (2 septets): le caractère étendu passe entier au segment suivant
+    info = analyze_message("a" * 152 + "€" + "a" * 10)
+    assert info.length == 164
+    assert info.segments == 2
+    assert info.remaining == GSM7_MULTIPART - 12
+
+
+def test_ucs2_limits():
+    assert analyze_message("ç" * UCS2_SINGLE).segments == 1
+    info = analyze_message("ç" * (UCS2_SINGLE + 1))
+    assert info.encoding == "UCS-2"
+    assert (info.segments, info.per_segment) == (2, UCS2_MULTIPART)
+
+
+def test_single_non_gsm_character_switches_to_ucs2():
+    info = analyze_message("Bonjour à tous, rendez-vous à l’agence")
+    assert info.encoding == "UCS-2"
+    assert non_gsm_characters("l’été ç’est") == ["’", "ç"]
+
+
+def test_ucs2_surrogate_pairs_count_twice():
+    info = analyze_message("😀" * 35)
+    assert (info.encoding, info.length, info.segments) == ("UCS-2", 70, 1)
+    assert analyze_message("😀" * 36).segments == 2
+
+
+def test_transliterate_returns_gsm7_text():
+    message = transliterate("Ça coûte 5 € – « offre » l’été…")
+    assert message == "Ça coute 5 € - \" offre \" l'été..."
+    assert analyze_message(message).encoding == "GSM-7"
+
+
+def test_transliterate_keeps_characters_without_equivalent():
+    assert transliterate("Merci 😀") == "Merci 😀"